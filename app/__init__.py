@@ -2,6 +2,19 @@
 import os
 from flask import Flask, jsonify
 from .extensions import db, jwt, cors, migrate
+from .utils.db_routing import REPLICA_BIND, init_routing
+from .utils.metrics import init_metrics
+from .utils.compression import init_compression
+from .utils.idempotency import init_idempotency
+from .utils.json_provider import init_json
+from .utils.prices import init_prices, parse_rates
+from .utils.query_budget import init_query_budget
+from .services.catalog_events import init_catalog_events
+from .services.catalog_snapshot import catalog_snapshot
+from .services.category_registry import category_registry
+from .services.chunked_uploads import chunked_uploads
+from .services.view_counter import view_counter
+from .services.suggest_index import suggest_index
 from datetime import timedelta
 
 def create_app():
@@ -14,21 +27,118 @@ def create_app():
     db_path = os.path.join(app.instance_path, "app.db")
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("SQLALCHEMY_DATABASE_URI",f"sqlite:///{db_path}",)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # upper bounds of the price facet buckets in list_products
+    app.config["PRODUCT_PRICE_BUCKETS"] = [
+        float(x) for x in os.environ.get("PRODUCT_PRICE_BUCKETS", "1,5,10,25,50,100").split(",")
+    ]
+    # Optional read replica for catalog GETs (a second sqlite file works locally)
+    replica_uri = os.environ.get("SQLALCHEMY_REPLICA_URI")
+    if replica_uri:
+        app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: replica_uri}
+    app.config["REPLICA_STICKY_SECONDS"] = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+    app.config["REPLICA_CHECK_INTERVAL"] = int(os.environ.get("REPLICA_CHECK_INTERVAL", 5))
+    app.config["REPLICA_MAX_LAG"] = float(os.environ.get("REPLICA_MAX_LAG", 5))
+    app.config["REPLICA_RETRY_AFTER"] = int(os.environ.get("REPLICA_RETRY_AFTER", 30))
+    # e.g. postgres: SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    app.config["REPLICA_LAG_SQL"] = os.environ.get("REPLICA_LAG_SQL")
+    # Prometheus /metrics; workers share METRICS_DIR (default instance/metrics)
+    app.config["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "1") != "0"
+    app.config["METRICS_DIR"] = os.environ.get("METRICS_DIR")
+    app.config["METRICS_FLUSH_INTERVAL"] = int(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+    app.config["METRICS_STATEMENT_HEADER"] = os.environ.get("METRICS_STATEMENT_HEADER") == "1"
+    # Query budgets / N+1 detection: off | warn (staging) | raise (tests)
+    app.config["QUERY_BUDGET_MODE"] = os.environ.get("QUERY_BUDGET_MODE", "off")
+    app.config["QUERY_BUDGET_NPLUS1_THRESHOLD"] = int(os.environ.get("QUERY_BUDGET_NPLUS1_THRESHOLD", 3))
+    app.config["QUERY_BUDGET_DEFAULT"] = int(os.environ["QUERY_BUDGET_DEFAULT"]) if os.environ.get("QUERY_BUDGET_DEFAULT") else None
+    # Product.viewed is buffered per worker and flushed in batches
+    app.config["VIEW_COUNTER_ENABLED"] = os.environ.get("VIEW_COUNTER_ENABLED", "1") != "0"
+    app.config["VIEW_FLUSH_INTERVAL"] = float(os.environ.get("VIEW_FLUSH_INTERVAL", 10))
+    app.config["VIEW_FLUSH_MAX_PENDING"] = int(os.environ.get("VIEW_FLUSH_MAX_PENDING", 5000))
+    app.config["PINNED_LIMIT"] = int(os.environ.get("PINNED_LIMIT", 50))
+    app.config["PRODUCT_CACHE_SIZE"] = int(os.environ.get("PRODUCT_CACHE_SIZE", 10000))
+    app.config["BATCH_GET_MAX"] = int(os.environ.get("BATCH_GET_MAX", 500))
+    app.config["CHANGES_MAX"] = int(os.environ.get("CHANGES_MAX", 1000))
+    # gzipped NDJSON catalog for cold starts, rebuilt when catalog_stamp moves (see app/services/catalog_snapshot.py)
+    app.config["SNAPSHOT_ENABLED"] = os.environ.get("SNAPSHOT_ENABLED", "1") != "0"
+    app.config["SNAPSHOT_DIR"] = os.environ.get("SNAPSHOT_DIR")
+    app.config["SNAPSHOT_INTERVAL"] = float(os.environ.get("SNAPSHOT_INTERVAL", 30))
+    app.config["SNAPSHOT_KEEP"] = int(os.environ.get("SNAPSHOT_KEEP", 2))
+    app.config["SNAPSHOT_MAX_AGE"] = int(os.environ.get("SNAPSHOT_MAX_AGE", 60))
+    app.config["PRODUCT_NEGATIVE_TTL"] = float(os.environ.get("PRODUCT_NEGATIVE_TTL", 30))
+    # type-ahead prefix index, built in the background on first use; SUGGEST_PRELOAD=1 builds it in
+    # create_app instead (once before fork under gunicorn --preload, else once per worker at boot)
+    app.config["SUGGEST_PRELOAD"] = os.environ.get("SUGGEST_PRELOAD") == "1"
+    app.config["SUGGEST_SCAN_LIMIT"] = int(os.environ.get("SUGGEST_SCAN_LIMIT", 500))
+    app.config["SUGGEST_PIN_BOOST"] = int(os.environ.get("SUGGEST_PIN_BOOST", 1000000))
+    # gzip/brotli for JSON responses of COMPRESS_MIN_SIZE bytes or more
+    app.config["COMPRESS_ENABLED"] = os.environ.get("COMPRESS_ENABLED", "1") != "0"
+    app.config["COMPRESS_MIN_SIZE"] = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+    app.config["COMPRESS_LEVEL"] = int(os.environ.get("COMPRESS_LEVEL", 6))
+    app.config["COMPRESS_BR_QUALITY"] = int(os.environ.get("COMPRESS_BR_QUALITY", 4))
+    # orjson-backed app.json when orjson is installed ("default" = Flask's encoder)
+    app.config["JSON_PROVIDER"] = os.environ.get("JSON_PROVIDER", "orjson")
+    # price_format is rendered per request for Accept-Language / X-Currency (see app/utils/prices.py)
+    app.config["DEFAULT_LOCALE"] = os.environ.get("DEFAULT_LOCALE", "en")
+    app.config["PRICE_LOCALES"] = os.environ.get("PRICE_LOCALES", "en,km,zh,fr").split(",")
+    app.config["BASE_CURRENCY"] = os.environ.get("BASE_CURRENCY", "USD")
+    app.config["DEFAULT_CURRENCY"] = os.environ.get("DEFAULT_CURRENCY", app.config["BASE_CURRENCY"])
+    app.config["CURRENCY_RATES"] = parse_rates(os.environ.get("CURRENCY_RATES", "KHR=4100"), app.config["BASE_CURRENCY"])
+    # resumable chunked image uploads (see app/upload/routes.py); chunks must fit MAX_CONTENT_LENGTH
+    app.config["UPLOAD_TMP_DIR"] = os.environ.get("UPLOAD_TMP_DIR")
+    app.config["UPLOAD_MAX_SIZE"] = int(os.environ.get("UPLOAD_MAX_SIZE", 50 * 1024 * 1024))
+    app.config["UPLOAD_CHUNK_SIZE"] = int(os.environ.get("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+    app.config["UPLOAD_SESSION_TTL"] = int(os.environ.get("UPLOAD_SESSION_TTL", 86400))
+    # `flask gc-uploads` leaves files younger than this alone (saves waiting for their commit)
+    app.config["UPLOAD_GC_GRACE"] = int(os.environ.get("UPLOAD_GC_GRACE", 86400))
+    # Idempotency-Key replay for POST/PUT/PATCH/DELETE (see app/utils/idempotency.py)
+    app.config["IDEMPOTENCY_ENABLED"] = os.environ.get("IDEMPOTENCY_ENABLED", "1") != "0"
+    app.config["IDEMPOTENCY_TTL"] = int(os.environ.get("IDEMPOTENCY_TTL", 86400))
+    app.config["IDEMPOTENCY_WAIT"] = float(os.environ.get("IDEMPOTENCY_WAIT", 10))
+    app.config["IDEMPOTENCY_LOCK_TIMEOUT"] = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+    app.config["IDEMPOTENCY_MAX_BODY"] = int(os.environ.get("IDEMPOTENCY_MAX_BODY", 256 * 1024))
+    # conflict retries for versioned writes without If-Match (see app/utils/optimistic.py)
+    app.config["OPTIMISTIC_RETRIES"] = int(os.environ.get("OPTIMISTIC_RETRIES", 5))
+    # ASGI mode (asgi.py): hot reads on an async engine, the rest on a thread pool
+    app.config["ASYNC_VIEWS"] = os.environ.get("ASYNC_VIEWS", "1") != "0"
+    app.config["SQLALCHEMY_ASYNC_URI"] = os.environ.get("SQLALCHEMY_ASYNC_URI")
+    app.config["ASYNC_POOL_SIZE"] = int(os.environ.get("ASYNC_POOL_SIZE", 20))
+    app.config["ASYNC_SYNC_THREADS"] = int(os.environ.get("ASYNC_SYNC_THREADS", 16))
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "dev-secret-change-me")
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=1)
     app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=30)
 
+    init_json(app)
+
     # Init extensions
     db.init_app(app)
     jwt.init_app(app)
     cors.init_app(app, resources={r"/*": {"origins": "*"}})
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, render_as_batch=True)
+    init_routing(app, db)
+    init_metrics(app)
+    init_compression(app)
+    init_prices(app)
+    init_idempotency(app)
+    init_query_budget(app)
+    init_catalog_events(app)
+    view_counter.init_app(app)
+    suggest_index.init_app(app)
+    chunked_uploads.init_app(app)
+    catalog_snapshot.init_app(app)
 
     # Register blueprints
     from .auth import bp as auth_bp; app.register_blueprint(auth_bp)
     from .product import bp as product_bp; app.register_blueprint(product_bp)
     from .category import bp as category_bp; app.register_blueprint(category_bp)
     from .cart import bp as cart_bp; app.register_blueprint(cart_bp)
+    from .upload import bp as upload_bp; app.register_blueprint(upload_bp)
+
+    # CLI
+    from .seed import seed_cli; app.cli.add_command(seed_cli)
+    from .explain import explain_cmd; app.cli.add_command(explain_cmd)
+    from .gc import gc_uploads_cmd; app.cli.add_command(gc_uploads_cmd)
+    from .services.catalog_snapshot import snapshot_cmd; app.cli.add_command(snapshot_cmd)
 
     @app.get("/")
     def health():
@@ -66,5 +176,8 @@ def create_app():
         for rule in app.url_map.iter_rules():
             print(sorted(rule.methods), rule.rule)
         db.create_all()
+        category_registry.load()
+        if app.config["SUGGEST_PRELOAD"]:
+            suggest_index.load()
 
     return app
\ No newline at end of file
@@ -0,0 +1,257 @@
+# app/asgi.py
+"""
+Optional ASGI serving mode (see asgi.py at the repo root):
+
+    uvicorn asgi:application --workers 4
+
+Body-less requests for endpoints in ASYNC_VIEWS (app/utils/async_views.py)
+run on the event loop: the Flask request context, before/after_request hooks
+and error handlers behave as under WSGI, but the view is awaited and its
+queries go through the async engine (app/utils/async_db.py), with the same
+@use_replica routing and @query_budget limits as the sync view. An async
+view that raises Fallback hands over to the sync view in the thread pool
+within the same request, so the hooks still run once; so does an inline
+view (a sync view over an in-memory cache) whose cache would reload first.
+Everything else (writes, auth, uploads) runs the unchanged Flask app in a
+thread pool of ASYNC_SYNC_THREADS, streaming the response back to the loop,
+so behaviour never depends on which path served a request.
+
+Request bodies are never buffered here: the pool thread pulls them from the
+ASGI channel as the app reads (chunked uploads go to disk as under WSGI).
+A declared Content-Length over MAX_CONTENT_LENGTH is a 413 from werkzeug as
+usual, and a body that sends more than that without declaring it is cut off
+with a 413 as soon as it crosses the limit.
+
+ASYNC_VIEWS=0 sends every request through the thread pool, which makes the
+two paths easy to compare with bench/http_bench.py --mode asgi.
+"""
+import asyncio
+import contextvars
+import functools
+import inspect
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+from flask.signals import request_started
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+
+from .utils.async_db import async_db
+from .utils.async_views import ASYNC_VIEWS, Fallback, Inline
+
+
+def _environ(scope, stream):
+    """WSGI environ for an ASGI http scope."""
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode().decode("latin-1"),
+        "PATH_INFO": path.encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": stream,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if not any(name == b"content-length" for name, _ in scope.get("headers", ())):
+        environ["wsgi.input_terminated"] = True     # chunked: read the stream to its end
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    for name, value in scope.get("headers", ()):
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _has_body(scope):
+    for name, value in scope.get("headers", ()):
+        if name == b"transfer-encoding" or (name == b"content-length" and value.strip() != b"0"):
+            return True
+    return False
+
+
+class _Body(io.RawIOBase):
+    """wsgi.input for a pool thread: pulls http.request messages from the
+    loop only as the app reads, and raises 413 past `limit` bytes."""
+
+    def __init__(self, receive, loop, limit):
+        self._receive = receive
+        self._loop = loop
+        self._limit = limit
+        self._buffer = b""
+        self._received = 0
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def _pull(self):
+        message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+        if message["type"] != "http.request":       # http.disconnect
+            self._done = True
+            return
+        chunk = message.get("body", b"")
+        self._received += len(chunk)
+        if self._limit is not None and self._received > self._limit:
+            self._done = True
+            raise RequestEntityTooLarge()
+        self._buffer += chunk
+        self._done = not message.get("more_body")
+
+    def readinto(self, b):
+        while not self._buffer and not self._done:
+            self._pull()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _start(status, headers):
+    return {
+        "type": "http.response.start",
+        "status": int(status.split(" ", 1)[0]),
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    }
+
+
+class AsgiApp:
+    def __init__(self, app):
+        self.app = app
+        self.async_views = app.config.get("ASYNC_VIEWS", True)
+        self.pool = ThreadPoolExecutor(app.config.get("ASYNC_SYNC_THREADS", 16), thread_name_prefix="wsgi")
+        async_db.init_app(app)
+        # importing the modules registers their async views
+        from .cart import async_routes as _cart            # noqa: F401
+        from .category import async_routes as _category    # noqa: F401
+        from .product import async_routes as _product      # noqa: F401
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        loop = asyncio.get_running_loop()
+        if self.async_views and not _has_body(scope):
+            environ = _environ(scope, io.BytesIO())
+            view = self._match(environ)
+            if view is not None:
+                return await self._dispatch(environ, view, send)
+        stream = io.BufferedReader(_Body(receive, loop, self.app.config.get("MAX_CONTENT_LENGTH")), 64 * 1024)
+        await loop.run_in_executor(self.pool, self._call_wsgi, _environ(scope, stream), loop, send)
+
+    def _match(self, environ):
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:       # 404/405/redirects: let Flask answer
+            return None
+        return ASYNC_VIEWS.get(endpoint)
+
+    async def _dispatch(self, environ, view, send):
+        """Flask's full_dispatch_request, awaiting the view."""
+        app = self.app
+        app._got_first_request = True
+        ctx = app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            try:
+                try:
+                    request_started.send(app, _async_wrapper=app.ensure_sync)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await self._view(view)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            await self._send_response(response, environ, send)
+        finally:
+            ctx.pop(error)
+
+    async def _view(self, view):
+        sync_view = self.app.view_functions[request.url_rule.endpoint]
+        if isinstance(view, Inline):
+            if view.ready():
+                return sync_view(**request.view_args)
+            return await self._in_pool(sync_view)      # it would reload a cache first
+        try:
+            rv = view(**request.view_args)
+            return await rv if inspect.isawaitable(rv) else rv
+        except Fallback:
+            return await self._in_pool(sync_view)
+
+    async def _in_pool(self, sync_view):
+        # same request context, hooks already run: only the view moves to the pool
+        call = functools.partial(contextvars.copy_context().run, sync_view, **request.view_args)
+        return await asyncio.get_running_loop().run_in_executor(self.pool, call)
+
+    @staticmethod
+    async def _send_response(response, environ, send):
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        await send(_start(status, headers))
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        await send({"type": "http.response.body", "body": b""})
+
+    def _call_wsgi(self, environ, loop, send):
+        """Run the sync app in a pool thread, passing each chunk to the loop."""
+        head = []
+
+        def start_response(status, headers, exc_info=None):
+            head[:] = [status, headers]
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        app_iter = self.app.wsgi_app(environ, start_response)
+        started = False
+        try:
+            for chunk in app_iter:
+                if not chunk:
+                    continue
+                if not started:
+                    emit(_start(*head))
+                    started = True
+                emit({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        if not started:
+            emit(_start(*head))
+        emit({"type": "http.response.body", "body": b""})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_db.dispose()
+                self.pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -0,0 +1,36 @@
+# app/cart/async_routes.py
+"""
+Async get_cart for the ASGI mode (app/asgi.py).
+
+Only reads an existing cart; creating one (unknown X-Cart-Id / X-Session-Id,
+or neither header) is a write and falls back to the sync view.
+"""
+from flask import request
+from sqlalchemy import select
+
+from ..model.cart import Cart
+from ..utils.async_db import async_db
+from ..utils.async_views import Fallback, async_view
+from ..utils.query_budget import query_budget
+from . import bp
+from .routes import _cart_ok
+
+
+@async_view(bp, "get_cart")
+@query_budget(3)
+async def get_cart():
+    query = select(Cart).where(Cart.status == "active")
+    cart_uuid = request.headers.get("X-Cart-Id")
+    sid = request.headers.get("X-Session-Id")
+    if cart_uuid:
+        query = query.where(Cart.uuid == cart_uuid)
+    elif sid:
+        query = query.where(Cart.session_id == sid)
+    else:
+        raise Fallback
+
+    async with async_db.session() as session:
+        cart = (await session.scalars(query.limit(1))).unique().first()
+    if cart is None:
+        raise Fallback
+    return _cart_ok("cart", cart, status=200)
@@ -1,9 +1,12 @@
 # app/cart/routes.py
 from __future__ import annotations
 from flask import request, jsonify
+from sqlalchemy import func
 from ..extensions import db
 from ..model import Product
 from ..model.cart import Cart, CartItem
+from ..utils.optimistic import check_if_match, etag, reject_stale, retry_stale
+from ..utils.query_budget import query_budget
 from . import bp
 
 def api_ok(msg, data=None): return {"ok": True, "message": msg, "data": data}
@@ -66,29 +69,40 @@ def _resolve_cart() -> Cart:
         return legacy
     return _get_or_create_cart_by_uuid(None)
 
+def _cart_ok(msg, cart: Cart, status=200):
+    resp = ok(msg, cart.as_api(), status=status)
+    resp.headers["X-Cart-Id"] = cart.uuid            # <- return UUID to client
+    resp.set_etag(etag(cart.version))
+    return resp
+
+def _touch(cart: Cart):
+    # item edits bump the cart row too: its version guards the whole cart
+    cart.updated_at = func.now()
+
 # ---- endpoints -------------------------------------------------------------
 
 @bp.get("")
+@query_budget(3)
 def get_cart():
     cart = _resolve_cart()
-    resp = ok("cart", cart.as_api(), status=200)
-    resp.headers["X-Cart-Id"] = cart.uuid            # <- return UUID to client
-    return resp
+    return _cart_ok("cart", cart, status=200)
 
 @bp.post("")
 def create_or_get_cart():
     cart = _resolve_cart()
-    resp = ok("cart ready", cart.as_api(), status=201)
-    resp.headers["X-Cart-Id"] = cart.uuid
-    return resp
+    return _cart_ok("cart ready", cart, status=201)
 
 @bp.post("/items")
+@retry_stale(err)
 def add_item():
     """
     Body: { "product_id": int, "quantity" | "qty": int }
     Header: X-Cart-Id: <uuid>   (preferred)
     """
     cart = _resolve_cart()
+    failed = check_if_match(cart.version, err)
+    if failed:
+        return failed
     data = request.get_json(silent=True) or {}
     product_id = data.get("product_id")
     qty = int(data.get("quantity") or data.get("qty") or 1)
@@ -135,11 +149,10 @@ def add_item():
         )
         db.session.add(item)
 
+    _touch(cart)
     db.session.commit()
 
-    resp = ok("item added", cart.as_api(), status=201)
-    resp.headers["X-Cart-Id"] = cart.uuid
-    return resp
+    return _cart_ok("item added", cart, status=201)
 # ==============================================
 # ---- qty helpers -----------------------------------------------------------
 
@@ -172,6 +185,7 @@ def _find_item_by_product(cart: Cart, product_id: int) -> CartItem | None:
 # ---- update by cart-item id ------------------------------------------------
 @bp.put("/items/<int:item_id>")
 @bp.patch("/items/<int:item_id>")
+@reject_stale(err)
 def update_item(item_id: int):
     """
     Body: { "quantity": int }
@@ -181,6 +195,9 @@ def update_item(item_id: int):
       - enforce stock limits
     """
     cart = _resolve_cart()
+    failed = check_if_match(cart.version, err)
+    if failed:
+        return failed
     item: CartItem | None = next((i for i in cart.items if i.id == item_id), None)
     if not item:
         return err("item not found in this cart", 404)
@@ -201,15 +218,15 @@ def update_item(item_id: int):
         return err(f"minimum order is {product.minimum_order}", 422)
 
     item.quantity = qty
+    _touch(cart)
     db.session.commit()
 
-    resp = ok("item updated", cart.as_api(), status=200)
-    resp.headers["X-Cart-Id"] = cart.uuid
-    return resp
+    return _cart_ok("item updated", cart, status=200)
 
 # ---- update by product_id (alternative) ------------------------------------
 @bp.put("/items/by-product/<int:product_id>")
 @bp.patch("/items/by-product/<int:product_id>")
+@reject_stale(err)
 def update_item_by_product(product_id: int):
     """
     Body: { "quantity": int }
@@ -220,6 +237,9 @@ def update_item_by_product(product_id: int):
       - create the item if it doesn't exist yet
     """
     cart = _resolve_cart()
+    failed = check_if_match(cart.version, err)
+    if failed:
+        return failed
     data = request.get_json(silent=True) or {}
 
     if "quantity" not in data:
@@ -259,70 +279,80 @@ def update_item_by_product(product_id: int):
             quantity=qty,
         ))
 
+    _touch(cart)
     db.session.commit()
-    resp = ok("item updated", cart.as_api(), status=200)
-    resp.headers["X-Cart-Id"] = cart.uuid
-    return resp
+    return _cart_ok("item updated", cart, status=200)
 # ==============================================================================
 # ---- remove a single item by cart-item id ----------------------------------
 @bp.delete("/items/<int:item_id>")
+@reject_stale(err)
 def remove_item(item_id: int):
     cart = _resolve_cart()
+    failed = check_if_match(cart.version, err)
+    if failed:
+        return failed
     item: CartItem | None = next((i for i in cart.items if i.id == item_id), None)
     if not item:
         return err("item not found in this cart", 404)
 
     db.session.delete(item)
+    _touch(cart)
     db.session.commit()
 
-    resp = ok("item removed", cart.as_api(), status=200)
-    resp.headers["X-Cart-Id"] = cart.uuid
-    return resp
+    return _cart_ok("item removed", cart, status=200)
 
 
 # ---- remove a single item by product_id ------------------------------------
 @bp.delete("/items/by-product/<int:product_id>")
+@reject_stale(err)
 def remove_item_by_product(product_id: int):
     cart = _resolve_cart()
+    failed = check_if_match(cart.version, err)
+    if failed:
+        return failed
     item = next((i for i in cart.items if i.product_id == product_id), None)
     if not item:
         return err("item not found in this cart", 404)
 
     db.session.delete(item)
+    _touch(cart)
     db.session.commit()
 
-    resp = ok("item removed", cart.as_api(), status=200)
-    resp.headers["X-Cart-Id"] = cart.uuid
-    return resp
+    return _cart_ok("item removed", cart, status=200)
 
 
 # ---- clear all items (empty the cart, keep same cart uuid) -----------------
 @bp.delete("/items")
+@reject_stale(err)
 def clear_cart_items():
     cart = _resolve_cart()
+    failed = check_if_match(cart.version, err)
+    if failed:
+        return failed
     # because of cascade="all, delete-orphan", clearing the list deletes rows
     cart.items.clear()
+    _touch(cart)
     db.session.commit()
 
-    resp = ok("all items removed", cart.as_api(), status=200)
-    resp.headers["X-Cart-Id"] = cart.uuid
-    return resp
+    return _cart_ok("all items removed", cart, status=200)
 
 
 # ---- remove the cart itself (soft-delete + hand back a fresh cart) ---------
 @bp.delete("")
+@reject_stale(err)
 def remove_cart():
     """
     Marks the current cart as 'abandoned' (soft delete) and returns a fresh empty cart.
     This avoids clients holding an X-Cart-Id that points to a non-active cart.
     """
     cart = _resolve_cart()
+    failed = check_if_match(cart.version, err)
+    if failed:
+        return failed
     cart.status = "abandoned"
     db.session.commit()
 
     # hand back a new active cart
     new_cart = _get_or_create_cart_by_uuid(None)
 
-    resp = ok("cart removed; new cart ready", new_cart.as_api(), status=200)
-    resp.headers["X-Cart-Id"] = new_cart.uuid
-    return resp
+    return _cart_ok("cart removed; new cart ready", new_cart, status=200)
@@ -0,0 +1,12 @@
+# app/category/async_routes.py
+"""
+Category reads for the ASGI mode (app/asgi.py). Both are served from the
+per-worker category_registry, so the sync views run as-is on the event loop
+while it is current; a stale registry reloads in a worker thread.
+"""
+from ..services.category_registry import category_registry
+from ..utils.async_views import inline_view
+from . import bp
+
+inline_view(bp, "list_categories", category_registry.is_current)
+inline_view(bp, "get_category", category_registry.is_current)
@@ -1,10 +1,12 @@
 # --- category/routes.py ---
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from flask_jwt_extended import jwt_required
-from sqlalchemy import or_, asc, desc
+from sqlalchemy import or_, asc, desc, exists, select
 from ..model import Category, Product
 from ..extensions import db
+from ..services.category_registry import category_registry
 from app.utils.decorators import require_headers
+from app.utils.db_routing import use_replica
 from . import bp
 # ------------------------ helpers ------------------------
 def _to_int(v, default=None):
@@ -13,18 +15,18 @@ def _to_int(v, default=None):
     except (TypeError, ValueError): 
         return default
 
-def _paginate(query, page, per_page):
+def _paginate(items, page, per_page):
     page = max(_to_int(page, 1), 1)
     per_page = min(max(_to_int(per_page, 10), 1), 100)
-    items = query.paginate(page=page, per_page=per_page, error_out=False)
+    total = len(items)
     return {
         "meta": {
-            "page": items.page,
-            "pages": items.pages or 1,
+            "page": page,
+            "pages": (total + per_page - 1) // per_page or 1,
             "per_page": per_page,
-            "total": items.total,
+            "total": total,
         },
-        "items": items.items,
+        "items": items[(page - 1) * per_page: page * per_page],
     }
 # ------------------------ CATEGORY ROUTES ------------------------
 
@@ -47,6 +49,7 @@ def create_category():
 @bp.get("/")
 @require_headers
 @jwt_required()
+@use_replica
 def list_categories():
     """
     q        -> substring match on name
@@ -59,30 +62,23 @@ def list_categories():
     page = request.args.get("page")
     per_page = request.args.get("per_page")
 
-    qry = Category.query
-    if q:
-        qry = qry.filter(Category.name.ilike(f"%{q}%"))
-
-    sort_map = {
-        "id": Category.id,
-        "-id": desc(Category.id),
-        "name": Category.name,
-        "-name": desc(Category.name),
-    }
-    qry = qry.order_by(sort_map.get(sort, Category.name))
-    page_data = _paginate(qry, page, per_page)
+    # served from the per-worker registry, no query
+    page_data = _paginate(category_registry.search(q, sort), page, per_page)
 
     return jsonify(
         meta=page_data["meta"],
-        categories=[c.as_dict() for c in page_data["items"]],
+        categories=[category_registry.with_count(c) for c in page_data["items"]],
     )
 
 @bp.get("/<int:cid>")
 @require_headers
 @jwt_required()
+@use_replica
 def get_category(cid):
-    c = Category.query.get_or_404(cid)
-    return jsonify(category=c.as_dict())
+    c = category_registry.get(cid)
+    if c is None:
+        abort(404)
+    return jsonify(category=category_registry.with_count(c))
 
 
 @bp.put("/<int:cid>")
@@ -109,9 +105,11 @@ def update_category(cid):
 @require_headers
 @jwt_required()
 def delete_category(cid):
-    if Product.query.filter_by(category_id=cid).first():
+    # row lock, then a live EXISTS in the same transaction: the registry's
+    # per-worker count can lag a product that was just moved in
+    c = Category.query.filter_by(id=cid).with_for_update().first_or_404()
+    if db.session.scalar(select(exists().where(Product.category_id == cid))):
         return jsonify(msg="cannot delete: category has products"), 409
-    c = Category.query.get_or_404(cid)
     db.session.delete(c)
     db.session.commit()
     return jsonify(msg="deleted"), 200
\ No newline at end of file
@@ -0,0 +1,125 @@
+# app/explain.py
+"""
+Index audit: `flask explain`
+
+Builds the queries each endpoint actually issues (through the same helpers
+the routes use), runs EXPLAIN on them and flags full table scans and
+temp-table sorts.
+
+    flask explain                 # all endpoints
+    flask explain -e products     # only endpoints whose name contains "products"
+    flask explain --strict        # exit 1 when a full scan is found (CI)
+"""
+import click
+from sqlalchemy import func, select, text
+
+from .extensions import db
+from .model import Cart, CartItem, Product, RefreshToken, User, UserFavorite
+
+
+def _product_list(args, per_page=15):
+    from .product.routes import _filter_products, _parse_bool, _sort_products
+
+    query = _sort_products(_filter_products(Product.query, args), args.get("sort"),
+                           pinned_first=_parse_bool(args.get("pinned_first")))
+    return [
+        ("page", query.limit(per_page).statement),
+        ("count", select(func.count()).select_from(query.order_by(None).subquery())),
+    ]
+
+
+def endpoint_queries():
+    """endpoint label -> [(variant, statement)]"""
+    return {
+        "products.list_products": _product_list({}),
+        "products.list_products?sort=price": _product_list({"sort": "price"}),
+        "products.list_products?category_id": _product_list({"category_id": "1"}),
+        "products.list_products?category_id&price range&sort=price": _product_list(
+            {"category_id": "1", "min_price": "1", "max_price": "20", "sort": "price"}),
+        "products.list_products?min_price&max_price": _product_list({"min_price": "1", "max_price": "20"}),
+        "products.list_products?sort=-viewed": _product_list({"sort": "-viewed"}),
+        "products.list_products?pinned_first": _product_list({"pinned_first": "1"}),
+        "products.list_pinned (cache load)": [("load", select(Product).where(Product.is_pin.is_(True))
+                                               .order_by(Product.sort_order, Product.id).limit(50))],
+        "products.list_products?in_stock=false": _product_list({"in_stock": "false"}),
+        "products.list_products?barcode": _product_list({"barcode": "8850000000017"}),
+        "products.list_products?q": _product_list({"q": "beer"}),
+        "products.get_product": [("get", Product.query.filter(Product.id == 1).statement)],
+        "products (favorite membership)": [("get", select(UserFavorite.product_id).where(
+            UserFavorite.user_id == 1, UserFavorite.product_id.in_([1, 2, 3])))],
+        "products.list_favorites": [("page", Product.query.join(UserFavorite, UserFavorite.product_id == Product.id)
+                                     .filter(UserFavorite.user_id == 1)
+                                     .order_by(UserFavorite.created_at.desc(), UserFavorite.product_id.desc())
+                                     .limit(15).statement)],
+        "categories (registry load)": [("counts", select(Product.category_id, func.count())
+                                        .where(Product.category_id.isnot(None)).group_by(Product.category_id))],
+        "cart (resolve by uuid)": [("get", Cart.query.filter_by(status="active")
+                                    .filter(Cart.uuid == "x").limit(1).statement)],
+        "cart (resolve by session)": [("get", Cart.query.filter_by(status="active", session_id="x")
+                                       .limit(1).statement)],
+        "cart (items)": [("get", select(CartItem).where(CartItem.cart_id == 1))],
+        "auth.login": [("get", User.query.filter_by(email="a@b.c").limit(1).statement)],
+        "auth.refresh": [("get", RefreshToken.query.filter_by(token="x").limit(1).statement)],
+    }
+
+
+def _compile(stmt):
+    return str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def explain(stmt):
+    """(plan lines, problems) for one statement on the current engine."""
+    sql = _compile(stmt)
+    problems = []
+    with db.engine.connect() as conn:
+        if db.engine.dialect.name == "sqlite":
+            rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+            lines = [row[3] for row in rows]
+            # the outer level of a LIMITed eager-load wraps a tiny subquery
+            # (anon_N); scanning and re-sorting that is not a table scan
+            outer_subquery = any(r[1] == 0 and r[3].startswith("SCAN anon_") for r in rows)
+            sorted_parents = {r[1] for r in rows if "USE TEMP B-TREE FOR ORDER BY" in r[3]}
+            limited = " LIMIT " in sql
+            for _id, parent, _, line in rows:
+                if line.startswith("SCAN anon_"):
+                    continue
+                if line.startswith("SCAN ") and " USING " not in line:
+                    if limited and parent not in sorted_parents:
+                        # walks the table in rowid (= ORDER BY id) order and stops at LIMIT
+                        problems.append(f"rowid-order scan, stops at LIMIT unless filters are selective: {line}")
+                    else:
+                        problems.append(f"full scan: {line}")
+                elif "USE TEMP B-TREE" in line and not (parent == 0 and outer_subquery):
+                    problems.append(f"sort without index: {line}")
+        else:
+            lines = [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+            for line in lines:
+                if "Seq Scan on" in line:
+                    problems.append(f"full scan: {line.strip()}")
+                elif line.strip().startswith("Sort "):
+                    problems.append(f"sort without index: {line.strip()}")
+    return lines, problems
+
+
+@click.command("explain")
+@click.option("-e", "--endpoint", "only", default=None, help="substring filter on endpoint names")
+@click.option("--strict", is_flag=True, help="exit with status 1 when a full scan is found")
+@click.option("-v", "--verbose", is_flag=True, help="print full plans")
+def explain_cmd(only, strict, verbose):
+    """EXPLAIN every endpoint query and flag full scans."""
+    scans = 0
+    for endpoint, variants in endpoint_queries().items():
+        if only and only not in endpoint:
+            continue
+        for variant, stmt in variants:
+            lines, problems = explain(stmt)
+            status = click.style("ok", fg="green") if not problems else click.style("WARN", fg="yellow")
+            click.echo(f"[{status}] {endpoint} ({variant})")
+            if verbose:
+                for line in lines:
+                    click.echo(f"        {line}")
+            for p in problems:
+                click.echo(f"        {p}")
+            scans += sum(p.startswith("full scan") for p in problems)
+    if strict and scans:
+        raise SystemExit(1)
@@ -0,0 +1,111 @@
+# app/gc.py
+"""
+Orphaned upload collector: `flask gc-uploads`
+
+Files in static/uploads that no product_image.image_path references (left by
+delete_product, by replaced images whose delete failed, or by a commit that
+failed after the file was saved) are deleted once they are older than the
+grace period. Expired chunked uploads in UPLOAD_TMP_DIR go too.
+
+    flask gc-uploads --dry-run          # report only
+    flask gc-uploads --grace 3600       # files untouched for an hour
+
+The directory is read with scandir and checked against the database in
+batches of --batch names (one indexed IN query each), so neither side is
+ever held in memory whole. Safe to run next to live traffic: a file is only
+saved moments before the commit that references it and a finished chunked
+upload is touched when it is moved in, so anything younger than the grace
+period is skipped, and every batch is checked right before its deletes.
+"""
+import os
+import time
+
+import click
+from sqlalchemy import select
+
+from .extensions import db
+from .model import ProductImage
+from .services.chunked_uploads import chunked_uploads
+from .utils.uploads import UPLOAD_FOLDER, upload_dir
+
+
+def _size(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def _candidates(directory, cutoff, stats):
+    """(public_url, abs_path, size) of every file in directory older than cutoff."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False) or entry.name.startswith("."):
+                continue
+            stats["scanned"] += 1
+            st = entry.stat(follow_symlinks=False)
+            if st.st_mtime >= cutoff:
+                stats["young"] += 1
+                continue
+            yield f"/{UPLOAD_FOLDER}/{entry.name}", entry.path, st.st_size
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def collect(grace, batch_size=1000, dry_run=False):
+    """Delete unreferenced uploads older than `grace` seconds; returns the stats."""
+    stats = {"scanned": 0, "young": 0, "referenced": 0, "orphans": 0, "bytes": 0, "failed": 0}
+    directory = upload_dir()
+    if not os.path.isdir(directory):
+        return stats
+    cutoff = time.time() - grace
+    for batch in _batches(_candidates(directory, cutoff, stats), batch_size):
+        urls = [url for url, _, _ in batch]
+        used = set(db.session.scalars(select(ProductImage.image_path).where(ProductImage.image_path.in_(urls))))
+        db.session.rollback()       # end the read transaction between batches
+        for url, path, size in batch:
+            if url in used:
+                stats["referenced"] += 1
+                continue
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except OSError:
+                    stats["failed"] += 1
+                    continue
+            stats["orphans"] += 1
+            stats["bytes"] += size
+    return stats
+
+
+@click.command("gc-uploads")
+@click.option("--grace", type=int, default=None, help="only files older than this many seconds [UPLOAD_GC_GRACE]")
+@click.option("--batch", "batch_size", type=int, default=1000, show_default=True, help="file names per DB lookup")
+@click.option("--dry-run", is_flag=True, help="report what would be deleted")
+def gc_uploads_cmd(grace, batch_size, dry_run):
+    """Delete upload files no product image references."""
+    from flask import current_app
+
+    if grace is None:
+        grace = current_app.config.get("UPLOAD_GC_GRACE", 86400)
+    started = time.monotonic()
+    stats = collect(grace, batch_size, dry_run)
+    sessions, session_bytes = chunked_uploads.sweep(grace, dry_run)
+    verb = "would reclaim" if dry_run else "reclaimed"
+    click.echo(
+        f"{stats['scanned']} files scanned: {stats['referenced']} referenced, "
+        f"{stats['young']} within the {grace}s grace period, {stats['orphans']} orphaned"
+    )
+    if stats["failed"]:
+        click.echo(f"{stats['failed']} orphans could not be deleted", err=True)
+    click.echo(f"{sessions} expired chunked uploads")
+    click.echo(f"{verb} {_size(stats['bytes'] + session_bytes)} in {time.monotonic() - started:.1f}s")
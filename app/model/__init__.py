@@ -4,6 +4,9 @@ from .user import User, RefreshToken
 from .product import Product, ProductImage
 from .category import Category
 from .cart import Cart, CartItem
+from .favorite import UserFavorite
+from .idempotency import IdempotencyKey
+from .catalog_change import CatalogSequence, ProductTombstone
 from .types import GUID
 
 __all__ = [
@@ -14,6 +17,10 @@ __all__ = [
     "Category",
     "Cart",
     "CartItem",
+    "UserFavorite",
+    "IdempotencyKey",
+    "CatalogSequence",
+    "ProductTombstone",
     
     "GUID",
 ]
\ No newline at end of file
@@ -18,6 +18,10 @@ class Cart(db.Model):
     status = db.Column(db.String(16), default="active", index=True)  # active, checked_out, abandoned
     created_at = db.Column(db.DateTime, server_default=func.now())
     updated_at = db.Column(db.DateTime, onupdate=func.now(), server_default=func.now())
+    # optimistic concurrency: item writes also touch the cart row, so its
+    # version is the cart's ETag and concurrent edits of one cart conflict
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
 
     items = db.relationship(
         "CartItem",
@@ -38,6 +42,7 @@ class Cart(db.Model):
             "id": self.id,
             "uuid": self.uuid,                     # expose uuid to client
             "status": self.status,
+            "version": self.version,
             "items": [i.as_api() for i in self.items],
             "subtotal": str(self.subtotal_dec()),
             "total": str(self.total_dec()),
@@ -60,6 +65,8 @@ class CartItem(db.Model):
 
     created_at = db.Column(db.DateTime, server_default=func.now())
     updated_at = db.Column(db.DateTime, onupdate=func.now(), server_default=func.now())
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
 
     product = db.relationship("Product", lazy="joined")
 
@@ -0,0 +1,22 @@
+# app/model/catalog_change.py
+from ..extensions import db
+from sqlalchemy.sql import func
+
+class CatalogSequence(db.Model):
+    """Single-row counter handing out Product.change_seq / tombstone numbers.
+
+    Allocation is an UPDATE of this row inside the writing transaction, so
+    concurrent catalog writers take numbers in commit order (see
+    app/services/catalog_events.py).
+    """
+    __tablename__ = "catalog_sequence"
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ProductTombstone(db.Model):
+    """Delete log for GET /api/products/changes."""
+    __tablename__ = "product_tombstone"
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.BigInteger, nullable=False, unique=True)
+    deleted_at = db.Column(db.DateTime, server_default=func.now())
@@ -0,0 +1,14 @@
+# app/model/favorite.py
+from sqlalchemy.sql import func
+from ..extensions import db
+
+class UserFavorite(db.Model):
+    __tablename__ = "user_favorite"
+    # (user_id, product_id) primary key doubles as the membership index;
+    # (user_id, created_at, product_id) serves the newest-first favorites page
+    __table_args__ = (
+        db.Index("ix_user_favorite_user_created", "user_id", "created_at", "product_id"),
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="CASCADE"), primary_key=True, index=True)
+    created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
@@ -0,0 +1,13 @@
+# app/model/idempotency.py
+from ..extensions import db
+
+class IdempotencyKey(db.Model):
+    """First response to an Idempotency-Key request (see app/utils/idempotency.py)."""
+    __tablename__ = "idempotency_key"
+    key = db.Column(db.String(255), primary_key=True)
+    scope = db.Column(db.String(64), primary_key=True)          # sha256(method, path, credentials)
+    fingerprint = db.Column(db.String(64), nullable=False)      # sha256(query string, body)
+    status = db.Column(db.Integer)                              # NULL while the first request runs
+    headers = db.Column(db.JSON)
+    body = db.Column(db.LargeBinary)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -1,9 +1,19 @@
 # app/model/product.py
 from ..extensions import db
+from ..services.category_registry import category_registry
 from sqlalchemy.sql import func
 
 class Product(db.Model):
     __tablename__ = "product"
+    # composite indexes match the filter/sort shapes list_products issues
+    __table_args__ = (
+        db.Index("ix_product_category_price_id", "category_id", "price", "id"),
+        db.Index("ix_product_category_id_id", "category_id", "id"),
+        db.Index("ix_product_price_id", "price", "id"),
+        db.Index("ix_product_quantity", "quantity"),
+        db.Index("ix_product_viewed", "viewed"),
+        db.Index("ix_product_change_seq_id", "change_seq", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     barcode = db.Column(db.String(180), nullable=False, unique=True)
     slug = db.Column(db.String(255), index=True)
@@ -26,6 +36,11 @@ class Product(db.Model):
     viewed = db.Column(db.Integer, default=0)
     is_favourite = db.Column(db.Boolean, default=False)
     reviewable = db.Column(db.Boolean, default=True)
+    # optimistic concurrency: every ORM UPDATE/DELETE is "... WHERE version = <read version>"
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+    # position in the catalog change feed (GET /api/products/changes); set on every ORM write
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default="0")
 
     unit = db.Column(db.String(32))                  # e.g. "cup", "pcs"
     ean_code = db.Column(db.String(64))
@@ -38,7 +53,7 @@ class Product(db.Model):
         backref="product",
         cascade="all, delete-orphan",
         lazy="joined",
-        order_by="ProductImage.id.asc()",
+        order_by="[ProductImage.sort_order.asc(), ProductImage.id.asc()]",
     )
     category_id = db.Column(
         db.Integer,
@@ -73,19 +88,30 @@ class Product(db.Model):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "unit": self.unit,
             "ean_code": self.ean_code,
-            "category": self.category.as_dict() if self.category else None,
+            "category": category_registry.get(self.category_id),
+            "version": self.version,
         }
 
+# is_pin DESC: list_products?pinned_first orders by is_pin DESC, sort_order, id,
+# and the pinned list's is_pin = true lookup still seeks on the first column
+db.Index("ix_product_pin_sort_order_id", Product.is_pin.desc(), Product.sort_order, Product.id)
+
 class ProductImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False, index=True)
     name = db.Column(db.String(255))
-    image_path = db.Column(db.String(512))           # relative path on disk
+    image_path = db.Column(db.String(512), index=True)   # relative path on disk
     main = db.Column(db.Boolean, default=False)
 
     # If you already store full URL, keep it here; otherwise build it in as_api()
     image_url = db.Column(db.String(1024))
 
+    sort_order = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # read from the file header when the file is stored here; None for external URLs
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    size = db.Column(db.Integer)                     # bytes
+
     def as_api(self):
         return {
             "id": self.id,
@@ -93,4 +119,8 @@ class ProductImage(db.Model):
             "image_path": self.image_path,
             "main": self.main,
             "image_url": self.image_url,
+            "sort_order": self.sort_order,
+            "width": self.width,
+            "height": self.height,
+            "size": self.size,
         }
@@ -0,0 +1,132 @@
+# app/product/async_routes.py
+"""
+Async twins of the hot product reads, served on the event loop in the ASGI
+mode (app/asgi.py). Imported only by AsgiApp; the WSGI app never loads it.
+
+Filtering, sorting, pagination links and rendering are the sync module's
+helpers, so both modes return the same JSON; only the queries go through the
+async engine. Replica routing and query budgets match the sync views. Facet
+counts stay on the sync path (Fallback).
+"""
+from flask import abort, request
+from sqlalchemy import func, select
+
+from ..model import Product, UserFavorite
+from ..services.product_cache import product_cache
+from ..services.suggest_index import suggest_index
+from ..services.view_counter import view_counter
+from ..utils.api import items_ok
+from ..utils.async_db import async_db
+from ..utils.async_views import Fallback, async_view, inline_view
+from ..utils.db_routing import use_replica
+from ..utils.decorators import require_headers
+from ..utils.prices import price_formatter
+from ..utils.query_budget import query_budget
+from . import bp
+from .routes import (
+    _current_user_id, _filter_products, _page_links, _parse_bool, _render, _sort_products, _versioned, err, ok,
+)
+
+
+class _Page:
+    """The parts of Flask-SQLAlchemy's Pagination that _page_links reads."""
+
+    def __init__(self, page, per_page, total):
+        self.page = page
+        self.total = total
+        self.pages = -(-total // per_page) if total else 0
+        self.has_prev = page > 1
+        self.has_next = page < self.pages
+        self.prev_num = page - 1 if self.has_prev else None
+        self.next_num = page + 1 if self.has_next else None
+
+
+async def _favorite_ids(session, product_ids):
+    """Favorited subset of product_ids for the current user; None when anonymous."""
+    user_id = _current_user_id()
+    if user_id is None:
+        return None
+    if not product_ids:
+        return set()
+    rows = await session.execute(
+        select(UserFavorite.product_id).where(
+            UserFavorite.user_id == user_id, UserFavorite.product_id.in_(product_ids)
+        )
+    )
+    return {pid for (pid,) in rows}
+
+
+async def _cached_products(key, values):
+    """product_cache.get_many(), loading the misses on the async engine."""
+    found, missing, version = product_cache.lookup(key, values)
+    if missing:
+        # like the sync cache: never cache a lagging replica
+        async with async_db.session(primary=True) as session:
+            products = (await session.scalars(product_cache.load_query(key, missing))).unique().all()
+            product_cache.store(key, missing, [p.as_api() for p in products], found, version)
+    return found
+
+
+async def _decorated(item):
+    if _current_user_id() is None:
+        return _render(item, None, price_formatter())
+    async with async_db.session() as session:
+        return _render(item, await _favorite_ids(session, [item["id"]]), price_formatter())
+
+
+@async_view(bp, "list_products")
+@require_headers
+@use_replica
+@query_budget(5)
+async def list_products():
+    if request.args.get("facets"):
+        raise Fallback
+    page = max(request.args.get("page", default=1, type=int), 1)
+    per_page = max(1, min(request.args.get("per_page", default=15, type=int), 100))
+
+    try:
+        query = _filter_products(select(Product), request.args)
+    except ValueError:
+        return err("Invalid ids parameter; must be comma-separated integers")
+    query = _sort_products(query, request.args.get("sort"), pinned_first=_parse_bool(request.args.get("pinned_first")))
+
+    async with async_db.session() as session:
+        total = await session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        products = (await session.scalars(query.limit(per_page).offset((page - 1) * per_page))).unique().all()
+        favs = await _favorite_ids(session, [p.id for p in products])
+
+    links, meta = _page_links(_Page(page, per_page, total), per_page, len(products))
+    fmt = price_formatter()
+    return items_ok("Products fetched", {"links": links, "meta": meta}, (_render(p, favs, fmt) for p in products))
+
+
+@async_view(bp, "get_product")
+@require_headers
+@query_budget(3)
+async def get_product(pid):
+    item = (await _cached_products("id", [pid])).get(pid)
+    if item is None:
+        abort(404)
+    view_counter.hit(pid)
+    return _versioned(ok("Product fetched", await _decorated(item)), item)
+
+
+def _get_product_by(key):
+    async def view(**kwargs):
+        value = kwargs[key]
+        item = (await _cached_products(key, [value])).get(value)
+        if item is None:
+            return err("Product not found", status_code=404, data={key: value})
+        if key == "slug":
+            view_counter.hit(item["id"])
+        return _versioned(ok("Product fetched", await _decorated(item)), item)
+
+    view.__name__ = f"get_product_by_{key}"
+    return view
+
+
+for _key in ("barcode", "code", "slug"):
+    async_view(bp, f"get_product_by_{_key}")(require_headers(query_budget(2)(_get_product_by(_key))))
+
+# in-memory index, no SQL once it is built and current
+inline_view(bp, "suggest_products", suggest_index.is_current)
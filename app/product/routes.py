@@ -1,55 +1,35 @@
-from flask import request, jsonify, url_for, current_app
-from werkzeug.utils import secure_filename
+from flask import request, jsonify, url_for, current_app, g, abort, send_file
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import or_,desc, asc
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import or_,and_,desc, asc, case, func
 from ..extensions import db
-from ..model import Product, ProductImage, Category
+from ..model import Product, ProductImage, ProductTombstone, Category, UserFavorite
 from ..utils.decorators import require_headers
-from ..utils.api import api_ok, api_error
+from ..utils.db_routing import use_replica
+from ..utils.optimistic import check_if_match, etag, reject_stale, retry_stale
+from ..utils.prices import price_formatter
+from ..utils.query_budget import query_budget
+from ..utils.uploads import image_meta, remove_file, save_file
+from ..services.category_registry import category_registry
+from ..services.view_counter import view_counter
+from ..services.catalog_snapshot import catalog_snapshot
+from ..services.pinned_products import pinned_products
+from ..services.product_cache import product_cache
+from ..services.suggest_index import suggest_index
+from ..utils.api import api_ok, api_error, items_ok
 from . import bp
-import os
+import heapq
+import json
 import re
+from itertools import islice
 
 # ---------- helpers ----------
 def _ep(name: str) -> str:
     return f"{bp.name}.{name}"
 
-UPLOAD_FOLDER = "static/uploads"
-ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
-
-def slugify(text):
-    text = text.strip().lower()
-    text = re.sub(r"[^a-z0-9]+", "-", text)
-    return text.strip("-")
-
-def _allowed(filename: str) -> bool:
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def _save_file(file_storage, product_name=None):
-    """Save FileStorage to /static/uploads with product-name-based filename."""
-    if not file_storage or not file_storage.filename:
-        return None, None
-    if not _allowed(file_storage.filename):
-        raise ValueError("Unsupported file type")
-
-    ext = os.path.splitext(secure_filename(file_storage.filename))[1].lower()
-    filename = f"{slugify(product_name)}{ext}" if product_name else secure_filename(file_storage.filename)
-
-    upload_dir = os.path.join(current_app.root_path, UPLOAD_FOLDER)
-    os.makedirs(upload_dir, exist_ok=True)
-
-    abs_path = os.path.join(upload_dir, filename)
-    base, ext2 = os.path.splitext(filename)
-    counter = 1
-    while os.path.exists(abs_path):
-        filename = f"{base}-{counter}{ext2}"
-        abs_path = os.path.join(upload_dir, filename)
-        counter += 1
-
-    file_storage.save(abs_path)
-    public_url = f"/{UPLOAD_FOLDER}/{filename}"
-    return public_url, abs_path
-
 def _parse_bool(v, default=False):
     if v is None:
         return default
@@ -73,28 +53,165 @@ def _parse_opt_int(v):
     except Exception:
         return None
 
-def _sort_products(query, sort):
+def _sort_products(query, sort, pinned_first=False):
     sort = (sort or "").strip()
     mapping = {
         "id": asc(Product.id),   "-id": desc(Product.id),
         "name": asc(Product.name), "-name": desc(Product.name),
-        "price": asc(Product.price), "-price": desc(Product.price)
+        "price": asc(Product.price), "-price": desc(Product.price),
+        "viewed": asc(Product.viewed), "-viewed": desc(Product.viewed),
     }
     col = mapping.get(sort, desc(Product.id))  # default newest first (id desc)
+    if pinned_first:
+        if sort not in mapping:
+            # the pinned list's own order; walks ix_product_pin_sort_order_id, no sort step
+            return query.order_by(desc(Product.is_pin), asc(Product.sort_order), asc(Product.id))
+        return query.order_by(desc(Product.is_pin), col)
     return query.order_by(col)
 
 
+def _filter_products(query, args):
+    """Apply the list_products filters in `args` (request.args or a dict) to query.
+
+    Raises ValueError for a malformed `ids` parameter.
+    """
+    q = (args.get("q") or "").strip()
+    barcode = (args.get("barcode") or "").strip()
+    want_id = _parse_opt_int(args.get("id"))
+    ids_param = (args.get("ids") or "").strip()
+    min_price = _parse_opt_float(args.get("min_price"))
+    max_price = _parse_opt_float(args.get("max_price"))
+    in_stock = _parse_bool(args.get("in_stock")) if args.get("in_stock") is not None else None
+    category_id = _parse_opt_int(args.get("category_id"))
+
+    # choose correct stock/quantity column
+    stock_col = getattr(Product, "stock", None) or getattr(Product, "quantity")
+
+    # free text q (also try to match id if q is int)
+    if q:
+        maybe_id = _parse_opt_int(q)
+        like = f"%{q}%"
+        query = query.filter(
+            or_(
+                Product.name.ilike(like),
+                Product.barcode.ilike(like),
+                (Product.id == maybe_id) if maybe_id is not None else False,
+            )
+        )
+
+    # exact barcode
+    if barcode:
+        query = query.filter(Product.barcode == barcode)
+
+    # id / ids
+    if want_id is not None:
+        query = query.filter(Product.id == want_id)
+
+    if ids_param:
+        ids_list = [int(x) for x in ids_param.split(",") if x.strip() != ""]
+        if ids_list:
+            query = query.filter(Product.id.in_(ids_list))
+
+    # price range
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+
+    # stock flag
+    if in_stock is True and stock_col is not None:
+        query = query.filter(stock_col > 0)
+    elif in_stock is False and stock_col is not None:
+        query = query.filter(stock_col <= 0)
+
+    # category
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+
+    return query
+
+
 def _parse_float(v, default=0.0):
     try:
         return float(v)
     except Exception:
         return default
 
-def _page_url(page, per_page):
+def _page_url(page, per_page, endpoint="list_products"):
     args = request.args.to_dict(flat=True)
     args["page"] = page
     args["per_page"] = per_page
-    return url_for(_ep("list_products"), _external=True, **args)
+    return url_for(_ep(endpoint), _external=True, **args)
+
+def _page_links(pagination, per_page, count, endpoint="list_products"):
+    """(links, meta) in the list_products pagination format."""
+    links = {
+        "first": _page_url(1, per_page, endpoint),
+        "last": _page_url(pagination.pages or 1, per_page, endpoint),
+        "prev": _page_url(pagination.prev_num, per_page, endpoint) if pagination.has_prev else None,
+        "next": _page_url(pagination.next_num, per_page, endpoint) if pagination.has_next else None,
+    }
+
+    meta = {
+        "current_page": pagination.page,
+        "from": (pagination.page - 1) * per_page + 1 if pagination.total > 0 else None,
+        "last_page": pagination.pages or 1,
+        "links": [
+            {"url": _page_url(i, per_page, endpoint), "label": str(i), "active": i == pagination.page}
+            for i in range(1, (pagination.pages or 1) + 1)
+        ],
+        "path": url_for(_ep(endpoint), _external=True),
+        "per_page": per_page,
+        "to": (pagination.page - 1) * per_page + count if pagination.total > 0 else None,
+        "total": pagination.total,
+    }
+    return links, meta
+
+def _current_user_id():
+    """Id of the user behind an optional Bearer token, else None (cached per request)."""
+    if "fav_user_id" not in g:
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+            g.fav_user_id = int(identity) if identity is not None else None
+        except (JWTExtendedException, PyJWTError, ValueError):
+            g.fav_user_id = None    # bad/expired token on a public read: treat as anonymous
+    return g.fav_user_id
+
+def _favorite_ids(user_id, product_ids):
+    """Subset of product_ids the user has favorited, in one IN query."""
+    if not product_ids:
+        return set()
+    rows = db.session.query(UserFavorite.product_id).filter(
+        UserFavorite.user_id == user_id, UserFavorite.product_id.in_(product_ids)
+    )
+    return {pid for (pid,) in rows}
+
+def _iter_decorated(products):
+    """as_api() for each product with is_favourite set for the current user
+    and price_format rendered for the request's locale and currency.
+
+    Accepts Product rows or already rendered (cached) dicts, which are copied.
+    Anonymous requests keep the legacy global is_favourite flag. The favorites
+    lookup and formatter resolution run up front; rendering is lazy, one
+    product at a time as items_ok writes the body.
+    """
+    user_id = _current_user_id()
+    favs = None
+    if user_id is not None:
+        favs = _favorite_ids(user_id, [p["id"] if isinstance(p, dict) else p.id for p in products])
+    fmt = price_formatter()
+    return (_render(p, favs, fmt) for p in products)
+
+def _render(product, favs, fmt):
+    item = dict(product) if isinstance(product, dict) else product.as_api()
+    if favs is not None:
+        item["is_favourite"] = item["id"] in favs
+    item["price_format"] = fmt(item["price"])
+    return item
+
+def _decorate_items(products):
+    return list(_iter_decorated(products))
 
 def _paginate(query, page, per_page):
     page = max(_parse_int(page, 1), 1)
@@ -137,6 +254,11 @@ def err(message: str, status_code=400, data=None):
 def conflict(msg="Unique constraint violation", fields=None):
     return err(msg, status_code=409, data={"conflicts": fields} if fields else None)
 
+def _versioned(resp, item):
+    """Set the product's ETag (its row version) on resp."""
+    resp.set_etag(etag(item["version"]))
+    return resp
+
 def parse_unique_violation(err_exc: IntegrityError):
     m = re.search(r"UNIQUE constraint failed:\s*([^.]+)\.([^\s,]+)", str(err_exc.orig))
     if m:
@@ -147,6 +269,106 @@ def parse_unique_violation(err_exc: IntegrityError):
         return {"table": "product", "column": col, "value": val}
     return None
 
+def _save_upload(file_storage, product):
+    """save_file(), remembering the file for _drop_unused_uploads. Returns (public_url, abs_path)."""
+    public_url, abs_path = save_file(file_storage, product_name=product.name)
+    g.setdefault("saved_uploads", []).append(public_url)
+    return public_url, abs_path
+
+@bp.after_request
+def _drop_unused_uploads(response):
+    """Delete files saved by a write that did not commit (validation error, conflict)."""
+    saved = g.pop("saved_uploads", None)
+    if saved:
+        db.session.rollback()       # rows flushed but never committed must not count as references
+        _discard_files(saved)
+    return response
+
+def _stored_image(file_storage, product, **fields):
+    """ProductImage for an uploaded file, saved under static/uploads (ValueError on a bad type)."""
+    public_url, abs_path = _save_upload(file_storage, product)
+    return ProductImage(image_path=public_url, image_url=public_url, **fields, **image_meta(abs_path))
+
+def _next_sort_order(product):
+    return max((img.sort_order or 0 for img in product.images), default=-1) + 1
+
+def _replace_image(product, file_storage, name, main=False):
+    """Swap the file of the main (or `name`d) image in place, adding the row if
+    there is none; returns the replaced file path, if any."""
+    current = next((img for img in product.images if (img.main if main else img.name == name)), None)
+    if current is None:
+        product.images.append(_stored_image(file_storage, product, name=name, main=main, sort_order=_next_sort_order(product)))
+        return []
+    public_url, abs_path = _save_upload(file_storage, product)
+    old = current.image_path
+    current.image_path = current.image_url = public_url
+    for field, value in image_meta(abs_path).items():
+        setattr(current, field, value)
+    return [old]
+
+def _sync_images(product, specs):
+    """Make product.images match `specs` (in list order), touching only rows that
+    change. Specs match existing rows by id, then by image_path; unmatched specs
+    are inserted and unlisted rows deleted. Returns the paths no longer used."""
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+        raise ValueError("images must be a list of objects")
+    existing = list(product.images)
+    by_id = {img.id: img for img in existing}
+    by_path = {img.image_path: img for img in existing}
+    keep, removed = [], []
+    for i, spec in enumerate(specs):
+        path = spec.get("image_path") or spec.get("image_url")
+        img = by_id.get(_parse_opt_int(spec.get("id"))) or by_path.get(path)
+        if img is None or img in keep:
+            img = ProductImage()
+            product.images.append(img)
+        keep.append(img)
+        if path and path != img.image_path:
+            if img.image_path:
+                removed.append(img.image_path)
+            img.image_path = path
+            img.image_url = spec.get("image_url") or path
+            img.width = img.height = img.size = None
+        img.name = spec.get("name") or img.name or "image"
+        img.main = _parse_bool(spec.get("main"))
+        img.sort_order = i
+        for field in ("width", "height"):
+            if field in spec:
+                setattr(img, field, _parse_opt_int(spec[field]))
+    for img in existing:
+        if img not in keep:
+            removed.append(img.image_path)
+            product.images.remove(img)
+    return removed
+
+def _parse_json_list(value):
+    """A JSON array sent as a form field ("" means an empty list)."""
+    if not value:
+        return []
+    try:
+        return json.loads(value)
+    except ValueError:
+        raise ValueError("images must be a JSON list") from None
+
+def _id_list(value):
+    """[1, 2] or "1,2" -> [1, 2] (ValueError on anything else)."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        raise ValueError("image ids must be a list")
+    return [int(v) for v in value]
+
+def _discard_files(paths):
+    """Delete upload files that no ProductImage row references any more."""
+    paths = {p for p in paths if p}
+    if not paths:
+        return
+    used = {p for (p,) in db.session.query(ProductImage.image_path).filter(ProductImage.image_path.in_(paths))}
+    for path in paths - used:
+        remove_file(path)
+
 def format_price(value, symbol=None, decimals=2, use_thousands=True):
     try:
         n = float(value)
@@ -156,10 +378,60 @@ def format_price(value, symbol=None, decimals=2, use_thousands=True):
     num = f"{n:,.{decimals}f}" if use_thousands else f"{n:.{decimals}f}"
     return f"{symbol}{num}"
 
+FACETS = {"category", "price", "in_stock"}
+
+def _price_buckets():
+    """Upper bounds from PRODUCT_PRICE_BUCKETS, e.g. [1, 5, 10, 25, 50, 100]."""
+    return current_app.config.get("PRODUCT_PRICE_BUCKETS") or [1, 5, 10, 25, 50, 100]
+
+def _product_facets(args, wanted):
+    """Facet counts for the current filter set in one grouped aggregate query."""
+    bounds = _price_buckets()
+    cols = []
+    if "category" in wanted:
+        cols.append(Product.category_id.label("category_id"))
+    if "price" in wanted:
+        cols.append(case(
+            *[(Product.price < b, i) for i, b in enumerate(bounds)], else_=len(bounds)
+        ).label("bucket"))
+    if "in_stock" in wanted:
+        cols.append(case((Product.quantity > 0, 1), else_=0).label("in_stock"))
+
+    query = _filter_products(db.session.query(*cols, func.count()).select_from(Product), args)
+    rows = query.group_by(*cols).all()
+
+    categories, buckets, stock = {}, [0] * (len(bounds) + 1), {"true": 0, "false": 0}
+    for row in rows:
+        n = row[-1]
+        if "category" in wanted:
+            categories[row.category_id] = categories.get(row.category_id, 0) + n
+        if "price" in wanted:
+            buckets[row.bucket] += n
+        if "in_stock" in wanted:
+            stock["true" if row.in_stock else "false"] += n
+
+    facets = {}
+    if "category" in wanted:
+        facets["category"] = [
+            {"id": cid, "name": (category_registry.get(cid) or {}).get("name"), "count": n}
+            for cid, n in sorted(categories.items(), key=lambda kv: -kv[1])
+        ]
+    if "price" in wanted:
+        edges = [0] + list(bounds) + [None]
+        facets["price"] = [
+            {"min": edges[i], "max": edges[i + 1], "count": buckets[i]}
+            for i in range(len(buckets))
+        ]
+    if "in_stock" in wanted:
+        facets["in_stock"] = stock
+    return facets
+
 # ---------- routes ----------
 # GET /api/products
 @bp.get("")
 @require_headers
+@use_replica
+@query_budget(5)
 def list_products():
     
     """
@@ -172,108 +444,257 @@ def list_products():
       max_price    -> float
       in_stock     -> bool (true/false)  (True = stock > 0, False = stock <= 0)
       category_id  -> int
-      sort         -> id, -id, name, -name, price, -price, stock, -stock
+      sort         -> id, -id, name, -name, price, -price, stock, -stock, viewed, -viewed
+      pinned_first -> bool, pinned products ahead of the rest; without `sort` both blocks
+                      go by sort_order, id (as /pinned), with it each block is in `sort` order
       page         -> int, default 1
       per_page     -> int, default 15 (cap 100)
+      facets       -> comma-separated: category, price, in_stock (counts for the current filters)
     """
 
-    q = (request.args.get("q") or "").strip()
-    barcode = (request.args.get("barcode") or "").strip()
-    want_id = _parse_opt_int(request.args.get("id"))
-    ids_param = (request.args.get("ids") or "").strip()
-    min_price = _parse_opt_float(request.args.get("min_price"))
-    max_price = _parse_opt_float(request.args.get("max_price"))
-    in_stock = _parse_bool(request.args.get("in_stock")) if request.args.get("in_stock") is not None else None
-    category_id = _parse_opt_int(request.args.get("category_id"))
     sort = request.args.get("sort")
+    facets = {f.strip() for f in (request.args.get("facets") or "").split(",") if f.strip()}
+    if facets - FACETS:
+        return err(f"Unknown facets: {', '.join(sorted(facets - FACETS))}")
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=15, type=int)
     per_page = max(1, min(per_page, 100))
 
-    # choose correct stock/quantity column
-    stock_col = getattr(Product, "stock", None) or getattr(Product, "quantity")
+    try:
+        query = _filter_products(Product.query, request.args)
+    except ValueError:
+        return err("Invalid ids parameter; must be comma-separated integers")
 
-    query = Product.query
+    # sort + paginate
+    query = _sort_products(query, sort, pinned_first=_parse_bool(request.args.get("pinned_first")))
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
-    # free text q (also try to match id if q is int)
-    if q:
-        maybe_id = _parse_opt_int(q)
-        like = f"%{q}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(like),
-                Product.barcode.ilike(like),
-                (Product.id == maybe_id) if maybe_id is not None else False,
-            )
-        )
+    links, meta = _page_links(pagination, per_page, len(pagination.items))
+    data = {"links": links, "meta": meta}
+    if facets:
+        data["facets"] = _product_facets(request.args, facets)
+    return items_ok("Products fetched", data, _iter_decorated(pagination.items))
 
-    # exact barcode
-    if barcode:
-        query = query.filter(Product.barcode == barcode)
+# GET /api/products/<id>
+@bp.get("/<int:pid>")
+@require_headers
+@query_budget(3)
+def get_product(pid):
+    item = product_cache.get(pid)
+    if item is None:
+        abort(404)
+    view_counter.hit(pid)
+    return _versioned(ok("Product fetched", _decorate_items([item])[0]), item)
 
-    # id / ids
-    if want_id is not None:
-        query = query.filter(Product.id == want_id)
+# GET /api/products/by-barcode/<barcode>, /by-code/<code>, /by-slug/<slug>
+def _get_product_by(key, value):
+    item = product_cache.get_many(key, [value]).get(value)
+    if item is None:
+        return err("Product not found", status_code=404, data={key: value})
+    if key == "slug":
+        view_counter.hit(item["id"])    # product page; till scans are not views
+    return _versioned(ok("Product fetched", _decorate_items([item])[0]), item)
 
-    if ids_param:
-        try:
-            ids_list = [int(x) for x in ids_param.split(",") if x.strip() != ""]
-            if ids_list:
-                query = query.filter(Product.id.in_(ids_list))
-        except ValueError:
-            return err("Invalid ids parameter; must be comma-separated integers")
+@bp.get("/by-barcode/<barcode>")
+@require_headers
+@query_budget(2)
+def get_product_by_barcode(barcode):
+    """Single-row scan lookup on the unique barcode index, through the product cache."""
+    return _get_product_by("barcode", barcode.strip())
 
-    # price range
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
+@bp.get("/by-code/<code>")
+@require_headers
+@query_budget(2)
+def get_product_by_code(code):
+    return _get_product_by("code", code.strip())
 
-    # stock flag
-    if in_stock is True and stock_col is not None:
-        query = query.filter(stock_col > 0)
-    elif in_stock is False and stock_col is not None:
-        query = query.filter(stock_col <= 0)
+@bp.get("/by-slug/<slug>")
+@require_headers
+@query_budget(2)
+def get_product_by_slug(slug):
+    """Slugs are not unique; the lowest id with the slug wins."""
+    return _get_product_by("slug", slug.strip())
 
-    # category
-    if category_id is not None:
-        query = query.filter(Product.category_id == category_id)
+# POST /api/products:batchGet
+# {"ids": [1, 3], "barcodes": ["885..."], "codes": ["P0001"]}
+BATCH_KEYS = (("ids", "id"), ("barcodes", "barcode"), ("codes", "code"))
 
-    # sort + paginate
-    query = _sort_products(query, sort)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+@require_headers
+@query_budget(4)
+def batch_get():
+    """Products for up to BATCH_GET_MAX ids/barcodes/codes, in request order.
+
+    Goes through the identity cache; misses cost one IN query per key type
+    and there is no pagination or COUNT. Keys not found are listed in
+    data.missing.
+    """
+    payload = request.get_json(silent=True) or {}
+    keys = []
+    for field, key in BATCH_KEYS:
+        values = payload.get(field) or []
+        if not isinstance(values, list):
+            return err(f"{field} must be a list")
+        if key == "id":
+            try:
+                values = [int(v) for v in values]
+            except (TypeError, ValueError):
+                return err("ids must be integers")
+        else:
+            values = [str(v).strip() for v in values if str(v).strip()]
+        keys.append((field, key, list(dict.fromkeys(values))))   # de-dupe, keep order
 
-    items = [p.as_api() for p in pagination.items]
+    limit = current_app.config.get("BATCH_GET_MAX", 500)
+    total = sum(len(values) for _, _, values in keys)
+    if total == 0:
+        return err("Provide ids, barcodes or codes")
+    if total > limit:
+        return err(f"At most {limit} keys per request", data={"requested": total})
 
-    links = {
-        "first": _page_url(1, per_page),
-        "last": _page_url(pagination.pages or 1, per_page),
-        "prev": _page_url(pagination.prev_num, per_page) if pagination.has_prev else None,
-        "next": _page_url(pagination.next_num, per_page) if pagination.has_next else None,
-    }
+    found, missing = [], {}
+    for field, key, values in keys:
+        if not values:
+            continue
+        hits = product_cache.get_many(key, values)
+        found.extend(hits[v] for v in values if v in hits)
+        missing[field] = [v for v in values if v not in hits]
+    return ok("Products fetched", {"items": _decorate_items(found), "missing": missing})
 
-    meta = {
-        "current_page": pagination.page,
-        "from": (pagination.page - 1) * per_page + 1 if pagination.total > 0 else None,
-        "last_page": pagination.pages or 1,
-        "links": [
-            {"url": _page_url(i, per_page), "label": str(i), "active": i == pagination.page}
-            for i in range(1, (pagination.pages or 1) + 1)
-        ],
-        "path": url_for(_ep("list_products"), _external=True),
-        "per_page": per_page,
-        "to": (pagination.page - 1) * per_page + len(items) if pagination.total > 0 else None,
-        "total": pagination.total,
-    }
+bp.record_once(lambda state: state.app.add_url_rule(
+    # app-level rule: a blueprint rule would get a "/" between the prefix and ":batchGet"
+    f"{bp.url_prefix}:batchGet", endpoint=_ep("batch_get"), view_func=batch_get, methods=["POST"],
+))
 
-    return ok("Products fetched", {"items": items, "links": links, "meta": meta})
+# GET /api/products/suggest?prefix=ang&limit=10
+@bp.get("/suggest")
+@require_headers
+@query_budget(0)
+def suggest_products():
+    """Type-ahead over name words, barcode and code from the in-memory index.
 
-# GET /api/products/<id>
-@bp.get("/<int:pid>")
+    Pinned, then most viewed first. No SQL on the request path.
+    """
+    limit = max(1, min(request.args.get("limit", default=10, type=int), 50))
+    items = suggest_index.suggest(request.args.get("prefix", ""), limit)
+    return ok("Suggestions fetched", {"items": items})
+
+# GET /api/products/pinned
+@bp.get("/pinned")
 @require_headers
-def get_product(pid):
-    product = Product.query.get_or_404(pid)
-    return ok("Product fetched", product.as_api())
+@query_budget(1)
+def list_pinned():
+    """Pinned products by sort_order, served from the per-worker cache.
+
+    Anonymous requests get the cached (and precompressed) response bytes, one
+    body per locale/currency.
+    """
+    items = pinned_products.items()
+    if _current_user_id() is None:
+        return pinned_products.body(
+            lambda: ok("Pinned products fetched", {"items": _decorate_items(items)}).get_data(),
+            price_formatter().key,
+        ).response()
+    return ok("Pinned products fetched", {"items": _decorate_items(items)})
+
+def _parse_cursor(value):
+    """Change feed cursor "<seq>.<id>" -> (seq, id); empty or "0" is a full sync."""
+    if not value or value == "0":
+        return -1, 0
+    seq, _, pid = value.partition(".")
+    return int(seq), int(pid) if pid else 2 ** 63
+
+# GET /api/products/changes?since=<cursor>&limit=500
+@bp.get("/changes")
+@require_headers
+@use_replica
+@query_budget(3)
+def list_changes():
+    """Products written or deleted after `since`, in change order.
+
+    Each change is {"op": "upsert", "product": {...}} or {"op": "delete",
+    "id": ...}; apply them in order and pass "cursor" back as since until
+    has_more is false. No since is a full sync.
+    """
+    try:
+        seq, last_id = _parse_cursor(request.args.get("since"))
+    except ValueError:
+        return err("Invalid since cursor")
+    limit = max(1, min(request.args.get("limit", default=500, type=int), current_app.config.get("CHANGES_MAX", 1000)))
+
+    products = (
+        Product.query
+        .filter(or_(Product.change_seq > seq, and_(Product.change_seq == seq, Product.id > last_id)))
+        .order_by(Product.change_seq.asc(), Product.id.asc())
+        .limit(limit + 1)
+        .all()
+    )
+    tombstones = (
+        ProductTombstone.query
+        .filter(ProductTombstone.change_seq > seq)
+        .order_by(ProductTombstone.change_seq.asc())
+        .limit(limit + 1)
+        .all()
+    )
+    page = list(islice(heapq.merge(
+        ((p.change_seq, p.id, p) for p in products),
+        ((t.change_seq, t.product_id, None) for t in tombstones),
+        key=lambda change: change[:2],
+    ), limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    rendered = iter(_decorate_items([p for _, _, p in page if p is not None]))
+    changes = [
+        {"op": "upsert", "product": next(rendered)} if p is not None else {"op": "delete", "id": pid}
+        for _, pid, p in page
+    ]
+    cursor = f"{page[-1][0]}.{page[-1][1]}" if page else request.args.get("since") or "0"
+    return ok("Changes fetched", {"changes": changes, "cursor": cursor, "has_more": has_more})
+
+# GET /api/products/snapshot
+@bp.get("/snapshot")
+@require_headers
+@query_budget(0)
+def get_snapshot():
+    """The whole catalog as gzipped NDJSON (one product per line), prebuilt.
+
+    Conditional and Range requests are answered from the file; continue with
+    GET /changes?since=<X-Catalog-Cursor>.
+    """
+    snapshot = catalog_snapshot.current()
+    if snapshot is None:
+        resp = err("Catalog snapshot is being built", status_code=503)
+        resp.headers["Retry-After"] = "5"
+        return resp
+    resp = send_file(
+        snapshot["path"], mimetype="application/gzip", conditional=True, etag=snapshot["etag"],
+        download_name="catalog.ndjson.gz", max_age=current_app.config.get("SNAPSHOT_MAX_AGE", 60),
+    )
+    resp.headers["X-Catalog-Cursor"] = snapshot["cursor"]
+    resp.headers["X-Catalog-Count"] = str(snapshot["count"])
+    return resp
+
+# GET /api/products/favorites  (Authorization: Bearer <access token>)
+@bp.get("/favorites")
+@require_headers
+@jwt_required()
+@use_replica
+@query_budget(3)
+def list_favorites():
+    """The current user's favorite products, newest favorite first."""
+    page = request.args.get("page", default=1, type=int)
+    per_page = max(1, min(request.args.get("per_page", default=15, type=int), 100))
+
+    query = (
+        Product.query.join(UserFavorite, UserFavorite.product_id == Product.id)
+        .filter(UserFavorite.user_id == int(get_jwt_identity()))
+        .order_by(UserFavorite.created_at.desc(), UserFavorite.product_id.desc())
+    )
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+
+    links, meta = _page_links(pagination, per_page, len(pagination.items), "list_favorites")
+    fmt = price_formatter()
+    items = ({**_render(p, None, fmt), "is_favourite": True} for p in pagination.items)
+    return items_ok("Favorites fetched", {"links": links, "meta": meta}, items)
 
 # POST /api/products
 @bp.post("")
@@ -317,20 +738,14 @@ def create_product():
         product.price_format = format_price(product.price, symbol=current_app.config.get("CURRENCY_SYMBOL", "$"), decimals=2)
         
 
-        if "image" in files and files["image"].filename:
-            try:
-                public_url, _ = _save_file(files["image"], product_name=product.name)
-                product.images.append(ProductImage(name="main", image_path=public_url, main=True, image_url=public_url))
-            except ValueError as e:
-                return err(str(e))
-
-        for key, fs in files.items():
-            if key.startswith("image_") and fs.filename:
-                try:
-                    public_url, _ = _save_file(fs, product_name=product.name)
-                    product.images.append(ProductImage(name=key, image_path=public_url, main=False, image_url=public_url))
-                except ValueError as e:
-                    return err(str(e))
+        try:
+            if "image" in files and files["image"].filename:
+                product.images.append(_stored_image(files["image"], product, name="main", main=True))
+            for key, fs in files.items():
+                if key.startswith("image_") and fs.filename:
+                    product.images.append(_stored_image(fs, product, name=key, sort_order=len(product.images)))
+        except ValueError as e:
+            return err(str(e))
 
     else:
         data = request.get_json(silent=True) or {}
@@ -365,13 +780,10 @@ def create_product():
         )
         product.price_format = format_price(product.price, symbol=current_app.config.get("CURRENCY_SYMBOL", "$"), decimals=2)
 
-        for img in (data.get("images") or []):
-            product.images.append(ProductImage(
-                name=img.get("name") or "image",
-                image_path=img.get("image_path") or img.get("image_url"),
-                main=_parse_bool(img.get("main")),
-                image_url=img.get("image_url") or img.get("image_path"),
-            ))
+        try:
+            _sync_images(product, data.get("images") or [])
+        except ValueError as e:
+            return err(str(e))
 
     try:
         db.session.add(product)
@@ -388,18 +800,23 @@ def create_product():
             return conflict(msg=f"Duplicate {info['column']}", fields={info["column"]: submitted.get(info["column"])})
         return conflict("Duplicate or invalid data")
 
-    resp = ok("Product created", product.as_api(), status_code=201)
+    resp = ok("Product created", _render(product, None, price_formatter()), status_code=201)
     resp.headers["Location"] = url_for(_ep("get_product"), pid=product.id, _external=True)
     return resp
 
 # PUT /api/products/<id>
 @bp.put("/<int:pid>")
 @require_headers
+@reject_stale(err)
 def update_product(pid):
     product = Product.query.get_or_404(pid)
+    failed = check_if_match(product.version, err)
+    if failed:
+        return failed
 
     is_multipart = request.content_type and "multipart/form-data" in request.content_type
     data = {}
+    removed = []        # files replaced or dropped; deleted once the commit lands
 
     if is_multipart:
         form = request.form
@@ -407,33 +824,25 @@ def update_product(pid):
 
         files = request.files
         if any(k.startswith("image") for k in files.keys()) or "images" in data:
-            product.images.clear()
-
-            if "image" in files and files["image"].filename:
-                try:
-                    public_url, _ = _save_file(files["image"], product_name=product.name)
-                    product.images.append(ProductImage(name="main", image_path=public_url, main=True, image_url=public_url))
-                except ValueError as e:
-                    return err(str(e))
-
-            for key, fs in files.items():
-                if key.startswith("image_") and fs.filename:
-                    try:
-                        public_url, _ = _save_file(fs, product_name=product.name)
-                        product.images.append(ProductImage(name=key, image_path=public_url, main=False, image_url=public_url))
-                    except ValueError as e:
-                        return err(str(e))
+            product.updated_at = func.now()     # image-only edits still bump the version
+            try:
+                if "images" in data:
+                    removed += _sync_images(product, _parse_json_list(data["images"]))
+                if "image" in files and files["image"].filename:
+                    removed += _replace_image(product, files["image"], name="main", main=True)
+                for key, fs in files.items():
+                    if key.startswith("image_") and fs.filename:
+                        removed += _replace_image(product, fs, name=key)
+            except ValueError as e:
+                return err(str(e))
     else:
         data = request.get_json(force=True, silent=True) or {}
         if "images" in data:
-            product.images.clear()
-            for img in data["images"]:
-                product.images.append(ProductImage(
-                    name=img.get("name") or "image",
-                    image_path=img.get("image_path") or img.get("image_url"),
-                    main=_parse_bool(img.get("main")),
-                    image_url=img.get("image_url") or img.get("image_path"),
-                ))
+            product.updated_at = func.now()     # image-only edits still bump the version
+            try:
+                removed += _sync_images(product, data["images"] or [])
+            except ValueError as e:
+                return err(str(e))
 
     # --- category update: normalize, validate, assign ---
     if "category_id" in data:
@@ -487,40 +896,80 @@ def update_product(pid):
             return conflict(msg=f"Duplicate {info['column']}", fields={info["column"]: submitted.get(info["column"])})
         return err("Duplicate or invalid data", status_code=400, data={"detail": str(e.orig)})
 
-    return ok("Product updated", product.as_api())
+    _discard_files(removed)
+    item = _render(product, None, price_formatter())
+    return _versioned(ok("Product updated", item), item)
 
 # DELETE /api/products/<id>
 @bp.delete("/<int:pid>")
 @require_headers
+@reject_stale(err)
 def delete_product(pid):
     product = Product.query.get_or_404(pid)
+    failed = check_if_match(product.version, err)
+    if failed:
+        return failed
     try:
+        UserFavorite.query.filter_by(product_id=pid).delete(synchronize_session=False)
         db.session.delete(product)
         db.session.commit()
+    except StaleDataError:
+        raise
     except Exception as e:
         db.session.rollback()
         return err("Failed to delete product", status_code=500, data={"detail": str(e)})
     return ok(f"Product {pid} deleted", {"id": pid})
 
+def _favorite_replayable():
+    # the user's own row and an explicit value hold on any newer row; a bare
+    # toggle of the shared flag would flip it back
+    return _current_user_id() is not None or "value" in (request.get_json(silent=True) or {})
+
 # PATCH /api/products/<id>/favorite
 @bp.route("/<int:pid>/favorite", methods=["PATCH", "POST"])
 @require_headers
+@retry_stale(err, replayable=_favorite_replayable)
 def set_favorite(pid):
+    """Toggle (or set with {"value": bool}) the product as a favorite.
+
+    With a Bearer token this is the user's own favorite; without an
+    Authorization header it falls back to the legacy global is_favourite
+    flag. A token that does not verify is a 401, never the shared flag.
+    """
+    user_id = _current_user_id()
+    if user_id is None and "Authorization" in request.headers:
+        return err("Invalid or expired token", 401)
     product = Product.query.get_or_404(pid)
     payload = request.get_json(silent=True) or {}
-    product.is_favourite = _parse_bool(payload.get("value")) if "value" in payload else (not product.is_favourite)
+    if user_id is None:
+        failed = check_if_match(product.version, err)
+        if failed:
+            return failed
     try:
+        if user_id is None:
+            product.is_favourite = _parse_bool(payload.get("value")) if "value" in payload else (not product.is_favourite)
+        else:
+            fav = db.session.get(UserFavorite, (user_id, pid))
+            value = _parse_bool(payload.get("value")) if "value" in payload else fav is None
+            if value and fav is None:
+                db.session.add(UserFavorite(user_id=user_id, product_id=pid))
+            elif not value and fav is not None:
+                db.session.delete(fav)
         db.session.commit()
     except IntegrityError as e:
         db.session.rollback()
         return err("Failed to update favorite", data={"detail": str(e.orig)})
-    return ok("Favorite updated", product.as_api())
+    return ok("Favorite updated", _decorate_items([product])[0])
 
 # PATCH /api/products/<id>/pin
 @bp.route("/<int:pid>/pin", methods=["PATCH", "POST"])
 @require_headers
+@reject_stale(err)
 def set_pin(pid):
     product = Product.query.get_or_404(pid)
+    failed = check_if_match(product.version, err)
+    if failed:
+        return failed
     payload = request.get_json(silent=True) or {}
     product.is_pin = _parse_bool(payload.get("value")) if "value" in payload else (not product.is_pin)
     try:
@@ -528,4 +977,85 @@ def set_pin(pid):
     except IntegrityError as e:
         db.session.rollback()
         return err("Failed to update pin", data={"detail": str(e.orig)})
-    return ok("Pin updated", product.as_api())
+    item = _render(product, None, price_formatter())
+    return _versioned(ok("Pin updated", item), item)
+
+# PATCH /api/products/<id>/images
+#   JSON: {"add": [{"image_url", "name"?, "width"?, "height"?}], "remove": [ids], "order": [ids], "main": id}
+#   multipart: remove/order as "1,2,3", main, and image* files to add
+@bp.patch("/<int:pid>/images")
+@require_headers
+@reject_stale(err)
+def patch_images(pid):
+    """Add, remove, reorder and pick the main image, touching only those rows.
+
+    Ids left out of "order" keep their relative order after the listed ones;
+    new images go last. Files of removed images are deleted after the commit.
+    """
+    product = Product.query.get_or_404(pid)
+    failed = check_if_match(product.version, err)
+    if failed:
+        return failed
+
+    files = {}
+    if request.content_type and "multipart/form-data" in request.content_type:
+        ops = request.form.to_dict(flat=True)
+        files = {k: fs for k, fs in request.files.items() if k.startswith("image") and fs.filename}
+    else:
+        ops = request.get_json(silent=True) or {}
+    try:
+        remove, order = _id_list(ops.get("remove")), _id_list(ops.get("order"))
+        main = _parse_opt_int(ops.get("main"))
+        if ops.get("main") not in (None, "") and main is None:
+            raise ValueError("main must be an image id")
+        add = _parse_json_list(ops["add"]) if isinstance(ops.get("add"), str) else ops.get("add") or []
+        if not isinstance(add, list) or not all(isinstance(spec, dict) for spec in add):
+            raise ValueError("add must be a list of objects")
+    except ValueError as e:
+        return err(str(e))
+
+    by_id = {img.id: img for img in product.images}
+    unknown = sorted({i for i in remove + order + ([main] if main is not None else []) if i not in by_id})
+    if unknown:
+        return err("Unknown image ids", status_code=404, data={"ids": unknown})
+    if main in remove:
+        return err("The main image cannot be removed in the same request")
+
+    removed = []
+    for iid in dict.fromkeys(remove):
+        img = by_id.pop(iid)
+        removed.append(img.image_path)
+        product.images.remove(img)
+
+    next_order = _next_sort_order(product)
+    try:
+        for spec in add:
+            path = spec.get("image_path") or spec.get("image_url")
+            if not path:
+                return err("Added images need an image_url")
+            product.images.append(ProductImage(
+                name=spec.get("name") or "image", image_path=path, image_url=spec.get("image_url") or path,
+                main=False, sort_order=next_order,
+                width=_parse_opt_int(spec.get("width")), height=_parse_opt_int(spec.get("height")),
+            ))
+            next_order += 1
+        for key, fs in files.items():
+            product.images.append(_stored_image(fs, product, name=key, main=False, sort_order=next_order))
+            next_order += 1
+    except ValueError as e:
+        return err(str(e))
+
+    if order:
+        listed = [by_id[i] for i in dict.fromkeys(order)]
+        rest = [img for img in product.images if img not in listed]
+        for i, img in enumerate(listed + rest):
+            img.sort_order = i
+    if main is not None:
+        for img in product.images:
+            img.main = img is by_id[main]
+
+    product.updated_at = func.now()
+    db.session.commit()
+    _discard_files(removed)
+    item = _render(product, None, price_formatter())
+    return _versioned(ok("Images updated", item), item)
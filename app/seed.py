@@ -0,0 +1,288 @@
+# app/seed.py
+"""
+Synthetic data generator: `flask seed ...`
+
+    flask seed all --products 1000000 --users 5000 --carts 20000
+    flask seed catalog --products 50000 --price lognormal:1.2:0.9 --stock uniform:0:500
+    flask seed carts --carts 1000 --items-per-cart uniform:1:8
+
+Rows are built in plain dicts and written with batched core INSERTs (no ORM
+objects, no per-row flush). Ids continue after the current max id so seeding
+an existing database works, and --seed makes the output reproducible.
+
+Distribution specs: const:V | uniform:LO:HI | normal:MU:SD | lognormal:MU:SIGMA
+"""
+import random
+import time
+from array import array
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+
+from .extensions import db
+from .services.catalog_events import bump_all
+from .model import Cart, CartItem, Category, Product, ProductImage, User
+
+seed_cli = AppGroup("seed", help="Bulk-insert synthetic users, catalog and carts.")
+
+BRANDS = ["Angkor", "Cambodia", "Kampot", "Mekong", "Tonle", "Bayon", "Vital", "Dragon", "Lotus", "Golden",
+          "Royal", "Fresh", "Sunrise", "Khmer", "Apsara", "Phnom", "Siem", "Coco", "Jasmine", "Lucky"]
+ITEMS = ["Beer", "Water", "Pepper", "Rice", "Coffee", "Tea", "Noodles", "Soy Sauce", "Fish Sauce", "Milk",
+         "Juice", "Soda", "Snack", "Cookies", "Chips", "Soap", "Shampoo", "Toothpaste", "Sugar", "Salt"]
+SIZES = ["100g", "250g", "500g", "1kg", "330ml", "500ml", "1.5L", "6-pack", "12-pack", "family size"]
+UNITS = ["pcs", "can", "bottle", "pack", "box", "bag"]
+CATEGORY_WORDS = ["Drinks", "Beverages", "Snacks", "Groceries", "Household", "Personal Care", "Dairy", "Frozen",
+                  "Bakery", "Spices", "Canned", "Breakfast", "Baby", "Pets", "Cleaning", "Health"]
+
+
+def parse_dist(spec: str):
+    """'lognormal:1.2:0.9' -> callable(rnd) -> float."""
+    kind, *params = spec.split(":")
+    try:
+        p = [float(x) for x in params]
+        if kind == "const":
+            return lambda r: p[0]
+        if kind == "uniform":
+            return lambda r: r.uniform(p[0], p[1])
+        if kind == "normal":
+            return lambda r: r.gauss(p[0], p[1])
+        if kind == "lognormal":
+            return lambda r: r.lognormvariate(p[0], p[1])
+    except (ValueError, IndexError):
+        pass
+    raise click.BadParameter(f"invalid distribution {spec!r}")
+
+
+def ean13(n: int, prefix="885") -> str:
+    """Unique EAN-13 for sequence number n (885 = Cambodia GS1 prefix)."""
+    body = f"{prefix}{n:09d}"
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _commit():
+    db.session.commit()
+    bump_all()          # core inserts skip the ORM change tracking
+
+
+def _insert(table, rows):
+    if rows:
+        db.session.execute(table.insert(), rows)
+
+
+def _fast_sqlite():
+    """Trade durability for speed while seeding a local sqlite file."""
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(db.text("PRAGMA synchronous=OFF"))
+        db.session.execute(db.text("PRAGMA temp_store=MEMORY"))
+
+
+def seed_users(users, rnd, password="password123", batch=10_000):
+    start = _next_id(User)
+    pw_hash = generate_password_hash(password)      # hashing is slow; share one
+    rows = []
+    for uid in range(start, start + users):
+        rows.append({"id": uid, "email": f"user{uid}@seed.local", "name": f"User {uid}", "password_hash": pw_hash})
+        if len(rows) >= batch:
+            _insert(User.__table__, rows)
+            rows = []
+    _insert(User.__table__, rows)
+    return list(range(start, start + users))
+
+
+def seed_categories(categories):
+    start = _next_id(Category)
+    rows = []
+    for cid in range(start, start + categories):
+        word = CATEGORY_WORDS[cid % len(CATEGORY_WORDS)]
+        rows.append({"id": cid, "name": f"{word} {cid}"})
+    _insert(Category.__table__, rows)
+    return list(range(start, start + categories))
+
+
+def seed_products(products, category_ids, rnd, price="lognormal:1.2:0.9", stock="uniform:0:500",
+                  out_of_stock=0.05, images=2, pinned=0.01, batch=10_000):
+    """Insert products (+ images); returns (ids, names, prices) for cart snapshots."""
+    price_of, stock_of = parse_dist(price), parse_dist(stock)
+    start = _next_id(Product)
+    prices, names = array("d"), []
+    prows, irows = [], []
+    for pid in range(start, start + products):
+        p = max(round(price_of(rnd), 2), 0.0)
+        prices.append(p)
+        qty = 0 if rnd.random() < out_of_stock else max(int(stock_of(rnd)), 0)
+        name = f"{rnd.choice(BRANDS)} {rnd.choice(ITEMS)} {rnd.choice(SIZES)}"
+        names.append(name)
+        prows.append({
+            "id": pid,
+            "barcode": ean13(pid),
+            "code": f"P{pid:08d}",
+            "slug": f"{name.lower().replace(' ', '-')}-{pid}",
+            "name": name,
+            "price": p,
+            "price_format": f"${p:,.2f}",
+            "quantity": qty,
+            "minimum_order": 1,
+            "subtract_stock": "yes",
+            "out_of_stock_status": "in_stock" if qty else "out_of_stock",
+            "sort_order": rnd.randint(0, 100),
+            "status": True,
+            "is_pin": rnd.random() < pinned,
+            "is_new": rnd.random() < 0.05,
+            "viewed": int(rnd.paretovariate(1.5)) - 1,
+            "is_favourite": False,
+            "reviewable": True,
+            "unit": rnd.choice(UNITS),
+            "ean_code": ean13(pid),
+            "category_id": rnd.choice(category_ids) if category_ids else None,
+        })
+        for n in range(images):
+            url = f"/static/uploads/seed-{pid}-{n}.jpg"
+            irows.append({"product_id": pid, "name": "main" if n == 0 else f"image_{n}",
+                          "image_path": url, "image_url": url, "main": n == 0, "sort_order": n})
+        if len(prows) >= batch:
+            _insert(Product.__table__, prows)
+            _insert(ProductImage.__table__, irows)
+            prows, irows = [], []
+    _insert(Product.__table__, prows)
+    _insert(ProductImage.__table__, irows)
+    return range(start, start + products), names, prices
+
+
+def seed_carts(carts, user_ids, product_range, rnd, items_per_cart="uniform:1:8", guest_ratio=0.3,
+               batch=10_000):
+    ids, names, prices = product_range
+    if not ids:
+        raise click.UsageError("no products to put in carts; seed the catalog first")
+    items_of = parse_dist(items_per_cart)
+    start = _next_id(Cart)
+    crows, irows = [], []
+    for cid in range(start, start + carts):
+        guest = not user_ids or rnd.random() < guest_ratio
+        crows.append({
+            "id": cid,
+            "uuid": "%08x-%04x-4%03x-%04x-%012x" % (
+                rnd.getrandbits(32), rnd.getrandbits(16), rnd.getrandbits(12),
+                0x8000 | rnd.getrandbits(14), rnd.getrandbits(48)),
+            "user_id": None if guest else rnd.choice(user_ids),
+            "status": "active",
+        })
+        n = min(max(int(round(items_of(rnd))), 0), len(ids))
+        for idx in rnd.sample(range(len(ids)), n):
+            irows.append({"cart_id": cid, "product_id": ids[idx], "product_name": names[idx],
+                          "product_price": prices[idx], "quantity": rnd.randint(1, 3)})
+        if len(irows) >= batch:
+            _insert(Cart.__table__, crows)
+            _insert(CartItem.__table__, irows)
+            crows, irows = [], []
+    _insert(Cart.__table__, crows)
+    _insert(CartItem.__table__, irows)
+
+
+def _existing_products():
+    """(ids, names, prices) of the products already in the database."""
+    ids, names, prices = array("q"), [], array("d")
+    for pid, name, price in db.session.execute(select(Product.id, Product.name, Product.price)):
+        ids.append(pid)
+        names.append(name)
+        prices.append(price or 0.0)
+    return ids, names, prices
+
+
+def seed_all(products=10_000, categories=50, images=2, users=1_000, carts=1_000, seed=42,
+             price="lognormal:1.2:0.9", stock="uniform:0:500", out_of_stock=0.05,
+             items_per_cart="uniform:1:8", batch=10_000):
+    """Programmatic entry point (used by the CLI and bench/http_bench.py)."""
+    rnd = random.Random(seed)
+    _fast_sqlite()
+    user_ids = seed_users(users, rnd, batch=batch)
+    category_ids = seed_categories(categories)
+    product_range = seed_products(products, category_ids, rnd, price=price, stock=stock,
+                                  out_of_stock=out_of_stock, images=images, batch=batch)
+    if carts:
+        seed_carts(carts, user_ids, product_range, rnd, items_per_cart=items_per_cart, batch=batch)
+    _commit()
+
+
+# ---------- CLI ----------
+def _common(f):
+    f = click.option("--seed", default=42, show_default=True, help="random seed")(f)
+    f = click.option("--batch", default=10_000, show_default=True, help="rows per INSERT batch")(f)
+    return f
+
+
+def _done(what, t0):
+    click.echo(f"seeded {what} in {time.perf_counter() - t0:.1f}s")
+
+
+@seed_cli.command("all")
+@click.option("--products", default=10_000, show_default=True)
+@click.option("--categories", default=50, show_default=True)
+@click.option("--images", default=2, show_default=True, help="images per product")
+@click.option("--users", default=1_000, show_default=True)
+@click.option("--carts", default=1_000, show_default=True)
+@click.option("--price", default="lognormal:1.2:0.9", show_default=True)
+@click.option("--stock", default="uniform:0:500", show_default=True)
+@click.option("--out-of-stock", default=0.05, show_default=True, help="share of products with quantity 0")
+@click.option("--items-per-cart", default="uniform:1:8", show_default=True)
+@_common
+def seed_all_cmd(**opts):
+    """Users, categories, products with images and carts with items."""
+    t0 = time.perf_counter()
+    seed_all(**opts)
+    _done(f"{opts['products']} products, {opts['users']} users, {opts['carts']} carts", t0)
+
+
+@seed_cli.command("catalog")
+@click.option("--products", default=10_000, show_default=True)
+@click.option("--categories", default=50, show_default=True)
+@click.option("--images", default=2, show_default=True)
+@click.option("--price", default="lognormal:1.2:0.9", show_default=True)
+@click.option("--stock", default="uniform:0:500", show_default=True)
+@click.option("--out-of-stock", default=0.05, show_default=True)
+@_common
+def seed_catalog_cmd(products, categories, images, price, stock, out_of_stock, seed, batch):
+    """Categories and products with images."""
+    t0 = time.perf_counter()
+    rnd = random.Random(seed)
+    _fast_sqlite()
+    category_ids = seed_categories(categories) or [c for (c,) in db.session.execute(select(Category.id))]
+    seed_products(products, category_ids, rnd, price=price, stock=stock, out_of_stock=out_of_stock,
+                  images=images, batch=batch)
+    _commit()
+    _done(f"{products} products", t0)
+
+
+@seed_cli.command("users")
+@click.option("--users", default=1_000, show_default=True)
+@click.option("--password", default="password123", show_default=True)
+@_common
+def seed_users_cmd(users, password, seed, batch):
+    """Users sharing one password."""
+    t0 = time.perf_counter()
+    _fast_sqlite()
+    seed_users(users, random.Random(seed), password=password, batch=batch)
+    _commit()
+    _done(f"{users} users", t0)
+
+
+@seed_cli.command("carts")
+@click.option("--carts", default=1_000, show_default=True)
+@click.option("--items-per-cart", default="uniform:1:8", show_default=True)
+@click.option("--guest-ratio", default=0.3, show_default=True, help="share of carts without a user")
+@_common
+def seed_carts_cmd(carts, items_per_cart, guest_ratio, seed, batch):
+    """Active carts over the existing users and products."""
+    t0 = time.perf_counter()
+    _fast_sqlite()
+    user_ids = [u for (u,) in db.session.execute(select(User.id))]
+    seed_carts(carts, user_ids, _existing_products(), random.Random(seed),
+               items_per_cart=items_per_cart, guest_ratio=guest_ratio, batch=batch)
+    _commit()
+    _done(f"{carts} carts", t0)
@@ -0,0 +1,142 @@
+# app/services/catalog_events.py
+"""
+Catalog change tracking.
+
+ORM flushes that touch products, product images or categories are collected
+on the session and, once the transaction commits:
+  - catalog_stamp is bumped for any product/image/category change
+  - category_stamp is bumped when categories change or products are
+    added, removed or moved between categories
+  - in-process subscribers get the changed ids ({"product": {"upsert": {...},
+    "delete": {...}}, ...}) and the (previous, token) pair of that bump, so
+    they can update incrementally and adopt the new token as their own
+
+Before each flush, written products (or their images) get the next
+change_seq from catalog_sequence and deleted ones a ProductTombstone: the
+ordered log behind GET /api/products/changes. Numbers are taken with an
+UPDATE of the sequence row in the writing transaction, so a concurrent
+writer waits for the commit and numbers follow commit order; a client never
+sees seq 12 before a still-open transaction commits seq 11.
+
+Bulk writes that bypass the ORM (flask seed) call bump_all() themselves.
+Their rows (and view counts, written in core) keep change_seq 0 and reach
+clients through a full sync (since=0).
+"""
+from collections import defaultdict
+from itertools import count
+
+from sqlalchemy import event, inspect, select, update
+
+from ..utils.db_routing import RoutingSession
+from ..utils.stamp import VersionStamp
+
+catalog_stamp = VersionStamp("catalog")
+category_stamp = VersionStamp("categories")
+
+WATCHED = {"product", "product_image", "category"}
+
+_subscribers = []
+
+
+def on_catalog_commit(fn):
+    """Register fn(changes, stamp) to run after a commit that touched the catalog;
+    stamp is catalog_stamp.bump()'s (previous, token)."""
+    _subscribers.append(fn)
+    return fn
+
+
+def bump_all():
+    catalog_stamp.bump()
+    category_stamp.bump()
+
+
+def _table(obj):
+    return getattr(type(obj), "__tablename__", None)
+
+
+def _allocate(session, n):
+    """Reserve n change_seq values; returns an iterator over them."""
+    from ..model import CatalogSequence
+
+    table = CatalogSequence.__table__
+    if not session.execute(update(table).where(table.c.id == 1).values(value=table.c.value + n)).rowcount:
+        session.execute(table.insert().values(id=1, value=n))
+    last = session.execute(select(table.c.value).where(table.c.id == 1)).scalar_one()
+    return count(last - n + 1)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _sequence(session, flush_context, instances):
+    written, deleted = {}, []
+    for obj in session.deleted:
+        if _table(obj) == "product":
+            deleted.append(obj)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = _table(obj)
+        if table == "product_image":
+            obj = obj.product
+        elif table != "product" or (obj in session.dirty and not session.is_modified(obj)):
+            continue
+        if obj is not None and obj not in session.deleted:
+            written[id(obj)] = obj
+    if not written and not deleted:
+        return
+
+    from ..model import ProductTombstone
+
+    seq = _allocate(session, len(written) + len(deleted))
+    for obj in sorted(written.values(), key=lambda o: (o.id is None, o.id or 0)):
+        obj.change_seq = next(seq)
+    for obj in deleted:
+        session.add(ProductTombstone(product_id=obj.id, change_seq=next(seq)))
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect(session, flush_context):
+    changes = None
+    for op, objs in (("upsert", session.new), ("upsert", session.dirty), ("delete", session.deleted)):
+        for obj in objs:
+            table = _table(obj)
+            if table not in WATCHED:
+                continue
+            if changes is None:
+                changes = session.info.setdefault(
+                    "catalog_changes", defaultdict(lambda: {"upsert": set(), "delete": set()})
+                )
+            if op == "upsert" and obj in session.dirty and not session.is_modified(obj):
+                continue
+            changes[table][op].add(obj.id)
+            if table == "product" and _moves_category(obj, op, session):
+                session.info["category_counts_changed"] = True
+            elif table == "category":
+                session.info["category_counts_changed"] = True
+
+
+def _moves_category(obj, op, session):
+    if op == "delete" or obj in session.new:
+        return True
+    return inspect(obj).attrs.category_id.history.has_changes()
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _publish(session):
+    changes = session.info.pop("catalog_changes", None)
+    counts_changed = session.info.pop("category_counts_changed", False)
+    if not changes:
+        return
+    stamp = catalog_stamp.bump()
+    if counts_changed:
+        category_stamp.bump()
+    for fn in _subscribers:
+        fn(changes, stamp)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard(session):
+    session.info.pop("catalog_changes", None)
+    session.info.pop("category_counts_changed", None)
+
+
+def init_catalog_events(app):
+    catalog_stamp.init_app(app)
+    category_stamp.init_app(app)
@@ -0,0 +1,190 @@
+# app/services/catalog_snapshot.py
+"""
+Prebuilt catalog snapshot for cold starts (GET /api/products/snapshot).
+
+The whole catalog is written as gzipped NDJSON, one Product.as_api() per
+line in id order, to SNAPSHOT_DIR (default instance/snapshots) and served
+with send_file: ETag, If-None-Match and Range come for free, and a request
+costs no SQL. current.json names the latest file with the change feed
+cursor it was read at, so a client downloads the snapshot once and then
+follows GET /api/products/changes?since=<cursor>.
+
+A background thread in each worker compares catalog_stamp with the one the
+snapshot was built from every SNAPSHOT_INTERVAL seconds and rebuilds when
+it moved; a flock on build.lock lets one worker per host do it. The cursor
+is read before the products, so anything committed during a build has a
+higher change_seq and is replayed by the feed. The previous SNAPSHOT_KEEP
+files stay on disk for downloads still in progress.
+
+    flask catalog-snapshot [--force]      # build now (deploy hook, cron)
+"""
+import gzip
+import json
+import os
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from ..extensions import db
+from ..utils.query_budget import unbudgeted
+from .catalog_events import catalog_stamp
+
+try:
+    import fcntl
+except ImportError:     # Windows: no cross-process lock
+    fcntl = None
+
+MANIFEST = "current.json"
+
+
+class CatalogSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._app = None
+        self._pid = None
+        self._manifest = None
+        self._manifest_key = None
+        self.directory = None
+        self.interval = 30.0
+        self.keep = 2
+
+    def init_app(self, app):
+        self._app = app if app.config.get("SNAPSHOT_ENABLED", True) else None
+        self.directory = app.config.get("SNAPSHOT_DIR") or os.path.join(app.instance_path, "snapshots")
+        self.interval = app.config.get("SNAPSHOT_INTERVAL", 30.0)
+        self.keep = app.config.get("SNAPSHOT_KEEP", 2)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def current(self):
+        """Manifest of the latest snapshot ({"file", "path", "etag", "cursor", "count", ...}) or None."""
+        self._ensure_thread()
+        path = os.path.join(self.directory, MANIFEST)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_ino)
+        if key != self._manifest_key:
+            manifest = self._read_manifest()
+            if manifest is None:
+                return None
+            manifest["path"] = os.path.join(self.directory, manifest["file"])
+            with self._lock:
+                self._manifest, self._manifest_key = manifest, key
+        return self._manifest
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _ensure_thread(self):
+        # started lazily so every forked gunicorn worker gets its own thread
+        if self._app is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="catalog-snapshot", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    self.refresh()
+            except Exception as e:
+                self._app.logger.warning("catalog snapshot build failed: %s", e)
+            time.sleep(self.interval)
+
+    def refresh(self, force=False):
+        """Rebuild if the catalog changed since the last snapshot; returns the
+        new manifest, or None when it is current or another worker is building."""
+        with open(os.path.join(self.directory, "build.lock"), "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            stamp = catalog_stamp.current()
+            manifest = self._read_manifest()
+            if not force and manifest is not None and manifest.get("stamp") == list(stamp or ()):
+                return None
+            return self.build(stamp)
+
+    def build(self, stamp):
+        from ..model import Product, ProductTombstone
+
+        name = f"catalog-{time.time_ns()}"
+        tmp = os.path.join(self.directory, f"{name}.tmp")
+        dumps = current_app.json.dumps
+        started = time.monotonic()
+        count = 0
+        # a plain Session on the primary engine: never snapshot a lagging replica
+        with unbudgeted(), Session(db.engine) as session:
+            # the feed position of the newest change, as GET /api/products/changes would return it
+            last = max(
+                tuple(session.execute(select(Product.change_seq, Product.id)
+                                      .order_by(Product.change_seq.desc(), Product.id.desc()).limit(1)).first() or ()),
+                tuple(session.execute(select(ProductTombstone.change_seq, ProductTombstone.product_id)
+                                      .order_by(ProductTombstone.change_seq.desc()).limit(1)).first() or ()),
+            )
+            cursor = f"{last[0]}.{last[1]}" if last else "0"
+            products = session.scalars(
+                select(Product).options(selectinload(Product.images)).order_by(Product.id)
+                .execution_options(yield_per=1000)
+            )
+            with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as out:
+                for product in products:
+                    out.write(dumps(product.as_api()).encode())
+                    out.write(b"\n")
+                    count += 1
+        os.replace(tmp, os.path.join(self.directory, f"{name}.ndjson.gz"))
+
+        manifest = {
+            "file": f"{name}.ndjson.gz",
+            "etag": name,
+            "cursor": cursor,
+            "count": count,
+            "stamp": list(stamp or ()),
+            "built_at": int(time.time()),
+        }
+        manifest_tmp = os.path.join(self.directory, f"{MANIFEST}.tmp")
+        with open(manifest_tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_tmp, os.path.join(self.directory, MANIFEST))
+        self._prune()
+        current_app.logger.info(
+            "catalog snapshot %s: %d products in %.1fs", manifest["file"], count, time.monotonic() - started
+        )
+        return manifest
+
+    def _prune(self):
+        files = sorted(f for f in os.listdir(self.directory) if f.startswith("catalog-") and f.endswith(".ndjson.gz"))
+        for f in files[:-(self.keep + 1)]:
+            try:
+                os.remove(os.path.join(self.directory, f))
+            except OSError:
+                pass
+
+
+catalog_snapshot = CatalogSnapshot()
+
+
+@click.command("catalog-snapshot")
+@click.option("--force", is_flag=True, help="rebuild even if the catalog did not change")
+@with_appcontext
+def snapshot_cmd(force):
+    """Build the catalog snapshot served at /api/products/snapshot."""
+    manifest = catalog_snapshot.refresh(force=force)
+    if manifest is None:
+        click.echo("snapshot is current (or another process is building it)")
+    else:
+        click.echo(f"{manifest['file']}: {manifest['count']} products, cursor {manifest['cursor']}")
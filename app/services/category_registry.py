@@ -0,0 +1,82 @@
+# app/services/category_registry.py
+"""
+Per-worker in-memory category registry: id -> name and product count.
+
+Loaded at startup and reloaded lazily whenever category_stamp changes (a
+category was written or a product was added, removed or moved between
+categories in any worker). Reads are served without touching the database;
+reloads always go to the primary so a lagging replica is never cached.
+"""
+import threading
+
+from sqlalchemy import func, select
+
+from ..extensions import db
+from ..utils.metrics import record_cache
+from ..utils.query_budget import unbudgeted
+from .catalog_events import category_stamp
+
+
+class CategoryRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = object()
+        self._by_id = {}        # id -> {"id", "name"}
+        self._counts = {}       # id -> product count
+        self._ordered = []      # dicts sorted by name
+
+    def load(self):
+        from ..model import Category, Product
+
+        version = category_stamp.current()
+        with unbudgeted(), db.engine.connect() as conn:
+            rows = conn.execute(select(Category.id, Category.name)).all()
+            counts = dict(conn.execute(
+                select(Product.category_id, func.count())
+                .where(Product.category_id.isnot(None))
+                .group_by(Product.category_id)
+            ).all())
+        by_id = {cid: {"id": cid, "name": name} for cid, name in rows}
+        with self._lock:
+            self._by_id = by_id
+            self._counts = counts
+            self._ordered = sorted(by_id.values(), key=lambda c: c["name"])
+            self._version = version
+
+    def is_current(self):
+        """True when reads will not reload from the database."""
+        return category_stamp.current() == self._version
+
+    def _fresh(self):
+        if category_stamp.current() != self._version:
+            record_cache("categories", False)
+            self.load()
+        else:
+            record_cache("categories", True)
+        return self
+
+    def get(self, cid):
+        if cid is None:
+            return None
+        return self._fresh()._by_id.get(cid)
+
+    def count(self, cid) -> int:
+        return self._fresh()._counts.get(cid, 0)
+
+    def with_count(self, category: dict) -> dict:
+        return {**category, "product_count": self._counts.get(category["id"], 0)}
+
+    def search(self, q="", sort="name"):
+        """Categories whose name contains q (case-insensitive), sorted like list_categories."""
+        items = self._fresh()._ordered
+        if q:
+            needle = q.casefold()
+            items = [c for c in items if needle in c["name"].casefold()]
+        if sort in ("id", "-id"):
+            items = sorted(items, key=lambda c: c["id"], reverse=sort == "-id")
+        elif sort == "-name":
+            items = items[::-1]
+        return items
+
+
+category_registry = CategoryRegistry()
@@ -0,0 +1,172 @@
+# app/services/chunked_uploads.py
+"""
+On-disk state of resumable image uploads (app/upload/routes.py).
+
+Each upload is three files in UPLOAD_TMP_DIR (default instance/uploads),
+shared by all workers:
+
+    <id>.json   sidecar: product_id, filename, size, sha256, name, main, expires_at
+    <id>.part   the bytes received so far; its size is the upload offset
+    <id>.lock   flock()ed while a chunk is written or the upload completes
+
+Chunks are copied from the request stream to <id>.part in BLOCK_SIZE reads,
+so no worker ever holds a whole image in memory, and a chunk cut off by a
+dropped connection keeps what arrived: the client asks for the offset and
+resumes from there. Sessions expire UPLOAD_SESSION_TTL seconds after init.
+"""
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # Windows: no cross-process lock, single-worker dev only
+    fcntl = None
+
+BLOCK_SIZE = 64 * 1024
+_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class UploadConflict(Exception):
+    """The chunk does not start at the current offset (or another is being written)."""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+class ChunkedUploads:
+    def __init__(self):
+        self.directory = None
+        self.ttl = 86400
+
+    def init_app(self, app):
+        self.directory = app.config.get("UPLOAD_TMP_DIR") or os.path.join(app.instance_path, "uploads")
+        self.ttl = app.config.get("UPLOAD_SESSION_TTL", 86400)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, uid, suffix):
+        return os.path.join(self.directory, f"{uid}.{suffix}")
+
+    def part_path(self, uid):
+        return self._path(uid, "part")
+
+    def create(self, meta):
+        uid = secrets.token_urlsafe(24)
+        meta = {**meta, "expires_at": int(time.time()) + self.ttl}
+        open(self.part_path(uid), "xb").close()
+        self.save(uid, meta)
+        return uid, meta
+
+    def get(self, uid):
+        """Sidecar of a live upload, else None (expired uploads are discarded)."""
+        if not _ID.match(uid or ""):
+            return None
+        try:
+            with open(self._path(uid, "json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("expires_at", 0) < time.time():
+            self.discard(uid)
+            return None
+        return meta
+
+    def save(self, uid, meta):
+        tmp = self._path(uid, "json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(uid, "json"))
+
+    def offset(self, uid):
+        try:
+            return os.path.getsize(self.part_path(uid))
+        except OSError:
+            return 0
+
+    @contextmanager
+    def locked(self, uid):
+        """Exclusive hold on the upload across workers; UploadConflict if already held."""
+        with open(self._path(uid, "lock"), "a") as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise UploadConflict("Another request is writing this upload", self.offset(uid)) from None
+            yield
+
+    def write(self, uid, offset, stream, limit):
+        """Append up to `limit` bytes from stream at `offset`; returns the new offset.
+
+        Call under locked(uid). ValueError when the stream has more than
+        `limit` bytes (nothing of the chunk is kept).
+        """
+        with open(self.part_path(uid), "r+b") as f:
+            current = os.fstat(f.fileno()).st_size
+            if current != offset:
+                raise UploadConflict(f"Chunk must start at offset {current}", current)
+            f.seek(offset)
+            written = 0
+            while True:
+                block = stream.read(min(BLOCK_SIZE, limit - written + 1))
+                if not block:
+                    break
+                written += len(block)
+                if written > limit:
+                    f.truncate(offset)
+                    raise ValueError("Chunk exceeds the declared upload size")
+                f.write(block)
+            return offset + written
+
+    def digest(self, uid):
+        h = hashlib.sha256()
+        with open(self.part_path(uid), "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def sweep(self, grace, dry_run=False):
+        """Drop expired uploads and stray files older than `grace` seconds;
+        returns (uploads, bytes). Live uploads are never touched."""
+        now = time.time()
+        stale, reclaimed = set(), 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                uid, _, suffix = entry.name.partition(".")
+                if not entry.is_file() or not _ID.match(uid) or uid in stale:
+                    continue
+                if suffix == "json":
+                    try:
+                        with open(entry.path) as f:
+                            expired = json.load(f).get("expires_at", 0) < now
+                    except (OSError, ValueError):
+                        expired = entry.stat().st_mtime < now - grace
+                elif not os.path.exists(self._path(uid, "json")):     # left behind by a crash
+                    expired = entry.stat().st_mtime < now - grace
+                else:
+                    expired = False
+                if expired:
+                    stale.add(uid)
+        for uid in stale:
+            for suffix in ("json", "part", "lock", "json.tmp"):
+                try:
+                    reclaimed += os.path.getsize(self._path(uid, suffix))
+                except OSError:
+                    pass
+            if not dry_run:
+                self.discard(uid)
+        return len(stale), reclaimed
+
+    def discard(self, uid):
+        for suffix in ("json", "part", "lock", "json.tmp"):
+            try:
+                os.remove(self._path(uid, suffix))
+            except FileNotFoundError:
+                pass
+
+
+chunked_uploads = ChunkedUploads()
@@ -0,0 +1,73 @@
+# app/services/pinned_products.py
+"""
+Per-worker cache of the pinned products list (home screen).
+
+Rendered once per catalog version: any product/image/category commit bumps
+catalog_stamp (set_pin and update_product included) and the next read
+rebuilds from the primary. A warm read is one stat() and no SQL.
+
+Anonymous responses are also kept as a CachedBody, so their gzip/brotli
+variants are built once per catalog version, locale/currency (price_format)
+and API_TIME second rather than per request.
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..utils.compression import CachedBody
+from ..utils.metrics import record_cache
+from ..utils.query_budget import unbudgeted
+from .catalog_events import catalog_stamp
+
+
+class PinnedProducts:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = object()
+        self._items = []
+        self._bodies = {}           # variant -> (key, CachedBody)
+
+    def load(self):
+        from ..model import Product
+
+        version = catalog_stamp.current()
+        limit = current_app.config.get("PINNED_LIMIT", 50)
+        # a plain Session on the primary engine: never cache a lagging replica
+        with unbudgeted(), Session(db.engine) as session:
+            products = session.scalars(
+                select(Product)
+                .where(Product.is_pin.is_(True))
+                .order_by(Product.sort_order.asc(), Product.id.asc())
+                .limit(limit)
+            ).unique().all()
+            items = [p.as_api() for p in products]
+        with self._lock:
+            self._items = items
+            self._version = version
+
+    def items(self):
+        if catalog_stamp.current() != self._version:
+            record_cache("pinned", False)
+            self.load()
+        else:
+            record_cache("pinned", True)
+        return self._items
+
+    def body(self, render, variant=None):
+        """CachedBody of render() (the anonymous response bytes) for the current
+        catalog version and `variant`; re-rendered at most once a second to keep
+        API_TIME honest."""
+        key = (self._version, int(time.time()))
+        cached = self._bodies.get(variant)
+        if cached is None or cached[0] != key:
+            cached = (key, CachedBody(render()))
+            with self._lock:
+                self._bodies[variant] = cached
+        return cached[1]
+
+
+pinned_products = PinnedProducts()
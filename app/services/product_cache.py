@@ -0,0 +1,186 @@
+# app/services/product_cache.py
+"""
+Per-worker LRU identity cache of rendered products (Product.as_api()).
+
+Shared by get_product, batch_get and the by-barcode/code/slug lookups.
+Entries are keyed by id, with barcode/code/slug indexes pointing at the same
+entries, and hold the anonymous rendering; per-user fields (is_favourite)
+are applied by the caller. Lookups that found nothing are remembered for
+PRODUCT_NEGATIVE_TTL seconds so repeated scans of unknown barcodes stay off
+the database.
+
+Invalidation:
+  - commits in this worker evict exactly the products they touched
+    (on_catalog_commit) and drop all remembered misses; image or category
+    changes clear everything
+  - a catalog_stamp bump from another worker clears everything on the
+    next read, or at our own next commit if its bump replaced that one
+  - rows loaded while a commit invalidated the cache are returned but not
+    cached: store() checks the version lookup() saw, so a pre-commit row
+    (or a miss for a row just created) cannot outlive the commit
+
+Misses are loaded from the primary in one IN query per call (the ASGI mode
+runs load_query on the async engine and hands the rows to store()); as with the
+other catalog caches, a lagging replica is never cached. The views built on
+this cache (get_product, the by-barcode/code/slug lookups, batchGet) are
+therefore not @use_replica: their reads are the cache, then the primary. Product.viewed in a
+cached entry is only as fresh as the entry, since view flushes do not bump
+the stamp.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..utils.metrics import record_cache
+from .catalog_events import catalog_stamp, on_catalog_commit
+
+KEYS = ("id", "barcode", "code", "slug")
+
+
+class ProductCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()         # id -> as_api() dict, LRU order
+        self._index = {"barcode": {}, "code": {}, "slug": {}}
+        self._misses = {}                   # (key, value) -> expiry (monotonic)
+        self._version = None                # catalog_stamp token the entries are valid for
+
+    def _capacity(self):
+        return current_app.config.get("PRODUCT_CACHE_SIZE", 10_000)
+
+    def _check_version(self):
+        current = catalog_stamp.current()
+        if current == self._version:
+            return
+        with self._lock:
+            self._clear()
+            self._version = current
+
+    def _clear(self):
+        self._items.clear()
+        self._misses.clear()
+        for index in self._index.values():
+            index.clear()
+
+    def _evict(self, pid):
+        item = self._items.pop(pid, None)
+        if item is not None:
+            for key, index in self._index.items():
+                if index.get(item.get(key)) == pid:
+                    del index[item[key]]
+
+    def _put(self, item, capacity, via="id"):
+        # caller holds self._lock
+        self._evict(item["id"])
+        self._items[item["id"]] = item
+        for key, index in self._index.items():
+            # slugs are not unique: only index the product a slug lookup resolved to
+            if item.get(key) and (key != "slug" or via == "slug"):
+                index[item[key]] = item["id"]
+        while len(self._items) > capacity:
+            self._evict(next(iter(self._items)))
+
+    def _lookup(self, key, value):
+        with self._lock:
+            pid = value if key == "id" else self._index[key].get(value)
+            item = self._items.get(pid)
+            if item is not None:
+                self._items.move_to_end(pid)
+            return item
+
+    def _known_missing(self, key, value, now):
+        expires = self._misses.get((key, value))
+        if expires is None:
+            return False
+        if expires < now:
+            self._misses.pop((key, value), None)
+            return False
+        return True
+
+    def lookup(self, key, values):
+        """(found, missing, version): cached entries by value, the values still
+        to load, and the version to hand to store() with them."""
+        if key not in KEYS:
+            raise ValueError(f"unknown product key {key!r}")
+        self._check_version()
+        version = self._version
+        now = time.monotonic()
+        found, missing = {}, []
+        for value in values:
+            item = self._lookup(key, value)
+            if item is not None:
+                found[value] = item
+            elif not self._known_missing(key, value, now):
+                missing.append(value)
+                record_cache("products", False)
+                continue
+            record_cache("products", True)
+        return found, missing, version
+
+    def store(self, key, missing, items, found, version):
+        """Add `items` loaded for the `missing` values to found, and cache them
+        (the rest as misses) unless a commit invalidated the cache since the
+        lookup() that returned `version`: the rows may predate it."""
+        loaded = []
+        for item in items:
+            if item[key] not in found:      # slug: lowest id wins
+                found[item[key]] = item
+                loaded.append(item)
+        ttl = current_app.config.get("PRODUCT_NEGATIVE_TTL", 30)
+        capacity = self._capacity()
+        with self._lock:
+            if self._version != version:
+                return found
+            for item in loaded:
+                self._put(item, capacity, via=key)
+            if ttl > 0:
+                if len(self._misses) > capacity:
+                    self._misses.clear()        # bound memory under floods of unknown keys
+                expires = time.monotonic() + ttl
+                for value in missing:
+                    if value not in found:
+                        self._misses[(key, value)] = expires
+        return found
+
+    def get_many(self, key, values):
+        """{value: as_api() dict} for the values found; misses cost one IN query."""
+        found, missing, version = self.lookup(key, values)
+        if missing:
+            self.store(key, missing, self._load(key, missing), found, version)
+        return found
+
+    def get(self, pid):
+        return self.get_many("id", [pid]).get(pid)
+
+    @staticmethod
+    def load_query(key, values):
+        from ..model import Product
+
+        return select(Product).where(getattr(Product, key).in_(values)).order_by(Product.id)
+
+    def _load(self, key, values):
+        with Session(db.engine) as session:
+            products = session.scalars(self.load_query(key, values)).unique().all()
+            return [p.as_api() for p in products]
+
+    def invalidate(self, changes, stamp):
+        previous, token = stamp
+        with self._lock:
+            self._misses.clear()
+            # previous != _version: another worker bumped first and our bump hid it
+            if changes.get("product_image") or changes.get("category") or previous != self._version:
+                self._clear()
+            else:
+                product = changes.get("product") or {}
+                for pid in product.get("upsert", set()) | product.get("delete", set()):
+                    self._evict(pid)
+            self._version = token
+
+
+product_cache = ProductCache()
+on_catalog_commit(product_cache.invalidate)
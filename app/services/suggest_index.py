@@ -0,0 +1,239 @@
+# app/services/suggest_index.py
+"""
+In-memory prefix index for product type-ahead (GET /api/products/suggest).
+
+Every product name word, barcode and code is a token. Tokens are kept in one
+sorted list so a prefix is a bisect range, and each token maps to the ids
+carrying it, ordered by weight (views, plus SUGGEST_PIN_BOOST for pinned
+products). A lookup walks at most SUGGEST_SCAN_LIMIT tokens/ids of the range
+and ranks their heads, so it never touches the database.
+
+Built from the primary in a background thread on the first lookup (empty
+results until then), or in create_app with SUGGEST_PRELOAD=1. Commits in
+this worker update it incrementally (on_catalog_commit) and adopt the token
+their own bump wrote; a catalog_stamp bump from another worker, seen on a
+lookup or behind one of our bumps, triggers a background rebuild while the
+current index keeps serving. View counts only refresh on rebuild, since
+view flushes do not bump the stamp.
+"""
+import heapq
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+from flask import current_app
+from sqlalchemy import select
+
+from ..extensions import db
+from ..utils.query_budget import unbudgeted
+from .catalog_events import catalog_stamp, on_catalog_commit
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(name, barcode=None, code=None):
+    tokens = set(_WORD.findall((name or "").casefold()))
+    for value in (barcode, code):
+        if value:
+            tokens.add(value.casefold())
+    return tokens
+
+
+class _Index:
+    """One snapshot of the index; mutated only under SuggestIndex._lock.
+
+    Most barcode/code tokens belong to a single product, so a posting is a
+    bare id until a second product shares the token (then an array of ids,
+    weight desc). A million seeded products index in ~10s and ~0.7 GB per
+    worker, which is why SUGGEST_PRELOAD is off by default.
+    """
+
+    def __init__(self):
+        self.tokens = []            # sorted distinct tokens
+        self.postings = {}          # token -> id | array of ids, weight desc
+        self.docs = {}              # id -> (name, barcode, code, weight)
+
+    def key(self, pid):
+        return -self.docs[pid][3]
+
+    def ids(self, token):
+        ids = self.postings[token]
+        return (ids,) if isinstance(ids, int) else ids
+
+    def add(self, pid, name, barcode, code, weight):
+        self.docs[pid] = (name, barcode, code, weight)
+        for token in tokenize(name, barcode, code):
+            ids = self.postings.get(token)
+            if ids is None:
+                insort(self.tokens, token)
+                self.postings[token] = pid
+            else:
+                ids = self.postings[token] = array("l", self.ids(token))
+                insort(ids, pid, key=self.key)
+
+    def remove(self, pid):
+        doc = self.docs.get(pid)
+        if doc is None:
+            return
+        for token in tokenize(doc[0], doc[1], doc[2]):
+            ids = self.postings[token]
+            if not isinstance(ids, int):
+                ids.remove(pid)
+                if len(ids) == 1:
+                    self.postings[token] = ids[0]
+            elif ids == pid:
+                del self.postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+        del self.docs[pid]
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = _Index()
+        self._version = None        # catalog_stamp token the live index reflects
+        self._building = None       # token the index being rebuilt will reflect, None if unknown
+        self._rebuilding = False
+        self._replay = set()        # ids written here while a rebuild was running
+        self._app = None
+
+    def init_app(self, app):
+        self._app = app
+
+    def _weight(self, viewed, is_pin):
+        return (viewed or 0) + (current_app.config.get("SUGGEST_PIN_BOOST", 1_000_000) if is_pin else 0)
+
+    def _rows(self, ids=None):
+        from ..model import Product
+
+        stmt = select(Product.id, Product.name, Product.barcode, Product.code, Product.viewed, Product.is_pin)
+        if ids is not None:
+            stmt = stmt.where(Product.id.in_(ids))
+        with unbudgeted(), db.engine.connect() as conn:
+            return conn.execute(stmt).all()
+
+    def load(self):
+        """Build a fresh index from the primary and swap it in."""
+        version = catalog_stamp.current()
+        with self._lock:
+            self._building = version
+        index = _Index()
+        postings = index.postings
+        for pid, name, barcode, code, viewed, is_pin in self._rows():
+            index.docs[pid] = (name, barcode, code, self._weight(viewed, is_pin))
+            for token in tokenize(name, barcode, code):
+                ids = postings.get(token)
+                if ids is None:
+                    postings[token] = pid
+                elif isinstance(ids, int):
+                    postings[token] = [ids, pid]
+                else:
+                    ids.append(pid)
+        for token, ids in postings.items():
+            if not isinstance(ids, int):
+                ids.sort(key=index.key)
+                postings[token] = array("l", ids)
+        index.tokens = sorted(postings)
+        with self._lock:
+            self._index = index
+            # own commits during the build chain onto `version` and are replayed;
+            # a foreign one breaks the chain and the next lookup rebuilds again
+            self._version = self._building if self._building is not None else version
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        app = self._app
+
+        def run():
+            try:
+                with app.app_context():
+                    self.load()
+                    with self._lock:
+                        replay, self._replay = self._replay, set()
+                        self._rebuilding = False
+                    if replay:
+                        self.apply({"product": {"upsert": replay}})
+            except Exception as e:
+                app.logger.warning("suggest index rebuild failed: %s", e)
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name="suggest-rebuild", daemon=True).start()
+
+    def _check_version(self):
+        current = catalog_stamp.current()
+        if current != self._version and self._app is not None:
+            self._rebuild_in_background()
+
+    def is_current(self):
+        """True when the index is built and no rebuild is due."""
+        return self._version is not None and catalog_stamp.current() == self._version
+
+    def suggest(self, prefix, limit=10):
+        """[{"id", "name", "barcode"}] for products with a token starting with
+        the last word of prefix (and earlier words as token prefixes), best first."""
+        words = _WORD.findall((prefix or "").casefold())
+        if not words:
+            return []
+        self._check_version()
+        last, rest = words[-1], words[:-1]
+        scan_limit = current_app.config.get("SUGGEST_SCAN_LIMIT", 500)
+        with self._lock:
+            index = self._index
+            start = bisect_left(index.tokens, last)
+            candidates, budget = set(), scan_limit
+            for token in index.tokens[start:start + scan_limit]:
+                if not token.startswith(last) or budget <= 0:
+                    break
+                ids = index.ids(token)
+                if rest:
+                    # ids are weight-ordered: the first `limit` matches are this token's best
+                    head = []
+                    for pid in ids[:budget]:
+                        budget -= 1
+                        doc = index.docs[pid]
+                        if _has_prefixes(tokenize(doc[0], doc[1], doc[2]), rest):
+                            head.append(pid)
+                            if len(head) >= limit:
+                                break
+                    candidates.update(head)
+                else:
+                    candidates.update(ids[:limit])
+            best = heapq.nsmallest(limit, candidates, key=index.key)
+            return [{"id": pid, "name": index.docs[pid][0], "barcode": index.docs[pid][1]} for pid in best]
+
+    def apply(self, changes, stamp=None):
+        """on_catalog_commit subscriber: re-index the products this worker wrote."""
+        product = changes.get("product") or {}
+        upserts = product.get("upsert", set())
+        deletes = product.get("delete", set())
+        if not upserts and not deletes:
+            return
+        previous, token = stamp or (None, None)
+        rows = self._rows(list(upserts)) if upserts else []
+        with self._lock:
+            if self._rebuilding:
+                # the snapshot being built may predate this commit
+                self._replay |= upserts | deletes
+                if stamp is not None:
+                    self._building = token if previous == self._building else None
+            for pid in upserts | deletes:
+                self._index.remove(pid)
+            for pid, name, barcode, code, viewed, is_pin in rows:
+                self._index.add(pid, name, barcode, code, self._weight(viewed, is_pin))
+            # adopt our token only on top of the one we had: else another
+            # worker's bump came first and _check_version must still see it
+            if stamp is not None and previous == self._version:
+                self._version = token
+
+
+def _has_prefixes(tokens, words):
+    return all(any(t.startswith(w) for t in tokens) for w in words)
+
+
+suggest_index = SuggestIndex()
+on_catalog_commit(suggest_index.apply)
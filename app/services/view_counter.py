@@ -0,0 +1,105 @@
+# app/services/view_counter.py
+"""
+Buffered Product.viewed counters.
+
+get_product only bumps an in-memory per-worker dict; a background thread
+writes the accumulated deltas every VIEW_FLUSH_INTERVAL seconds (or earlier
+once VIEW_FLUSH_MAX_PENDING distinct products are pending) in a single
+
+    UPDATE product SET viewed = coalesce(viewed, 0) + CASE id WHEN .. THEN .. END
+    WHERE id IN (...)
+
+Pending counts are flushed again at interpreter exit, so a graceful worker
+restart loses nothing and a hard kill loses at most one interval of views.
+A failed flush puts its deltas back for the next attempt.
+
+The UPDATE is a core statement on the primary: it does not go through the
+ORM session, so view counts never bump catalog_stamp or evict caches.
+"""
+import atexit
+import os
+import threading
+import time
+
+from sqlalchemy import case, func, update
+
+from ..extensions import db
+
+
+class ViewCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}          # product id -> views since last flush
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self.interval = 10.0
+        self.max_pending = 5000
+
+    def init_app(self, app):
+        self._app = app
+        self.interval = app.config.get("VIEW_FLUSH_INTERVAL", 10.0)
+        self.max_pending = app.config.get("VIEW_FLUSH_MAX_PENDING", 5000)
+        if not app.config.get("VIEW_COUNTER_ENABLED", True):
+            self._app = None
+        atexit.register(self.flush)
+
+    def hit(self, pid):
+        if self._app is None:
+            return
+        with self._lock:
+            self._pending[pid] = self._pending.get(pid, 0) + 1
+            full = len(self._pending) >= self.max_pending
+        self._ensure_thread()
+        if full:
+            self.flush()
+
+    def _ensure_thread(self):
+        # started lazily so every forked gunicorn worker gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending deltas; returns the number of products updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self._app is None:
+            return 0
+        from ..model import Product
+
+        table = Product.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id.in_(list(pending)))
+            .values(
+                viewed=func.coalesce(table.c.viewed, 0) + case(pending, value=table.c.id, else_=0),
+                updated_at=table.c.updated_at,      # a view is not an edit: skip the onupdate
+            )
+        )
+        try:
+            with self._app.app_context(), db.engine.begin() as conn:
+                conn.execute(stmt)
+        except Exception as e:
+            with self._lock:
+                for pid, n in pending.items():
+                    self._pending[pid] = self._pending.get(pid, 0) + n
+            self._app.logger.warning("view counter flush failed (%d products kept): %s", len(pending), e)
+            return 0
+        return len(pending)
+
+    def pending(self, pid) -> int:
+        return self._pending.get(pid, 0)
+
+
+view_counter = ViewCounter()
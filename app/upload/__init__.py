@@ -0,0 +1,4 @@
+from flask import Blueprint
+bp = Blueprint("uploads", __name__, url_prefix="/api/uploads")
+
+from . import routes
\ No newline at end of file
@@ -0,0 +1,210 @@
+# app/upload/routes.py
+"""
+Resumable, chunked product image uploads.
+
+    POST /api/uploads                     {"product_id", "filename", "size", "sha256"?, "name"?, "main"?}
+    PUT  /api/uploads/<id>                raw bytes, Upload-Offset: <n>
+    GET  /api/uploads/<id>                current offset (resume point)
+    POST /api/uploads/<id>/complete       {"sha256"?}  -> ProductImage
+    DELETE /api/uploads/<id>
+
+Every chunk is a short request (at most UPLOAD_CHUNK_SIZE bytes) streamed
+straight to disk, so a large photo over a slow link never holds a worker for
+the whole transfer and a dropped connection only costs the unfinished chunk.
+A chunk must start at the current offset (else 409 with Upload-Offset); the
+finished file is checked against its sha256, moved into static/uploads and
+attached to the product.
+"""
+import re
+from datetime import datetime, timezone
+
+from flask import current_app, jsonify, request, url_for
+from sqlalchemy import func
+
+from ..extensions import db
+from ..model import Product, ProductImage
+from ..services.chunked_uploads import UploadConflict, chunked_uploads
+from ..utils.api import api_error, api_ok
+from ..utils.decorators import require_headers
+from ..utils.optimistic import etag, retry_stale
+from ..utils.uploads import allowed_file, image_meta, move_file
+from . import bp
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+def ok(message: str, data=None, status_code=200):
+    resp = jsonify(api_ok(message, data))
+    resp.status_code = status_code
+    return resp
+
+
+def err(message: str, status_code=400, data=None):
+    resp = jsonify(api_error(message, data))
+    resp.status_code = status_code
+    return resp
+
+
+def _with_offset(resp, offset):
+    resp.headers["Upload-Offset"] = str(offset)
+    return resp
+
+
+def _state(uid, meta, offset):
+    return {
+        "upload_id": uid,
+        "product_id": meta["product_id"],
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "offset": offset,
+        "complete": offset == meta["size"],
+        "chunk_size": current_app.config.get("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024),
+        "expires_at": datetime.fromtimestamp(meta["expires_at"], timezone.utc).isoformat(),
+    }
+
+
+def _sha256(value):
+    value = (value or "").strip().lower()
+    if value and not _SHA256.match(value):
+        raise ValueError("sha256 must be 64 hex characters")
+    return value or None
+
+
+# POST /api/uploads
+@bp.post("")
+@require_headers
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get("filename") or "")
+    if not allowed_file(filename):
+        return err("Unsupported file type")
+    try:
+        product_id = int(data.get("product_id"))
+        size = int(data.get("size"))
+    except (TypeError, ValueError):
+        return err("product_id and size must be integers")
+    try:
+        sha256 = _sha256(data.get("sha256"))
+    except ValueError as e:
+        return err(str(e))
+    max_size = current_app.config.get("UPLOAD_MAX_SIZE", 50 * 1024 * 1024)
+    if size <= 0:
+        return err("size must be > 0")
+    if size > max_size:
+        return err(f"Uploads are limited to {max_size} bytes", status_code=413)
+    if db.session.get(Product, product_id) is None:
+        return err("Product not found", status_code=404, data={"product_id": product_id})
+
+    uid, meta = chunked_uploads.create({
+        "product_id": product_id,
+        "filename": filename,
+        "size": size,
+        "sha256": sha256,
+        "name": data.get("name") or "image",
+        "main": str(data.get("main", "")).strip().lower() in {"1", "true", "yes", "y", "on"},
+    })
+    resp = _with_offset(ok("Upload created", _state(uid, meta, 0), status_code=201), 0)
+    resp.headers["Location"] = url_for("uploads.get_upload", uid=uid, _external=True)
+    return resp
+
+
+# GET /api/uploads/<id>
+@bp.get("/<uid>")
+@require_headers
+def get_upload(uid):
+    meta = chunked_uploads.get(uid)
+    if meta is None:
+        return err("Upload not found", status_code=404)
+    offset = chunked_uploads.offset(uid)
+    return _with_offset(ok("Upload fetched", _state(uid, meta, offset)), offset)
+
+
+# PUT /api/uploads/<id>   (Upload-Offset header or ?offset=)
+@bp.put("/<uid>")
+@require_headers
+def put_chunk(uid):
+    meta = chunked_uploads.get(uid)
+    if meta is None:
+        return err("Upload not found", status_code=404)
+    try:
+        offset = int(request.headers.get("Upload-Offset", request.args.get("offset", "")))
+    except ValueError:
+        return err("Upload-Offset header is required")
+    chunk_size = current_app.config.get("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024)
+    if (request.content_length or 0) > chunk_size:
+        return err(f"Chunks are limited to {chunk_size} bytes", status_code=413)
+
+    try:
+        with chunked_uploads.locked(uid):
+            limit = min(meta["size"] - offset, chunk_size)
+            offset = chunked_uploads.write(uid, offset, request.stream, max(limit, 0))
+    except UploadConflict as e:
+        return _with_offset(err(str(e), status_code=409, data={"offset": e.offset}), e.offset)
+    except ValueError as e:
+        return err(str(e), status_code=413)
+    return _with_offset(ok("Chunk stored", _state(uid, meta, offset)), offset)
+
+
+# POST /api/uploads/<id>/complete
+@bp.post("/<uid>/complete")
+@require_headers
+@retry_stale(err)
+def complete_upload(uid):
+    data = request.get_json(silent=True) or {}
+    try:
+        sha256 = _sha256(data.get("sha256"))
+    except ValueError as e:
+        return err(str(e))
+
+    try:
+        with chunked_uploads.locked(uid):
+            meta = chunked_uploads.get(uid)
+            if meta is None:
+                return err("Upload not found", status_code=404)
+            product = db.session.get(Product, meta["product_id"])
+            if product is None:
+                chunked_uploads.discard(uid)
+                return err("Product not found", status_code=404, data={"product_id": meta["product_id"]})
+
+            if "stored" not in meta:        # a retry after a version conflict skips straight to the insert
+                offset = chunked_uploads.offset(uid)
+                if offset != meta["size"]:
+                    return _with_offset(err("Upload is incomplete", status_code=409, data={"offset": offset}), offset)
+                expected = sha256 or meta.get("sha256")
+                if not expected:
+                    return err("sha256 is required")
+                actual = chunked_uploads.digest(uid)
+                if actual != expected:
+                    chunked_uploads.discard(uid)
+                    return err("Checksum mismatch, upload discarded", status_code=422, data={"sha256": actual})
+                meta["stored"], abs_path = move_file(chunked_uploads.part_path(uid), meta["filename"], product.name)
+                meta["image"] = image_meta(abs_path)
+                chunked_uploads.save(uid, meta)
+
+            if meta["main"]:
+                for img in product.images:
+                    img.main = False
+            image = ProductImage(
+                name=meta["name"], image_path=meta["stored"], main=meta["main"], image_url=meta["stored"],
+                sort_order=max((img.sort_order or 0 for img in product.images), default=-1) + 1, **meta["image"],
+            )
+            product.images.append(image)
+            product.updated_at = func.now()
+            db.session.commit()
+            chunked_uploads.discard(uid)
+    except UploadConflict as e:
+        return _with_offset(err(str(e), status_code=409, data={"offset": e.offset}), e.offset)
+
+    resp = ok("Image uploaded", {"product_id": product.id, "version": product.version, "image": image.as_api()}, status_code=201)
+    resp.set_etag(etag(product.version))
+    return resp
+
+
+# DELETE /api/uploads/<id>
+@bp.delete("/<uid>")
+@require_headers
+def delete_upload(uid):
+    if chunked_uploads.get(uid) is None:
+        return err("Upload not found", status_code=404)
+    chunked_uploads.discard(uid)
+    return ok("Upload deleted", {"upload_id": uid})
@@ -1,5 +1,8 @@
 # --- app/utils/api.py ---
 import time
+from contextlib import ExitStack
+
+from flask import Response, current_app, stream_with_context
 
 def api_ok(message, data=None):
     return {
@@ -19,4 +22,72 @@ def api_error(message, data=None):
             **(data or {}),
             "API_TIME": int(time.time())
         }
-    }
\ No newline at end of file
+    }
+
+def iter_api_ok(message, data=None, items=(), items_key="items"):
+    """The api_ok envelope as text pieces, with data[items_key] taken from the
+    `items` iterable one element at a time (never held as a whole)."""
+    provider = current_app.json
+    dumps = provider.dumps
+    data = data or {}
+    keys = [k for k in data if k not in (items_key, "API_TIME")] + [items_key, "API_TIME"]
+    sort = getattr(provider, "sort_keys", False)
+    if sort:
+        keys.sort()
+        yield '{"data":{'
+    else:
+        yield '{"status":true,"message":%s,"data":{' % dumps(message)
+    for i, key in enumerate(keys):
+        yield ("," if i else "") + dumps(key) + ":"
+        if key == items_key:
+            yield "["
+            for j, item in enumerate(items):
+                yield ("," if j else "") + dumps(item)
+            yield "]"
+        elif key == "API_TIME":
+            yield str(int(time.time()))
+        else:
+            yield dumps(data[key])
+    yield '},"message":%s,"status":true}\n' % dumps(message) if sort else "}}\n"
+
+def _chunked(pieces, size):
+    buf, n = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        n += len(piece)
+        if n >= size:
+            yield "".join(buf).encode()
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf).encode()
+
+def _rendered(chunks, scopes):
+    with ExitStack() as stack:
+        for scope in scopes:
+            stack.enter_context(scope)
+        yield from chunks
+
+def items_ok(message, data=None, items=(), items_key="items", status_code=200, chunk_size=16 * 1024):
+    """Streaming twin of jsonify(api_ok(...)): same JSON, sent in ~chunk_size
+    byte chunks as `items` is consumed, so the body is never held whole.
+
+    The items render after the view has returned. Scopes that must cover
+    that rendering (@query_budget, @use_replica) hand themselves over with
+    resume_in_body(); metrics record the response once its body is sent."""
+    scopes = []
+    body = _rendered(_chunked(iter_api_ok(message, data, items, items_key), chunk_size), scopes)
+    resp = Response(stream_with_context(body), status=status_code, mimetype="application/json")
+    resp.body_scopes = scopes
+    return resp
+
+def lazy_body(rv):
+    """True for an items_ok response, whose body renders while it is sent."""
+    return getattr(rv, "body_scopes", None) is not None
+
+def resume_in_body(rv, scope):
+    """Enter the context manager `scope` around the rendering of rv's lazy
+    body; False (and `scope` unused) when rv has none."""
+    if not lazy_body(rv):
+        return False
+    rv.body_scopes.append(scope)
+    return True
@@ -0,0 +1,84 @@
+# app/utils/async_db.py
+"""
+Async SQLAlchemy engine for the ASGI serving mode (app/asgi.py).
+
+Shares the declarative models with the sync app; only the engine and the
+session differ. The URL is derived from SQLALCHEMY_DATABASE_URI unless
+SQLALCHEMY_ASYNC_URI is set:
+
+    sqlite:///x.db          -> sqlite+aiosqlite:///x.db
+    postgresql://...        -> postgresql+asyncpg://...
+
+The replica bind (SQLALCHEMY_REPLICA_URI) gets an async engine too:
+session() uses it inside @use_replica views under the same health and
+read-your-writes rules as db.session (app/utils/db_routing.py).
+
+Needs the extras in requirements-async.txt (greenlet, aiosqlite / asyncpg).
+The sync app never imports this module.
+"""
+import os
+from contextlib import asynccontextmanager
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .db_routing import REPLICA_BIND, replica_monitor, wants_replica
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
+
+
+def async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if "+" in u.drivername and u.drivername not in ASYNC_DRIVERS.values():
+        # e.g. postgresql+psycopg2: swap the sync driver for the async one
+        u = u.set(drivername=backend)
+    driver = ASYNC_DRIVERS.get(u.drivername, u.drivername)
+    return u.set(drivername=driver).render_as_string(hide_password=False)
+
+
+class AsyncDB:
+    def __init__(self):
+        self.engine = None
+        self.replica = None
+        self._sessions = None
+
+    def init_app(self, app):
+        url = app.config.get("SQLALCHEMY_ASYNC_URI") or async_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        self.engine = self._engine(app, url)
+        replica_uri = (app.config.get("SQLALCHEMY_BINDS") or {}).get(REPLICA_BIND)
+        self.replica = self._engine(app, async_url(replica_uri)) if replica_uri else None
+        self._sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    @staticmethod
+    def _engine(app, url):
+        options = {}
+        if url.startswith("sqlite"):
+            # relative sqlite paths resolve against the instance folder, like Flask-SQLAlchemy
+            u = make_url(url)
+            if u.database and u.database != ":memory:" and not u.database.startswith("/"):
+                url = u.set(database=os.path.join(app.instance_path, u.database)).render_as_string(hide_password=False)
+        else:
+            options = {"pool_size": app.config.get("ASYNC_POOL_SIZE", 20), "pool_pre_ping": True}
+        return create_async_engine(url, **options)
+
+    @asynccontextmanager
+    async def session(self, primary=False):
+        """Session on the primary, or on the replica inside @use_replica while it is
+        healthy (the probe itself is the sync one, at most every REPLICA_CHECK_INTERVAL)."""
+        from flask import g
+
+        engine = self.engine
+        if not primary and self.replica is not None and wants_replica() and replica_monitor.healthy_engine():
+            engine = self.replica
+            g.db_replica_used = True
+        async with self._sessions(bind=engine) as session:
+            yield session
+
+    async def dispose(self):
+        for engine in (self.engine, self.replica):
+            if engine is not None:
+                await engine.dispose()
+
+
+async_db = AsyncDB()
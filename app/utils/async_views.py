@@ -0,0 +1,47 @@
+# app/utils/async_views.py
+"""
+Registry of the views the ASGI mode (app/asgi.py) serves on the event loop.
+
+An endpoint gets there in one of two ways:
+
+    @async_view(bp, "list_products")    # coroutine twin of a sync view
+    async def list_products(): ...
+
+    inline_view(bp, "get_category", category_registry.is_current)
+                                        # the sync view itself, run on the loop
+                                        # while ready() says it will do no I/O
+
+Every other endpoint keeps running as the plain Flask view in a worker
+thread. An async view that meets a case it does not cover (a write, a
+feature it does not implement) raises Fallback and the request is replayed
+through the sync view. An inline view whose cache is cold or stale (so it
+would reload from the database first) runs in a worker thread too.
+"""
+
+ASYNC_VIEWS = {}        # endpoint -> coroutine function, or Inline
+
+
+class Fallback(Exception):
+    """Hand the current request to the sync view."""
+
+
+class Inline:
+    """A sync view served on the event loop while ready() is true."""
+
+    def __init__(self, ready):
+        self.ready = ready
+
+
+def _endpoint(bp, name):
+    return f"{bp.name}.{name}"
+
+
+def async_view(bp, name):
+    def decorator(f):
+        ASYNC_VIEWS[_endpoint(bp, name)] = f
+        return f
+    return decorator
+
+
+def inline_view(bp, name, ready):
+    ASYNC_VIEWS[_endpoint(bp, name)] = Inline(ready)
@@ -0,0 +1,120 @@
+# app/utils/compression.py
+"""
+Negotiated response compression (brotli when installed, else gzip).
+
+An after_request hook compresses JSON/text responses of COMPRESS_MIN_SIZE
+bytes or more for clients that send a matching Accept-Encoding. Streamed
+responses are wrapped in an incremental compressor, so nothing is buffered.
+
+Cached responses should be served through CachedBody: it keeps the raw bytes
+and compresses each encoding once, on first request, instead of per hit.
+"""
+import zlib
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:             # optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE = {"application/json", "application/x-ndjson", "text/plain", "text/html", "text/csv"}
+
+
+def _encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate():
+    """Best encoding the client accepts, or None."""
+    if not current_app.config.get("COMPRESS_ENABLED", True):
+        return None
+    return request.accept_encodings.best_match(_encodings())
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        return brotli.Compressor(quality=current_app.config.get("COMPRESS_BR_QUALITY", 4))
+    # wbits=31 -> gzip container
+    return zlib.compressobj(current_app.config.get("COMPRESS_LEVEL", 6), zlib.DEFLATED, 31)
+
+
+def compress(data: bytes, encoding) -> bytes:
+    c = _compressor(encoding)
+    if encoding == "br":
+        return c.process(data) + c.finish()
+    return c.compress(data) + c.flush()
+
+
+def _stream(chunks, compressor, encoding):
+    step = compressor.process if encoding == "br" else compressor.compress
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        out = step(chunk)
+        if out:
+            yield out
+    yield compressor.finish() if encoding == "br" else compressor.flush()
+
+
+def _vary(response):
+    vary = response.headers.get("Vary")
+    if not vary:
+        response.headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        response.headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CachedBody:
+    """Response bytes plus lazily built compressed variants (one per encoding)."""
+
+    def __init__(self, body: bytes, mimetype="application/json", status=200):
+        self.body = body
+        self.mimetype = mimetype
+        self.status = status
+        self._variants = {}
+
+    def encoded(self, encoding):
+        data = self._variants.get(encoding)
+        if data is None:
+            data = self._variants[encoding] = compress(self.body, encoding)
+        return data
+
+    def response(self):
+        encoding = negotiate() if len(self.body) >= current_app.config.get("COMPRESS_MIN_SIZE", 1024) else None
+        resp = Response(self.encoded(encoding) if encoding else self.body, status=self.status, mimetype=self.mimetype)
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        _vary(resp)
+        return resp
+
+
+def init_compression(app):
+    """Register after init_metrics so the size histogram sees compressed bytes."""
+
+    @app.after_request
+    def _compress_response(response):
+        if (
+            request.method == "HEAD"
+            or response.direct_passthrough
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE
+        ):
+            return response
+        _vary(response)
+        encoding = negotiate()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _stream(response.response, _compressor(encoding), encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < current_app.config.get("COMPRESS_MIN_SIZE", 1024):
+                return response
+            response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,227 @@
+# app/utils/db_routing.py
+"""
+Read/write routing for db.session.
+
+Handlers decorated with @use_replica read from the "replica" bind
+(SQLALCHEMY_REPLICA_URI). Everything else, every flush and every core
+INSERT/UPDATE/DELETE goes to the primary. Async views of the ASGI mode take
+the same decorator; async_db.session() follows it.
+
+- read-your-writes: a client that just wrote is pinned to the primary for
+  REPLICA_STICKY_SECONDS (per worker, plus a cookie so other workers agree)
+- fallback: the replica is probed every REPLICA_CHECK_INTERVAL seconds; when it
+  is down or lags more than REPLICA_MAX_LAG seconds reads go to the primary.
+  A replica error in the middle of a handler re-runs the handler on the primary.
+- a lazy response body (api.items_ok) renders on the same route as its view
+"""
+import hashlib
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, request, current_app, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+
+from .api import resume_in_body
+
+REPLICA_BIND = "replica"
+STICKY_COOKIE = "db_primary_until"
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and wants_replica()
+        ):
+            engine = replica_monitor.healthy_engine()
+            if engine is not None:
+                g.db_replica_used = True
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def wants_replica() -> bool:
+    return has_app_context() and g.get("db_route") == REPLICA_BIND
+
+
+class ReplicaMonitor:
+    """Per-worker cached health of the replica bind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._healthy = False
+        self._down_until = 0.0
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = 0.0
+            self._healthy = False
+            self._down_until = 0.0
+
+    def mark_down(self):
+        cfg = current_app.config
+        with self._lock:
+            self._healthy = False
+            self._down_until = time.monotonic() + cfg.get("REPLICA_RETRY_AFTER", 30)
+
+    def healthy_engine(self):
+        engines = current_app.extensions["sqlalchemy"].engines
+        engine = engines.get(REPLICA_BIND)
+        if engine is None:
+            return None
+        now = time.monotonic()
+        if now < self._down_until:
+            return None
+        if now - self._checked_at >= current_app.config.get("REPLICA_CHECK_INTERVAL", 5):
+            with self._lock:
+                if now - self._checked_at >= current_app.config.get("REPLICA_CHECK_INTERVAL", 5):
+                    self._healthy = self._probe(engine)
+                    self._checked_at = now
+        return engine if self._healthy else None
+
+    def _probe(self, engine) -> bool:
+        cfg = current_app.config
+        lag_sql = cfg.get("REPLICA_LAG_SQL")
+        try:
+            with engine.connect() as conn:
+                if not lag_sql:
+                    conn.execute(text("SELECT 1"))
+                    return True
+                lag = conn.execute(text(lag_sql)).scalar()
+        except DBAPIError as e:
+            current_app.logger.warning("replica probe failed: %s", e)
+            return False
+        if lag is not None and float(lag) > cfg.get("REPLICA_MAX_LAG", 5):
+            current_app.logger.warning("replica lag %.1fs over limit, reading from primary", float(lag))
+            return False
+        return True
+
+
+replica_monitor = ReplicaMonitor()
+
+# client key -> monotonic deadline until which that client reads from the primary
+_sticky = {}
+_sticky_lock = threading.Lock()
+
+
+def _client_key() -> str:
+    ident = (
+        request.headers.get("Authorization")
+        or request.headers.get("X-Cart-Id")
+        or request.headers.get("X-Session-Id")
+        or request.headers.get("X-Forwarded-For")
+        or request.remote_addr
+        or ""
+    )
+    return hashlib.sha1(ident.encode()).hexdigest()
+
+
+def _is_sticky() -> bool:
+    try:
+        if float(request.cookies.get(STICKY_COOKIE) or 0) > time.time():
+            return True
+    except ValueError:
+        pass
+    deadline = _sticky.get(_client_key())
+    return deadline is not None and deadline > time.monotonic()
+
+
+def _remember_write(response):
+    seconds = current_app.config.get("REPLICA_STICKY_SECONDS", 5)
+    now = time.monotonic()
+    with _sticky_lock:
+        if len(_sticky) > 10_000:
+            for k in [k for k, v in _sticky.items() if v <= now]:
+                del _sticky[k]
+        _sticky[_client_key()] = now + seconds
+    response.set_cookie(STICKY_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True)
+
+
+@contextmanager
+def _on_replica():
+    g.db_route = REPLICA_BIND
+    try:
+        yield
+    finally:
+        g.db_route = None
+
+
+def _follow(rv):
+    resume_in_body(rv, _on_replica())
+    return rv
+
+
+def use_replica(f):
+    """Route the reads of a GET handler to the replica bind when it is healthy."""
+    if inspect.iscoroutinefunction(f):
+        return _use_replica_async(f)
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        from ..extensions import db
+
+        engines = current_app.extensions["sqlalchemy"].engines
+        if REPLICA_BIND not in engines or _is_sticky():
+            return f(*args, **kwargs)
+
+        g.db_route = REPLICA_BIND
+        try:
+            return _follow(f(*args, **kwargs))
+        except DBAPIError:
+            if not g.get("db_replica_used"):
+                raise
+            current_app.logger.warning("replica read failed, retrying %s on primary", request.endpoint)
+            replica_monitor.mark_down()
+            db.session.rollback()
+            g.db_route = None
+            return f(*args, **kwargs)
+        finally:
+            g.db_route = None
+    return wrapper
+
+
+def _use_replica_async(f):
+    @wraps(f)
+    async def wrapper(*args, **kwargs):
+        engines = current_app.extensions["sqlalchemy"].engines
+        if REPLICA_BIND not in engines or _is_sticky():
+            return await f(*args, **kwargs)
+
+        g.db_route = REPLICA_BIND
+        try:
+            return _follow(await f(*args, **kwargs))
+        except DBAPIError:
+            if not g.get("db_replica_used"):
+                raise
+            current_app.logger.warning("replica read failed, retrying %s on primary", request.endpoint)
+            replica_monitor.mark_down()
+            g.db_route = None
+            return await f(*args, **kwargs)
+        finally:
+            g.db_route = None
+    return wrapper
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _flag_write(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+def init_routing(app, db):
+    """Pin clients that just wrote to the primary (read-your-writes)."""
+
+    @app.after_request
+    def _stick_to_primary(response):
+        if g.get("db_wrote") and REPLICA_BIND in db.engines:
+            _remember_write(response)
+        return response
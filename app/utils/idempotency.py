@@ -0,0 +1,195 @@
+# app/utils/idempotency.py
+"""
+Idempotency-Key handling for mutating requests (POST/PUT/PATCH/DELETE).
+
+The first request with a given key claims a row in idempotency_key (shared
+by all workers), runs normally, and stores its status, headers and body for
+IDEMPOTENCY_TTL seconds. Retries with the same key get that response back
+(with an Idempotent-Replayed header) without running the view:
+
+  - a duplicate that arrives while the first is still running waits for it
+    (on an Event in the same worker, by polling across workers) for up to
+    IDEMPOTENCY_WAIT seconds, then gets 409 with Retry-After
+  - the same key with a different body or query string gets 422
+  - 5xx responses and errors release the key, so the retry runs again
+  - a claim whose worker died is taken over after IDEMPOTENCY_LOCK_TIMEOUT
+
+Keys are scoped by method, path and the caller's credentials
+(Authorization, X-Cart-Id, X-Session-Id), so two clients cannot read each
+other's responses by reusing a key. Responses larger than
+IDEMPOTENCY_MAX_BODY are not kept, and expired rows are purged at most once
+a minute per worker.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, g, jsonify, request
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from .query_budget import unbudgeted
+
+MUTATING = {"POST", "PUT", "PATCH", "DELETE"}
+# offset-checked and streamed to disk: fingerprinting would buffer the whole chunk
+EXEMPT_ENDPOINTS = {"uploads.put_chunk"}
+SCOPE_HEADERS = ("Authorization", "X-Cart-Id", "X-Session-Id")
+# recomputed (or re-negotiated) for every reply
+SKIP_HEADERS = {"content-length", "content-encoding", "vary"}
+POLL_INTERVAL = 0.05
+PURGE_INTERVAL = 60
+
+
+def _sha256(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}         # (key, scope) -> Event, for claims held by this worker
+        self._next_purge = 0.0
+
+    @property
+    def _table(self):
+        from ..model import IdempotencyKey
+
+        return IdempotencyKey.__table__
+
+    def _where(self, key, scope):
+        return and_(self._table.c.key == key, self._table.c.scope == scope)
+
+    def claim(self, key, scope, fingerprint):
+        """Claim the key for this request: None on success, else the existing row."""
+        table = self._table
+        now = datetime.utcnow()
+        self._purge(now)
+        lock_timeout = timedelta(seconds=current_app.config.get("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+        while True:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert().values(
+                        key=key, scope=scope, fingerprint=fingerprint, expires_at=now + lock_timeout
+                    ))
+                with self._lock:
+                    self._inflight[(key, scope)] = threading.Event()
+                return None
+            except IntegrityError:
+                pass
+            with db.engine.begin() as conn:
+                row = conn.execute(select(table).where(self._where(key, scope))).first()
+                if row is not None and row.expires_at >= now:
+                    return row
+                if row is not None:
+                    # expired response or abandoned claim: drop it and claim again
+                    conn.execute(delete(table).where(self._where(key, scope), table.c.expires_at < now))
+
+    def wait(self, key, scope, timeout):
+        """Sleep until the in-flight claim may have finished (at most timeout)."""
+        event = self._inflight.get((key, scope))
+        if event is not None:
+            event.wait(timeout)
+        else:
+            time.sleep(min(POLL_INTERVAL, timeout))
+
+    def complete(self, key, scope, response):
+        body = response.get_data()
+        if len(body) > current_app.config.get("IDEMPOTENCY_MAX_BODY", 256 * 1024):
+            current_app.logger.info("idempotency: %s response not kept (%d bytes)", request.path, len(body))
+            return self.release(key, scope)
+        headers = [[k, v] for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS]
+        ttl = timedelta(seconds=current_app.config.get("IDEMPOTENCY_TTL", 86400))
+        with db.engine.begin() as conn:
+            conn.execute(update(self._table).where(self._where(key, scope)).values(
+                status=response.status_code, headers=headers, body=body, expires_at=datetime.utcnow() + ttl,
+            ))
+        self._finish(key, scope)
+
+    def release(self, key, scope):
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(delete(self._table).where(self._where(key, scope)))
+        finally:
+            self._finish(key, scope)
+
+    def _finish(self, key, scope):
+        with self._lock:
+            event = self._inflight.pop((key, scope), None)
+        if event is not None:
+            event.set()
+
+    def _purge(self, now):
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + PURGE_INTERVAL
+        with db.engine.begin() as conn:
+            conn.execute(delete(self._table).where(self._table.c.expires_at < now))
+
+
+store = IdempotencyStore()
+
+
+def _replay(row):
+    resp = Response(row.body, status=row.status)
+    for k, v in row.headers or ():
+        resp.headers[k] = v
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def init_idempotency(app):
+    """Register after init_compression so stored bodies are uncompressed."""
+    if not app.config.get("IDEMPOTENCY_ENABLED", True):
+        return
+
+    @app.before_request
+    def _idempotency_begin():
+        key = request.headers.get("Idempotency-Key")
+        if not key or request.method not in MUTATING or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        if len(key) > 255:
+            return jsonify(msg="Idempotency-Key must be at most 255 characters"), 400
+        scope = _sha256(request.method, request.path, *(request.headers.get(h, "") for h in SCOPE_HEADERS))
+        fingerprint = _sha256(request.query_string, request.get_data())
+        deadline = time.monotonic() + app.config.get("IDEMPOTENCY_WAIT", 10)
+        with unbudgeted():
+            while True:
+                row = store.claim(key, scope, fingerprint)
+                if row is None:
+                    g.idempotency = (key, scope)
+                    return None
+                if row.fingerprint != fingerprint:
+                    return jsonify(msg="Idempotency-Key was already used with a different request"), 422
+                if row.status is not None:
+                    return _replay(row)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    resp = jsonify(msg="A request with this Idempotency-Key is still in progress")
+                    resp.status_code = 409
+                    resp.headers["Retry-After"] = "1"
+                    return resp
+                store.wait(key, scope, remaining)
+
+    @app.after_request
+    def _idempotency_store(response):
+        claim = g.pop("idempotency", None)
+        if claim is not None:
+            with unbudgeted():
+                if response.status_code >= 500 or response.is_streamed:
+                    store.release(*claim)
+                else:
+                    store.complete(*claim, response)
+        return response
+
+    @app.teardown_request
+    def _idempotency_release(exc):
+        claim = g.pop("idempotency", None)
+        if claim is not None:       # after_request never ran
+            with unbudgeted():
+                store.release(*claim)
@@ -0,0 +1,54 @@
+# app/utils/json_provider.py
+"""
+orjson-backed JSON provider for app.json (jsonify, request.get_json, ...).
+
+Keeps Flask's behaviour where clients could notice it: keys stay sorted
+and dates still go through Flask's default (HTTP date) serializer. It also
+falls back to the stdlib encoder for anything orjson refuses, such as
+integers wider than 64 bits. Output is compact UTF-8 instead of ASCII
+escapes.
+
+Without orjson installed (or with JSON_PROVIDER=default) the app keeps
+Flask's DefaultJSONProvider.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:             # optional: pip install orjson
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def _options(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps_bytes(self, obj) -> bytes:
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options())
+        except TypeError:       # orjson.JSONEncodeError
+            return super().dumps(obj).encode()
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def init_json(app):
+    if orjson is not None and app.config.get("JSON_PROVIDER", "orjson") == "orjson":
+        app.json = OrjsonProvider(app)
@@ -0,0 +1,319 @@
+# app/utils/metrics.py
+"""
+Per-request instrumentation exposed in Prometheus text format on /metrics.
+
+Each worker keeps its own counters/histograms in memory and dumps them to
+METRICS_DIR/<pid>-<start>.json every METRICS_FLUSH_INTERVAL seconds. /metrics
+merges the files of all workers, so a scrape sees the totals of the whole
+gunicorn process group no matter which worker answers it.
+
+A worker holds a flock on its <pid>-<start>.lock for as long as it lives.
+When a merge can take that lock the worker is gone: its file is folded into
+retired.json and removed, so totals stay monotonic, dead workers do not pile
+up and a recycled pid starts a file of its own.
+
+Caches report hits/misses with record_cache("name", hit).
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .api import lazy_body
+
+try:
+    import fcntl
+except ImportError:     # Windows: worker files are never retired
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "http_requests_total": ("counter", "HTTP requests by endpoint, method and status.", None),
+    "http_request_duration_seconds": ("histogram", "Request latency by endpoint.", LATENCY_BUCKETS),
+    "http_response_size_bytes": ("histogram", "Response body size by endpoint.", SIZE_BUCKETS),
+    "db_statements_total": ("counter", "SQL statements executed by endpoint.", None),
+    "db_statement_seconds_total": ("counter", "Time spent in SQL statements by endpoint.", None),
+    "db_statements_per_request": ("histogram", "SQL statements per request by endpoint.", COUNT_BUCKETS),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss).", None),
+}
+
+RETIRED = "retired.json"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)      # (name, labels) -> value
+        self.histograms = {}                    # (name, labels) -> [bucket..., +Inf, sum]
+        self._flushed_at = 0.0
+        self._pid = None
+        self._name = None
+        self._alive = None                      # open, flock()ed <name>.lock
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    h[i] += 1
+                    break
+            else:
+                h[len(buckets)] += 1
+            h[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "histograms": [[n, list(l), list(h)] for (n, l), h in self.histograms.items()],
+            }
+
+    def _file_name(self, directory):
+        # a fresh name (and liveness lock) per process, also after a fork
+        if self._pid != os.getpid():
+            name = f"{os.getpid()}-{time.time_ns()}"
+            alive = open(os.path.join(directory, f"{name}.lock"), "a")
+            if fcntl is not None:
+                fcntl.flock(alive, fcntl.LOCK_EX)
+            self._pid, self._name, self._alive = os.getpid(), name, alive
+        return self._name
+
+    def dump(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self._file_name(directory)}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+        self._flushed_at = time.monotonic()
+
+    def maybe_dump(self, directory, interval):
+        if time.monotonic() - self._flushed_at >= interval:
+            self.dump(directory)
+
+
+registry = Registry()
+
+
+def record_cache(cache: str, hit: bool):
+    registry.inc("cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+
+
+# ---------- SQL statement counting ----------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_t0")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context():
+        g.sql_count = g.get("sql_count", 0) + 1
+        g.sql_time = g.get("sql_time", 0.0) + elapsed
+
+
+# ---------- merging + exposition ----------
+def _load(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _add(counters, histograms, data):
+    for name, labels, value in data.get("counters", []):
+        counters[(name, tuple(map(tuple, labels)))] += value
+    for name, labels, h in data.get("histograms", []):
+        key = (name, tuple(map(tuple, labels)))
+        acc = histograms.get(key)
+        histograms[key] = list(h) if acc is None else [a + b for a, b in zip(acc, h)]
+
+
+def _is_dead(directory, name):
+    if fcntl is None:
+        return False
+    with open(os.path.join(directory, f"{name}.lock"), "a") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+    return True
+
+
+def _retire(directory, dead):
+    """Fold the files of dead workers into retired.json and delete them."""
+    counters, histograms = defaultdict(float), {}
+    for data in filter(None, [_load(os.path.join(directory, RETIRED))] + [_load(p) for _, p in dead]):
+        _add(counters, histograms, data)
+    tmp = os.path.join(directory, f"{RETIRED}.tmp")
+    with open(tmp, "w") as fh:
+        json.dump({
+            "counters": [[n, list(l), v] for (n, l), v in counters.items()],
+            "histograms": [[n, list(l), h] for (n, l), h in histograms.items()],
+        }, fh)
+    os.replace(tmp, os.path.join(directory, RETIRED))
+    for name, path in dead:
+        for stale in (path, os.path.join(directory, f"{name}.lock")):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+
+def _merge(directory):
+    counters = defaultdict(float)
+    histograms = {}
+    # one merge at a time, so a dead worker is never folded in twice
+    with open(os.path.join(directory, "merge.lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        paths = [p for p in glob.glob(os.path.join(directory, "*.json")) if os.path.basename(p) != RETIRED]
+        workers = [(os.path.basename(p)[:-len(".json")], p) for p in paths]
+        dead = [(name, path) for name, path in workers if _is_dead(directory, name)]
+        if dead:
+            _retire(directory, dead)
+        live = [path for name, path in workers if (name, path) not in dead]
+        for path in [os.path.join(directory, RETIRED)] + live:
+            data = _load(path)
+            if data is not None:
+                _add(counters, histograms, data)
+    return counters, histograms
+
+
+def _fmt_labels(labels, extra=None):
+    pairs = list(labels) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def render(counters, histograms) -> str:
+    lines = []
+    by_name = defaultdict(list)
+    for (name, labels), value in counters.items():
+        by_name[name].append((labels, value))
+    for (name, labels), h in histograms.items():
+        by_name[name].append((labels, h))
+
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if name not in by_name:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name]):
+            if kind == "counter":
+                lines.append(f"{name}{_fmt_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, n in zip(list(buckets) + ["+Inf"], value[:-1]):
+                cumulative += n
+                lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {cumulative}")
+
+    # derived gauge: hit ratio per cache
+    hits, totals = defaultdict(float), defaultdict(float)
+    for labels, value in by_name.get("cache_requests_total", []):
+        d = dict(labels)
+        totals[d["cache"]] += value
+        if d["result"] == "hit":
+            hits[d["cache"]] += value
+    if totals:
+        lines.append("# HELP cache_hit_ratio Share of cache lookups that were hits.")
+        lines.append("# TYPE cache_hit_ratio gauge")
+        for cache in sorted(totals):
+            lines.append(f'cache_hit_ratio{{cache="{cache}"}} {hits[cache] / totals[cache]:.6f}')
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    directory = app.config.get("METRICS_DIR") or os.path.join(app.instance_path, "metrics")
+    app.config["METRICS_DIR"] = directory
+    interval = app.config.get("METRICS_FLUSH_INTERVAL", 5)
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_t0 = time.perf_counter()
+
+    def _record(labels, t0, ctx_g, size):
+        endpoint = labels["endpoint"]
+        elapsed = time.perf_counter() - t0
+        registry.inc("http_requests_total", labels)
+        registry.observe("http_request_duration_seconds", {"endpoint": endpoint}, elapsed)
+        if size is not None:
+            registry.observe("http_response_size_bytes", {"endpoint": endpoint}, size)
+        sql_count = ctx_g.get("sql_count", 0)
+        registry.inc("db_statements_total", {"endpoint": endpoint}, sql_count)
+        registry.inc("db_statement_seconds_total", {"endpoint": endpoint}, ctx_g.get("sql_time", 0.0))
+        registry.observe("db_statements_per_request", {"endpoint": endpoint}, sql_count)
+        try:
+            registry.maybe_dump(directory, interval)
+        except OSError as e:
+            app.logger.warning("metrics dump failed: %s", e)
+
+    def _counted(body, record):
+        size = 0
+        try:
+            for chunk in body:
+                size += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+            record(size)
+
+    @app.after_request
+    def _metrics_record(response):
+        t0 = g.get("metrics_t0")
+        if t0 is None:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        if endpoint == "metrics":
+            return response
+        labels = {"endpoint": endpoint, "method": request.method, "status": str(response.status_code)}
+        if current_app.config.get("METRICS_STATEMENT_HEADER"):
+            # a lazy body's own statements come after the headers
+            response.headers["X-DB-Statements"] = str(g.get("sql_count", 0))
+        if lazy_body(response):
+            # rendered as it is sent: time, size and statements are known at its last byte
+            response.response = _counted(response.response, partial(_record, labels, t0, g._get_current_object()))
+        else:
+            _record(labels, t0, g, response.content_length)
+        return response
+
+    @app.get("/metrics", endpoint="metrics")
+    def metrics():
+        token = current_app.config.get("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        registry.dump(directory)
+        body = render(*_merge(directory))
+        return Response(body, mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,96 @@
+# app/utils/optimistic.py
+"""
+Optimistic concurrency for the versioned models (Product, Cart, CartItem).
+
+Their mappers declare version_id_col, so every ORM UPDATE or DELETE is a
+compare-and-swap
+
+    UPDATE cart SET ..., version = 8 WHERE id = 3 AND version = 7
+
+and a row changed by someone else since it was read raises StaleDataError at
+flush. Nothing is locked, so writers on SQLite are serialized no longer than
+their commit.
+
+  - responses carry the row version as ETag ("v7"); check_if_match() answers
+    412 when an If-Match header names an older version
+  - @reject_stale answers 409 at the first conflict, so the client re-reads
+    and decides again. Writes of absolute values (field updates, quantities
+    set outright, pin, image sets) and deletes use it: replaying them on the
+    newer row would silently overwrite the change that won.
+  - @retry_stale re-runs a write view from a fresh read after a conflict, up
+    to OPTIMISTIC_RETRIES times with a short jittered backoff, then answers
+    409. Only for writes that stay correct on any newer state (increments,
+    appends, setting an explicit value); replayable() can narrow that per
+    request.
+  Requests that sent If-Match get 412 from either: the version they asked to
+  modify is gone.
+
+Views own their response envelope, so both helpers take the blueprint's
+err(message, status) function.
+"""
+import random
+import time
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..extensions import db
+
+RE_READ = "The resource was modified concurrently, re-read it and retry"
+
+
+def etag(version) -> str:
+    return f"v{version}"
+
+
+def check_if_match(version, err):
+    """412 response when If-Match is sent and does not name `version`, else None."""
+    if request.if_match and not request.if_match.contains(etag(version)):
+        resp = err("Precondition failed: the resource was modified", 412)
+        resp.set_etag(etag(version))
+        return resp
+    return None
+
+
+def _rolled_back(err):
+    """Roll back after a conflict; the 412 response if the request sent If-Match, else None."""
+    db.session.rollback()
+    if request.if_match:
+        return err("Precondition failed: the resource was modified", 412)
+    return None
+
+
+def reject_stale(err):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            except StaleDataError:
+                return _rolled_back(err) or err(RE_READ, 409)
+        return wrapper
+    return decorator
+
+
+def retry_stale(err, replayable=None):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            retries = current_app.config.get("OPTIMISTIC_RETRIES", 5)
+            for attempt in range(retries + 1):
+                try:
+                    return f(*args, **kwargs)
+                except StaleDataError:
+                    failed = _rolled_back(err)
+                    if failed:
+                        return failed
+                    if replayable is not None and not replayable():
+                        return err(RE_READ, 409)
+                    # jittered backoff so a burst of writers does not collide again in lockstep
+                    time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+            resp = err("Concurrent update, please retry", 409)
+            resp.headers["Retry-After"] = "1"
+            return resp
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+# app/utils/prices.py
+"""
+Per-request price rendering (Product.price -> price_format).
+
+Prices are stored in BASE_CURRENCY. Product responses render them for the
+client's locale (best match of Accept-Language among PRICE_LOCALES) and
+currency (X-Currency header or ?currency=, else DEFAULT_CURRENCY), converted
+with CURRENCY_RATES (units per 1 BASE_CURRENCY):
+
+    en + USD -> $1,234.50     en + KHR -> ៛5,061,450     km + KHR -> 5.061.450៛
+
+A PriceFormatter is compiled once per (locale, currency, rate) and kept for
+the life of the worker. It also remembers the strings it produced, so a list
+page whose products share a handful of price points formats each one once.
+Unknown currencies fall back to DEFAULT_CURRENCY; the symbol in the output
+says which one was used.
+"""
+from functools import lru_cache
+
+from flask import current_app, g, request
+
+# language -> (group separator, decimal separator, pattern)
+LOCALES = {
+    "en": (",", ".", "{s}{n}"),
+    "km": (".", ",", "{n}{s}"),
+    "zh": (",", ".", "{s}{n}"),
+    "fr": (" ", ",", "{n} {s}"),
+}
+# code -> (symbol, decimals)
+CURRENCIES = {
+    "USD": ("$", 2),
+    "KHR": ("៛", 0),
+    "THB": ("฿", 2),
+    "EUR": ("€", 2),
+}
+MEMO_SIZE = 4096
+
+
+class PriceFormatter:
+    def __init__(self, locale, currency, rate):
+        group, decimal, pattern = LOCALES[locale]
+        symbol, decimals = CURRENCIES[currency]
+        self.key = (locale, currency)
+        self._rate = rate
+        self._spec = f",.{decimals}f"
+        self._table = None if (group, decimal) == (",", ".") else str.maketrans({",": group, ".": decimal})
+        self._prefix, self._suffix = pattern.replace("{s}", symbol).split("{n}")
+        self._memo = {}
+
+    def __call__(self, value):
+        text = self._memo.get(value)
+        if text is None:
+            try:
+                n = float(value) * self._rate
+            except (TypeError, ValueError):
+                n = 0.0
+            num = format(n, self._spec)
+            if self._table is not None:
+                num = num.translate(self._table)
+            text = self._prefix + num + self._suffix
+            if len(self._memo) < MEMO_SIZE:
+                self._memo[value] = text
+        return text
+
+
+@lru_cache(maxsize=64)
+def get_formatter(locale, currency, rate=1.0) -> PriceFormatter:
+    return PriceFormatter(locale, currency, rate)
+
+
+def price_formatter() -> PriceFormatter:
+    """Formatter for the current request (resolved once per request)."""
+    fmt = g.get("price_formatter")
+    if fmt is None:
+        cfg = current_app.config
+        locale = request.accept_languages.best_match(cfg.get("PRICE_LOCALES") or ["en"]) or cfg.get("DEFAULT_LOCALE", "en")
+        if locale not in LOCALES:
+            locale = "en"
+        rates = cfg.get("CURRENCY_RATES") or {}
+        currency = (request.headers.get("X-Currency") or request.args.get("currency") or "").strip().upper()
+        if currency not in CURRENCIES or currency not in rates:
+            currency = cfg.get("DEFAULT_CURRENCY", "USD")
+        fmt = g.price_formatter = get_formatter(locale, currency, rates.get(currency, 1.0))
+    return fmt
+
+
+def parse_rates(spec, base="USD"):
+    """"KHR=4100,THB=36" -> {"USD": 1.0, "KHR": 4100.0, "THB": 36.0}"""
+    rates = {base: 1.0}
+    for part in (spec or "").split(","):
+        code, _, rate = part.partition("=")
+        if code.strip() and rate.strip():
+            rates[code.strip().upper()] = float(rate)
+    return rates
+
+
+def init_prices(app):
+    @app.after_request
+    def _vary_on_price_format(response):
+        if "price_formatter" in g:
+            response.vary.update(("Accept-Language", "X-Currency"))
+        return response
@@ -0,0 +1,246 @@
+# app/utils/query_budget.py
+"""
+Query budgets and N+1 detection.
+
+    @bp.get("")
+    @query_budget(4)
+    def list_products(): ...
+
+    with query_budget(2):
+        cart.as_api()
+
+QUERY_BUDGET_MODE decides what happens on a violation:
+  "raise" -> QueryBudgetExceeded (tests), "warn" -> log the report (staging),
+  "off"   -> nothing is tracked (default).
+Outside an app context the mode is "raise", so budgets work in plain tests.
+
+Shared cache refills (category registry reloads and the like) run inside
+unbudgeted(): their cost is amortized over many requests and must not count
+against whichever request happened to trigger them.
+
+With the mode on, every request is also checked for repeated identical
+statements (QUERY_BUDGET_NPLUS1_THRESHOLD or more). The report names the ORM
+attribute whose lazy load issued each repeated statement and the app line
+that touched it.
+
+A view returning a lazy body (api.items_ok) renders it after returning:
+its budget, and the request's, keep counting while the body is sent and are
+checked once it is done.
+"""
+import contextvars
+import inspect
+import os
+import sys
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .api import resume_in_body
+
+_active = contextvars.ContextVar("query_budget_trackers", default=())
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SKIP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _mode():
+    if has_app_context():
+        return current_app.config.get("QUERY_BUDGET_MODE", "off")
+    return "raise"
+
+
+def _threshold():
+    if has_app_context():
+        return current_app.config.get("QUERY_BUDGET_NPLUS1_THRESHOLD", 3)
+    return 3
+
+
+def _origin():
+    """(orm attribute, app location) responsible for the statement being executed."""
+    attr = where = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if attr is None:
+            loader = frame.f_locals.get("self")
+            if code.co_name == "_load_for_state" and hasattr(loader, "parent_property"):
+                prop = loader.parent_property
+                attr = f"{prop.parent.class_.__name__}.{prop.key}"
+            elif code.co_name == "load_scalar_attributes":
+                mapper = frame.f_locals.get("mapper")
+                attr = f"{mapper.class_.__name__} (expired attributes)" if mapper is not None else None
+        filename = os.path.abspath(code.co_filename)
+        if filename.startswith(_APP_DIR) and not filename.startswith(_SKIP_DIR):
+            rel = os.path.relpath(filename, os.path.dirname(_APP_DIR))
+            where = f"{rel}:{frame.f_lineno} ({code.co_name})"
+            break
+        frame = frame.f_back
+    return attr, where
+
+
+class QueryTracker:
+    def __init__(self, limit=None, label=None):
+        self.limit = limit
+        self.label = label
+        self.statements = []        # (sql, attr, where)
+
+    def add(self, statement, attr, where):
+        self.statements.append((statement, attr, where))
+
+    def repeated(self, threshold):
+        counts = Counter(s for s, _, _ in self.statements)
+        return [(s, n) for s, n in counts.most_common() if n >= threshold]
+
+    def report(self, threshold):
+        """Human readable violations, or None when the block stayed within budget."""
+        lines = []
+        over = self.limit is not None and len(self.statements) > self.limit
+        repeated = self.repeated(threshold)
+        if not over and not repeated:
+            return None
+        lines.append(
+            f"query budget for {self.label or 'block'}: {len(self.statements)} statements"
+            + (f" (budget {self.limit})" if self.limit is not None else "")
+        )
+        if repeated:
+            origins = defaultdict(Counter)
+            for s, attr, where in self.statements:
+                origins[s][(attr, where)] += 1
+            lines.append("repeated statements (possible N+1):")
+            for s, n in repeated:
+                lines.append(f"  {n}x {' '.join(s.split())[:200]}")
+                for (attr, where), k in origins[s].most_common(3):
+                    lines.append(f"      {k}x via {attr or 'explicit query'} at {where or '?'}")
+        return "\n".join(lines)
+
+
+def _check(tracker):
+    report = tracker.report(_threshold())
+    if report is None:
+        return
+    if _mode() == "raise":
+        raise QueryBudgetExceeded(report)
+    current_app.logger.warning(report)
+
+
+class query_budget:
+    """Context manager / decorator declaring the max statements a block may run."""
+
+    def __init__(self, max_statements=None, label=None):
+        self.max_statements = max_statements
+        self.label = label
+        self._tracker = None
+        self._token = None
+        self._handed_over = False
+
+    def __enter__(self):
+        self._handed_over = False
+        if _mode() == "off":
+            return None
+        self._tracker = QueryTracker(self.max_statements, self.label)
+        self._token = _active.set(_active.get() + (self._tracker,))
+        return self._tracker
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._tracker is None:
+            return False
+        _active.reset(self._token)
+        tracker, self._tracker = self._tracker, None
+        if exc_type is None and not self._handed_over:
+            _check(tracker)
+        return False
+
+    def follow(self, rv):
+        """Keep counting through rv's lazy body, if any, and check once it is sent."""
+        if self._tracker is not None and resume_in_body(rv, _resumed(self._tracker)):
+            self._handed_over = True
+        return rv
+
+    def __call__(self, f):
+        def budget():
+            label = self.label or (request.endpoint if has_request_context() else f.__qualname__)
+            if has_request_context():
+                g.query_budget_declared = True
+            return query_budget(self.max_statements, label)
+
+        if inspect.iscoroutinefunction(f):
+            @wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                scope = budget()
+                with scope:
+                    return scope.follow(await f(*args, **kwargs))
+            return async_wrapper
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            scope = budget()
+            with scope:
+                return scope.follow(f(*args, **kwargs))
+        return wrapper
+
+
+@contextmanager
+def _resumed(tracker):
+    """Count into `tracker` again around a lazy response body, then check it."""
+    token = _active.set(_active.get() + (tracker,))
+    try:
+        yield
+    finally:
+        _active.reset(token)
+    _check(tracker)
+
+
+@contextmanager
+def unbudgeted():
+    """Statements in this block are not counted by any active budget."""
+    token = _active.set(())
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    trackers = _active.get()
+    if not trackers:
+        return
+    attr, where = _origin()
+    for t in trackers:
+        t.add(statement, attr, where)
+
+
+def init_query_budget(app):
+    """Run N+1 detection (and QUERY_BUDGET_DEFAULT) on every request."""
+    if app.config.get("QUERY_BUDGET_MODE", "off") == "off":
+        return
+
+    @app.before_request
+    def _start_request_budget():
+        tracker = QueryTracker(app.config.get("QUERY_BUDGET_DEFAULT"), request.endpoint)
+        g.query_budget = (tracker, _active.set(_active.get() + (tracker,)))
+
+    @app.after_request
+    def _check_request_budget(response):
+        state = g.get("query_budget")
+        if state is not None and not g.get("query_budget_declared"):
+            if not resume_in_body(response, _resumed(state[0])):
+                _check(state[0])
+        return response
+
+    @app.teardown_request
+    def _end_request_budget(exc):
+        state = g.pop("query_budget", None)
+        if state is not None:
+            try:
+                _active.reset(state[1])
+            except ValueError:
+                pass
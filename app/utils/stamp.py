@@ -0,0 +1,60 @@
+# app/utils/stamp.py
+"""
+Version stamps shared by every worker on the host.
+
+A stamp is a tiny file under STAMP_DIR (default instance/stamps). bump()
+atomically replaces it; current() is one stat() call, cheap enough to run
+on every request. Per-worker caches remember the token they were built from
+and rebuild when it changes.
+
+bump() runs under a flock on <name>.lock and returns (previous, token): the
+token it replaced and the one it wrote. A cache that applied its own write
+can adopt `token` only if `previous` is the token it already had; anything
+else means another worker moved the stamp in between.
+"""
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:     # Windows: bumps are not serialised across processes
+    fcntl = None
+
+
+class VersionStamp:
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+
+    def init_app(self, app):
+        directory = app.config.get("STAMP_DIR") or os.path.join(app.instance_path, "stamps")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{self.name}.version")
+        if not os.path.exists(self.path):
+            self.bump()
+
+    @staticmethod
+    def _token(st):
+        return (st.st_mtime_ns, st.st_ino)
+
+    def current(self):
+        """Opaque token; changes whenever any worker bumps the stamp."""
+        try:
+            return self._token(os.stat(self.path))
+        except (OSError, TypeError):
+            return None
+
+    def bump(self):
+        """Replace the stamp; returns (previous token, new token)."""
+        if self.path is None:
+            return None, None
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            previous = self.current()
+            with open(tmp, "w") as fh:
+                fh.write(str(time.time_ns()))
+            token = self._token(os.stat(tmp))     # rename keeps mtime and inode
+            os.replace(tmp, self.path)
+        return previous, token
@@ -0,0 +1,149 @@
+# app/utils/uploads.py
+"""
+Image files under static/uploads: extension check, product-name-based file
+names and collision-free placement. Shared by the multipart product writes
+(app/product/routes.py) and the chunked upload API (app/upload/routes.py).
+
+image_meta() reads width and height from the file header (PNG, GIF, JPEG,
+WebP) without decoding the image, so ProductImage rows can carry dimensions
+without an imaging library.
+"""
+import os
+import re
+import shutil
+import struct
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+UPLOAD_FOLDER = "static/uploads"
+ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
+
+
+def slugify(text):
+    text = text.strip().lower()
+    text = re.sub(r"[^a-z0-9]+", "-", text)
+    return text.strip("-")
+
+
+def allowed_file(filename: str) -> bool:
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def upload_dir():
+    return os.path.join(current_app.root_path, UPLOAD_FOLDER)
+
+
+def upload_path(filename, product_name=None):
+    """(public_url, abs_path) of a free file name in static/uploads."""
+    ext = os.path.splitext(secure_filename(filename))[1].lower()
+    filename = f"{slugify(product_name)}{ext}" if product_name else secure_filename(filename)
+
+    directory = upload_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    abs_path = os.path.join(directory, filename)
+    base, ext2 = os.path.splitext(filename)
+    counter = 1
+    while os.path.exists(abs_path):
+        filename = f"{base}-{counter}{ext2}"
+        abs_path = os.path.join(directory, filename)
+        counter += 1
+    return f"/{UPLOAD_FOLDER}/{filename}", abs_path
+
+
+def save_file(file_storage, product_name=None):
+    """Save FileStorage to /static/uploads with product-name-based filename."""
+    if not file_storage or not file_storage.filename:
+        return None, None
+    if not allowed_file(file_storage.filename):
+        raise ValueError("Unsupported file type")
+
+    public_url, abs_path = upload_path(file_storage.filename, product_name)
+    file_storage.save(abs_path)
+    return public_url, abs_path
+
+
+def move_file(src, filename, product_name=None):
+    """Move a finished temp file into /static/uploads; returns (public_url, abs_path)."""
+    public_url, abs_path = upload_path(filename, product_name)
+    shutil.move(src, abs_path)
+    os.utime(abs_path)      # the GC grace period counts from here, not from the last chunk
+    return public_url, abs_path
+
+
+def remove_file(public_url):
+    """Delete an upload by its public URL; anything outside static/uploads is left alone."""
+    prefix = f"/{UPLOAD_FOLDER}/"
+    if not public_url or not public_url.startswith(prefix):
+        return 0
+    name = public_url[len(prefix):]
+    if name != secure_filename(name):
+        return 0
+    abs_path = os.path.join(upload_dir(), name)
+    try:
+        size = os.path.getsize(abs_path)
+        os.remove(abs_path)
+    except OSError:
+        return 0
+    return size
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:     # no length field
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        (length,) = struct.unpack(">H", length)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):    # SOFn
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">xHH", data)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+        if f.read(1) != b"\xff":
+            return None
+
+
+def image_size(path):
+    """(width, height) from the image header, or None if unknown."""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                b0, b1, b2, b3 = head[21:25]
+                return 1 + (((b1 & 0x3F) << 8) | b0), 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+            if chunk == b"VP8X":
+                return 1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little")
+            return None
+        if head[:2] == b"\xff\xd8":
+            return _jpeg_size(f)
+    return None
+
+
+def image_meta(abs_path):
+    """ProductImage width/height/size for a stored file."""
+    try:
+        size = image_size(abs_path)
+    except (OSError, struct.error):
+        size = None
+    width, height = size or (None, None)
+    return {"width": width, "height": height, "size": os.path.getsize(abs_path)}
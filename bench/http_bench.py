@@ -0,0 +1,458 @@
+# bench/http_bench.py
+"""
+End-to-end HTTP benchmark over the auth, products, categories and cart
+blueprints.
+
+Boots create_app() against a throwaway SQLite database seeded with a
+configurable catalog, then drives every route either in-process through the
+WSGI test client ("wsgi") or over HTTP against a real gunicorn process
+("gunicorn") or uvicorn serving the ASGI mode in asgi.py ("asgi"). Results
+(p50/p95/p99 latency, throughput, queries per request) are written as JSON
+so two runs can be compared:
+
+    python -m bench.http_bench --products 10000 --mode both --out bench/results/base.json
+    python -m bench.http_bench --compare bench/results/base.json bench/results/new.json
+
+Sync vs async serving at high concurrency:
+
+    python -m bench.http_bench --mode servers --concurrency 128 --out bench/results/servers.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+    "Platform": "bench",
+    "Accept-Language": "en",
+    "Ocp-Apim-Subscription-Key": "bench",
+}
+
+
+# ---------------------------------------------------------------- seeding
+def seed(app, args):
+    """Seed through app.seed (the `flask seed` generator) with fixed items per cart."""
+    from app.seed import seed_all
+
+    with app.app_context():
+        seed_all(products=args.products, categories=args.categories, images=args.images, users=0,
+                 carts=args.carts, items_per_cart=f"const:{args.items_per_cart}")
+
+
+# ---------------------------------------------------------------- scenarios
+class Ctx:
+    """Shared state for scenarios (ids created along the way, tokens)."""
+
+    def __init__(self, args, app):
+        from app.extensions import db
+        from app.model import Cart, CartItem, Category, Product
+
+        # read from the database, so a second phase (--mode both) starts from
+        # what the first one left instead of deleting the same rows again
+        with app.app_context():
+            # remove_cart only marks carts abandoned
+            self.cart_uuids = [u for (u,) in db.session.query(Cart.uuid).filter(Cart.status == "active").order_by(Cart.id)]
+            self.items = db.session.query(CartItem.id, Cart.uuid).join(Cart, Cart.id == CartItem.cart_id) \
+                .filter(Cart.status == "active").order_by(CartItem.id).all()
+            # seeded products are 1..N and only delete_product removes them, from the top
+            seeded = db.session.query(db.func.max(Product.id)).filter(Product.id <= args.products).scalar() or 0
+            category_floor = db.session.query(db.func.max(Category.id)).scalar() or 0
+        self.app = app
+        self.run = time.time_ns()
+        # the top `requests` seeded products are left to delete_product, the rest are read
+        self.products = max(1, seeded - args.requests)
+        self.category_floor = category_floor
+        self.doomed_categories = None
+        self.placed = []
+        self.categories = args.categories
+        self.carts = args.carts
+        self.rnd = random.Random(7)
+        self.counter = 0
+        self.lock = threading.Lock()
+        self.token = None
+        self.refresh_tokens = []
+        self.requests = args.requests
+        self.doomed = {"product": seeded + 1, "category": -1, "item": -1, "cart": -1}
+
+    def next(self):
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def pid(self):
+        return self.rnd.randint(1, self.products)
+
+    def cart(self):
+        return self.rnd.choice(self.cart_uuids) if self.cart_uuids else ""
+
+    def auth(self):
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def refresh_token(self):
+        with self.lock:
+            return self.refresh_tokens.pop() if self.refresh_tokens else "missing"
+
+    def take(self, kind, step=1):
+        """Next row id of `kind` for destructive scenarios (each id is used once)."""
+        with self.lock:
+            self.doomed[kind] += step
+            return self.doomed[kind]
+
+    def item(self):
+        """(cart uuid, cart item id) for a seeded item, each used once."""
+        iid, cart = self.items[self.take("item") % len(self.items)]
+        return cart, iid
+
+    def place(self):
+        """(cart uuid, product id) for update_item_by_product, kept for remove_item_by_product."""
+        cart, pid = self.cart(), self.pid()
+        with self.lock:
+            self.placed.append((cart, pid))
+        return cart, pid
+
+    def placed_item(self):
+        with self.lock:
+            return self.placed.pop() if self.placed else (self.cart(), self.pid())
+
+    def doomed_category(self):
+        """Categories made by create_category in this phase (seeded ones hold products)."""
+        from app.extensions import db
+        from app.model import Category
+
+        with self.lock:
+            if self.doomed_categories is None:
+                with self.app.app_context():
+                    self.doomed_categories = [i for (i,) in db.session.query(Category.id)
+                                              .filter(Category.id > self.category_floor).order_by(Category.id)]
+        i = self.take("category")
+        return self.doomed_categories[i] if i < len(self.doomed_categories) else 0
+
+    def doomed_cart(self):
+        return self.cart_uuids[self.take("cart") % len(self.cart_uuids)] if self.cart_uuids else ""
+
+
+def scenarios(ctx):
+    """name -> callable(ctx) returning (method, path, json_body, extra_headers)."""
+    from app.seed import ean13
+
+    return {
+        # auth
+        "auth.register": lambda c: ("POST", "/api/auth/register",
+                                    {"email": f"u{c.next()}-{time.time_ns()}@bench.local", "password": "secret123", "name": "Bench"}, {}),
+        "auth.login": lambda c: ("POST", "/api/auth/login", {"email": "bench@bench.local", "password": "secret123"}, {}),
+        "auth.me_alias": lambda c: ("GET", "/api/auth/me", None, c.auth()),
+        "auth.get_headers": lambda c: ("GET", "/api/auth/headers", None, {}),
+        "auth.refresh": lambda c: ("POST", "/api/auth/refresh", {"refresh_token": c.refresh_token()}, {}),
+        # products
+        "products.list_products": lambda c: ("GET", "/api/products?per_page=15", None, {}),
+        "products.list_products[km,KHR]": lambda c: (
+            "GET", "/api/products?per_page=100", None, {"Accept-Language": "km", "X-Currency": "KHR"}),
+        "products.list_products[q]": lambda c: ("GET", f"/api/products?q=Product%20{c.rnd.randint(1, 999)}", None, {}),
+        "products.list_products[filters]": lambda c: (
+            "GET", f"/api/products?min_price=1&max_price=20&in_stock=true&sort=-price&per_page=50", None, {}),
+        "products.list_products[category]": lambda c: ("GET", "/api/products?category_id=1&per_page=100", None, {}),
+        "products.list_products[barcode]": lambda c: ("GET", f"/api/products?barcode={ean13(c.pid())}", None, {}),
+        "products.get_product_by_barcode": lambda c: ("GET", f"/api/products/by-barcode/{ean13(c.pid())}", None, {}),
+        "products.get_product": lambda c: ("GET", f"/api/products/{c.pid()}", None, {}),
+        "products.suggest_products": lambda c: (
+            "GET", f"/api/products/suggest?prefix={c.rnd.choice(['an', 'beer', 'kampot+w', '885'])}", None, {}),
+        "products.create_product": lambda c: ("POST", "/api/products",
+                                              {"barcode": f"bench-{c.next()}-{time.time_ns()}", "name": "Bench item", "price": 1.5}, {}),
+        "products.update_product": lambda c: ("PUT", f"/api/products/{c.pid()}", {"quantity": c.rnd.randint(1, 99)}, {}),
+        "products.set_favorite": lambda c: ("PATCH", f"/api/products/{c.pid()}/favorite", {}, {}),
+        "products.set_pin": lambda c: ("PATCH", f"/api/products/{c.pid()}/pin", {}, {}),
+        # categories (jwt)
+        "categories.list_categories": lambda c: ("GET", "/api/categories/?per_page=50", None, c.auth()),
+        "categories.get_category": lambda c: ("GET", "/api/categories/1", None, c.auth()),
+        "categories.create_category": lambda c: ("POST", "/api/categories/", {"name": f"bench-{c.next()}-{time.time_ns()}"}, c.auth()),
+        "categories.update_category": lambda c: ("PUT", "/api/categories/1", {"name": "Category 1"}, c.auth()),
+        # cart
+        "cart.get_cart": lambda c: ("GET", "/api/cart", None, {"X-Cart-Id": c.cart()}),
+        "cart.create_or_get_cart": lambda c: ("POST", "/api/cart", {}, {"X-Cart-Id": c.cart()}),
+        "cart.add_item": lambda c: ("POST", "/api/cart/items", {"product_id": c.pid(), "quantity": 1}, {"X-Cart-Id": c.cart()}),
+        "cart.add_item[replay]": lambda c: (lambda k: (
+            "POST", "/api/cart/items", {"product_id": k, "quantity": 1},
+            {"X-Cart-Id": c.cart_uuids[0] if c.cart_uuids else "", "Idempotency-Key": f"bench-{c.run}-{k}"}))(c.rnd.randint(1, 10)),
+        "cart.update_item_by_product": lambda c: (lambda cart, pid: (
+            "PUT", f"/api/cart/items/by-product/{pid}", {"quantity": 1}, {"X-Cart-Id": cart}))(*c.place()),
+        "cart.remove_item_by_product": lambda c: (lambda cart, pid: (
+            "DELETE", f"/api/cart/items/by-product/{pid}", None, {"X-Cart-Id": cart}))(*c.placed_item()),
+        # destructive scenarios last; each touches rows nothing else uses afterwards
+        "cart.update_item": lambda c: (lambda cart, iid: (
+            "PUT", f"/api/cart/items/{iid}", {"quantity": 2}, {"X-Cart-Id": cart}))(*c.item()),
+        "cart.remove_item": lambda c: (lambda cart, iid: (
+            "DELETE", f"/api/cart/items/{iid}", None, {"X-Cart-Id": cart}))(*c.item()),
+        "cart.clear_cart_items": lambda c: ("DELETE", "/api/cart/items", None, {"X-Cart-Id": c.cart()}),
+        "cart.remove_cart": lambda c: ("DELETE", "/api/cart", None,
+                                       {"X-Cart-Id": c.doomed_cart()}),
+        "products.delete_product": lambda c: ("DELETE", f"/api/products/{c.take('product', -1)}", None, {}),
+        "categories.delete_category": lambda c: ("DELETE", f"/api/categories/{c.doomed_category()}", None, c.auth()),
+    }
+
+
+# ---------------------------------------------------------------- runners
+class WsgiClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers):
+        resp = self.client.open(path, method=method, json=body, headers={**HEADERS, **headers})
+        return resp.status_code, resp.get_data(), int(resp.headers.get("X-DB-Statements", 0))
+
+
+class HttpClient:
+    def __init__(self, base):
+        self.base = base
+
+    def request(self, method, path, body, headers):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method, headers={**HEADERS, **headers})
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                return resp.status, resp.read(), int(resp.headers.get("X-DB-Statements", 0))
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), int(e.headers.get("X-DB-Statements", 0))
+
+
+def _pct(sorted_vals, p):
+    if not sorted_vals:
+        return None
+    idx = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[idx]
+
+
+def run_scenarios(client, ctx, requests, concurrency):
+    results = {}
+    for name, build in scenarios(ctx).items():
+        latencies, errors, statements, statuses = [], 0, 0, {}
+
+        def one(_):
+            method, path, body, headers = build(ctx)
+            t0 = time.perf_counter()
+            status, _, n = client.request(method, path, body, headers)
+            return time.perf_counter() - t0, status, n
+
+        t_start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as pool:
+                outcomes = list(pool.map(one, range(requests)))
+        else:
+            outcomes = [one(i) for i in range(requests)]
+        wall = time.perf_counter() - t_start
+        for elapsed, status, n in outcomes:
+            latencies.append(elapsed)
+            statements += n
+            if not 200 <= status < 400:
+                errors += 1
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+        latencies.sort()
+        results[name] = {
+            "requests": requests,
+            "errors": errors,
+            "error_statuses": statuses,
+            "p50_ms": round(_pct(latencies, 50) * 1000, 3),
+            "p95_ms": round(_pct(latencies, 95) * 1000, 3),
+            "p99_ms": round(_pct(latencies, 99) * 1000, 3),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "throughput_rps": round(requests / wall, 1) if wall else None,
+            "queries_per_request": round(statements / requests, 2),
+        }
+        print(f"  {name:40s} p50={results[name]['p50_ms']:8.2f}ms p99={results[name]['p99_ms']:8.2f}ms "
+              f"rps={results[name]['throughput_rps']:8.1f} q/req={results[name]['queries_per_request']}"
+              + (f" errors={statuses}" if errors else ""), flush=True)
+    return results
+
+
+def _login(client, ctx, app):
+    client.request("POST", "/api/auth/register",
+                   {"email": "bench@bench.local", "password": "secret123", "name": "Bench"}, {})
+    status, body, _ = client.request("POST", "/api/auth/login",
+                                  {"email": "bench@bench.local", "password": "secret123"}, {})
+    data = json.loads(body)["data"]
+    ctx.token = data["token"]
+
+    # refresh tokens are single-use, so hand every auth.refresh request its own
+    from datetime import timedelta
+    from app.extensions import db
+    from app.model import User, RefreshToken
+
+    with app.app_context():
+        user = User.query.filter_by(email="bench@bench.local").first()
+        expires = datetime.utcnow() + timedelta(days=1)
+        tokens = [f"bench-{ctx.next()}-{i}-{time.time_ns()}" for i in range(ctx.requests)]
+        db.session.execute(RefreshToken.__table__.insert(),
+                           [{"user_id": user.id, "token": t, "expires_at": expires} for t in tokens])
+        db.session.commit()
+    ctx.refresh_tokens = tokens
+
+
+def bench_wsgi(app, args):
+    ctx = Ctx(args, app)
+    client = WsgiClient(app)
+    _login(client, ctx, app)
+    return run_scenarios(client, ctx, args.requests, 1)
+
+
+def _bench_server(name, cmd, app, env, args):
+    port = args.port
+    proc = subprocess.Popen(cmd + ["--log-level", "warning"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                urllib.request.urlopen(base + "/", timeout=1).read()
+                break
+            except OSError:
+                if proc.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f"{name} did not start: {proc.stderr.read().decode()[-2000:]}")
+                time.sleep(0.2)
+        ctx = Ctx(args, app)
+        client = HttpClient(base)
+        _login(client, ctx, app)
+        return run_scenarios(client, ctx, args.requests, args.concurrency)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def bench_gunicorn(app, env, args):
+    cmd = [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-k", "gthread", "--threads", str(args.threads),
+           "-b", f"127.0.0.1:{args.port}", "app:create_app()"]
+    return _bench_server("gunicorn", cmd, app, env, args)
+
+
+def bench_asgi(app, env, args):
+    """uvicorn on asgi.py (needs requirements-async.txt); ASYNC_VIEWS=0 in env measures the thread-pool path."""
+    cmd = [sys.executable, "-m", "uvicorn", "asgi:application", "--workers", str(args.workers),
+           "--host", "127.0.0.1", "--port", str(args.port), "--no-access-log"]
+    env = {**env, "ASYNC_SYNC_THREADS": str(args.threads)}
+    return _bench_server("uvicorn", cmd, app, env, args)
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as fh:
+        old = json.load(fh)
+    with open(new_path) as fh:
+        new = json.load(fh)
+    for mode, rows in new["results"].items():
+        print(f"== {mode}")
+        for name, cur in rows.items():
+            prev = old["results"].get(mode, {}).get(name)
+            if not prev:
+                print(f"  {name:40s} (new)")
+                continue
+            delta = lambda k: (cur[k] - prev[k]) / prev[k] * 100 if prev.get(k) else 0.0
+            print(f"  {name:40s} p50 {prev['p50_ms']:8.2f} -> {cur['p50_ms']:8.2f} ({delta('p50_ms'):+6.1f}%)  "
+                  f"p99 {prev['p99_ms']:8.2f} -> {cur['p99_ms']:8.2f} ({delta('p99_ms'):+6.1f}%)  "
+                  f"q/req {prev['queries_per_request']} -> {cur['queries_per_request']}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--products", type=int, default=10_000)
+    p.add_argument("--categories", type=int, default=50)
+    p.add_argument("--images", type=int, default=2, help="images per product")
+    p.add_argument("--carts", type=int, default=1_000)
+    p.add_argument("--items-per-cart", type=int, default=5)
+    p.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    p.add_argument("--mode", choices=("wsgi", "gunicorn", "asgi", "both", "servers", "all"), default="wsgi",
+                   help="both = wsgi + gunicorn, servers = gunicorn + asgi, all = every mode")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--threads", type=int, default=4)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--port", type=int, default=5099)
+    p.add_argument("--out", help="write results JSON here")
+    p.add_argument("--keep", action="store_true", help="keep the temporary database directory")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = p.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="pintel-bench-")
+    env = {
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "METRICS_STATEMENT_HEADER": "1",
+    }
+    os.environ.update(env)
+    try:
+        from app import create_app
+        from app.services.view_counter import view_counter
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            app = create_app()
+        t0 = time.perf_counter()
+        seed(app, args)
+        print(f"seeded {args.products} products in {time.perf_counter() - t0:.1f}s ({workdir})", flush=True)
+
+        results = {}
+        if args.mode in ("wsgi", "both", "all"):
+            print("== wsgi")
+            results["wsgi"] = bench_wsgi(app, args)
+        if args.mode in ("gunicorn", "both", "servers", "all"):
+            print(f"== gunicorn (-w {args.workers} --threads {args.threads}, concurrency {args.concurrency})")
+            results["gunicorn"] = bench_gunicorn(app, env, args)
+        if args.mode in ("asgi", "servers", "all"):
+            print(f"== asgi (uvicorn --workers {args.workers}, {args.threads} sync threads, concurrency {args.concurrency})")
+            results["asgi"] = bench_asgi(app, env, args)
+
+        report = {
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "git_rev": _git_rev(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "products": args.products,
+                "categories": args.categories,
+                "images_per_product": args.images,
+                "carts": args.carts,
+                "requests_per_scenario": args.requests,
+                "workers": args.workers,
+                "threads": args.threads,
+                "concurrency": args.concurrency,
+            },
+            "results": results,
+        }
+        if args.out:
+            os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+            with open(args.out, "w") as fh:
+                json.dump(report, fh, indent=2)
+            print(f"wrote {args.out}")
+        view_counter.flush()        # while the temporary database still exists
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""product query indexes
+
+Composite indexes for the filter/sort shapes list_products issues, plus the
+missing index behind delete_category's category_id lookup. The tables
+themselves predate migrations (db.create_all), so this is the base revision
+and is safe to run against a database that already has the indexes.
+
+Revision ID: a1c3e5f70001
+Revises:
+Create Date: 2026-10-19 04:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f70001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_product_category_price_id", ["category_id", "price", "id"]),
+    ("ix_product_category_id_id", ["category_id", "id"]),
+    ("ix_product_price_id", ["price", "id"]),
+    ("ix_product_status_sort_order", ["status", "sort_order"]),
+    ("ix_product_quantity", ["quantity"]),
+]
+
+
+def upgrade():
+    for name, columns in INDEXES:
+        op.create_index(name, "product", columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="product", if_exists=True)
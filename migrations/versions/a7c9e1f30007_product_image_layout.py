@@ -0,0 +1,48 @@
+"""product_image ordering and dimensions
+
+sort_order (existing rows start at 0 and keep their id order), plus width,
+height and size in bytes, read from the file header when the file is
+stored locally. db.create_all may already have created the columns on a
+fresh instance, so existing ones are skipped.
+
+Revision ID: a7c9e1f30007
+Revises: f6b8d0e20006
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c9e1f30007'
+down_revision = 'f6b8d0e20006'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ("sort_order", lambda: sa.Column("sort_order", sa.Integer(), nullable=False, server_default="0")),
+    ("width", lambda: sa.Column("width", sa.Integer(), nullable=True)),
+    ("height", lambda: sa.Column("height", sa.Integer(), nullable=True)),
+    ("size", lambda: sa.Column("size", sa.Integer(), nullable=True)),
+)
+
+
+def _columns():
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns("product_image")}
+
+
+def upgrade():
+    existing = _columns()
+    with op.batch_alter_table("product_image", schema=None) as batch_op:
+        for name, column in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(column())
+
+
+def downgrade():
+    existing = _columns()
+    with op.batch_alter_table("product_image", schema=None) as batch_op:
+        for name, _ in reversed(COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
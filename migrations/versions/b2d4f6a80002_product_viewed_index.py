@@ -0,0 +1,26 @@
+"""product viewed index
+
+Backs sort=viewed / sort=-viewed on list_products.
+
+Revision ID: b2d4f6a80002
+Revises: a1c3e5f70001
+Create Date: 2026-10-19 05:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a80002'
+down_revision = 'a1c3e5f70001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_product_viewed", "product", ["viewed"], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_product_viewed", table_name="product", if_exists=True)
@@ -0,0 +1,28 @@
+"""product_image image_path index
+
+Backs the batched "which of these files are still referenced" lookups of
+`flask gc-uploads` and of image edits that delete replaced files.
+
+Revision ID: b8d0f2a40008
+Revises: a7c9e1f30007
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a40008'
+down_revision = 'a7c9e1f30007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_product_image_image_path", "product_image", ["image_path"], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_product_image_image_path", table_name="product_image", if_exists=True)
@@ -0,0 +1,38 @@
+"""user_favorite table
+
+Per-user favorites keyed by (user_id, product_id). db.create_all may already
+have created the table on a running instance, hence if_not_exists.
+
+Revision ID: c3e5a7b90003
+Revises: b2d4f6a80002
+Create Date: 2026-10-19 06:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b90003'
+down_revision = 'b2d4f6a80002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_favorite",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("product.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_user_favorite_product_id", "user_favorite", ["product_id"], unique=False, if_not_exists=True)
+    op.create_index("ix_user_favorite_user_created", "user_favorite", ["user_id", "created_at", "product_id"],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_user_favorite_user_created", table_name="user_favorite", if_exists=True)
+    op.drop_index("ix_user_favorite_product_id", table_name="user_favorite", if_exists=True)
+    op.drop_table("user_favorite", if_exists=True)
@@ -0,0 +1,57 @@
+"""catalog change feed
+
+product.change_seq with a (change_seq, id) index, the single-row
+catalog_sequence counter and the product_tombstone delete log behind
+GET /api/products/changes. Existing products start at change_seq 0 (they
+reach clients through a full sync). db.create_all may already have created
+the tables on a running instance, hence if_not_exists.
+
+Revision ID: c9e1a3b50009
+Revises: b8d0f2a40008
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1a3b50009'
+down_revision = 'b8d0f2a40008'
+branch_labels = None
+depends_on = None
+
+
+def _has_change_seq():
+    return any(c["name"] == "change_seq" for c in sa.inspect(op.get_bind()).get_columns("product"))
+
+
+def upgrade():
+    if not _has_change_seq():
+        with op.batch_alter_table("product", schema=None) as batch_op:
+            batch_op.add_column(sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0"))
+    op.create_index("ix_product_change_seq_id", "product", ["change_seq", "id"], unique=False, if_not_exists=True)
+
+    op.create_table(
+        "catalog_sequence",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "product_tombstone",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("change_seq", sa.BigInteger(), nullable=False, unique=True),
+        sa.Column("deleted_at", sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_table("product_tombstone", if_exists=True)
+    op.drop_table("catalog_sequence", if_exists=True)
+    op.drop_index("ix_product_change_seq_id", table_name="product", if_exists=True)
+    if _has_change_seq():
+        with op.batch_alter_table("product", schema=None) as batch_op:
+            batch_op.drop_column("change_seq")
@@ -0,0 +1,30 @@
+"""drop product (status, sort_order) index
+
+No query filters or sorts products on status/sort_order together:
+list_products never filters on status and the pinned list orders by
+(is_pin, sort_order, id), which ix_product_pin_sort_order_id covers. The
+index only cost every product write.
+
+Revision ID: d1f3b5c7000a
+Revises: c9e1a3b50009
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f3b5c7000a'
+down_revision = 'c9e1a3b50009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_product_status_sort_order", table_name="product", if_exists=True)
+
+
+def downgrade():
+    op.create_index("ix_product_status_sort_order", "product", ["status", "sort_order"], unique=False,
+                    if_not_exists=True)
@@ -0,0 +1,28 @@
+"""product pin index
+
+(is_pin, sort_order, id) backs the pinned products list and
+list_products?pinned_first.
+
+Revision ID: d4f6b8c00004
+Revises: c3e5a7b90003
+Create Date: 2026-10-19 06:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c00004'
+down_revision = 'c3e5a7b90003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_product_pin_sort_order_id", "product", ["is_pin", "sort_order", "id"], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_product_pin_sort_order_id", table_name="product", if_exists=True)
@@ -0,0 +1,32 @@
+"""product pin index with is_pin descending
+
+list_products?pinned_first orders by is_pin DESC, sort_order, id. An
+all-ascending (is_pin, sort_order, id) index cannot serve that mixed
+direction, so it is rebuilt as (is_pin DESC, sort_order, id); the pinned
+list's is_pin = true lookup uses it as before.
+
+Revision ID: e2a4c6d8000b
+Revises: d1f3b5c7000a
+Create Date: 2026-10-19 16:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a4c6d8000b'
+down_revision = 'd1f3b5c7000a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_product_pin_sort_order_id", table_name="product", if_exists=True)
+    op.create_index("ix_product_pin_sort_order_id", "product", [sa.text("is_pin DESC"), "sort_order", "id"],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_product_pin_sort_order_id", table_name="product", if_exists=True)
+    op.create_index("ix_product_pin_sort_order_id", "product", ["is_pin", "sort_order", "id"], unique=False)
@@ -0,0 +1,40 @@
+"""idempotency_key table
+
+Stored first responses for Idempotency-Key requests. db.create_all may
+already have created the table on a running instance, hence if_not_exists.
+
+Revision ID: e5a7c9d10005
+Revises: d4f6b8c00004
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d10005'
+down_revision = 'd4f6b8c00004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "idempotency_key",
+        sa.Column("key", sa.String(length=255), primary_key=True),
+        sa.Column("scope", sa.String(length=64), primary_key=True),
+        sa.Column("fingerprint", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.Integer(), nullable=True),
+        sa.Column("headers", sa.JSON(), nullable=True),
+        sa.Column("body", sa.LargeBinary(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_idempotency_key_expires_at", "idempotency_key", ["expires_at"], unique=False,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_idempotency_key_expires_at", table_name="idempotency_key", if_exists=True)
+    op.drop_table("idempotency_key", if_exists=True)
@@ -0,0 +1,42 @@
+"""version columns for optimistic concurrency
+
+Product, cart and cart_item get a version counter (mapper version_id_col);
+existing rows start at 1. db.create_all may already have created the
+columns on a fresh instance, so existing ones are skipped.
+
+Revision ID: f6b8d0e20006
+Revises: e5a7c9d10005
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e20006'
+down_revision = 'e5a7c9d10005'
+branch_labels = None
+depends_on = None
+
+TABLES = ("product", "cart", "cart_item")
+
+
+def _has_version(table):
+    return any(c["name"] == "version" for c in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def upgrade():
+    for table in TABLES:
+        if _has_version(table):
+            continue
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        if not _has_version(table):
+            continue
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column("version")
@@ -0,0 +1,48 @@
+import pytest
+
+from app import create_app
+from app.extensions import db
+from app.model import Product
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+    "Platform": "test",
+    "Accept-Language": "en",
+    "Ocp-Apim-Subscription-Key": "test",
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path / "metrics"))
+    monkeypatch.setenv("SNAPSHOT_ENABLED", "0")
+    monkeypatch.setenv("VIEW_COUNTER_ENABLED", "0")
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Product(barcode="b1", name="apple", price=1.0, quantity=1))
+        db.session.commit()
+    yield app.test_client()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _global_flag(client):
+    with client.application.app_context():
+        return db.session.get(Product, 1).is_favourite
+
+
+def test_bad_token_does_not_touch_global_flag(client):
+    resp = client.patch("/api/products/1/favorite", json={"value": True},
+                        headers={**HEADERS, "Authorization": "Bearer not-a-jwt"})
+    assert resp.status_code == 401
+    assert _global_flag(client) is False
+
+
+def test_no_token_sets_global_flag(client):
+    resp = client.patch("/api/products/1/favorite", json={"value": True}, headers=HEADERS)
+    assert resp.status_code == 200
+    assert _global_flag(client) is True